@@ -1,49 +1,149 @@
+import atexit
+import hashlib
+import importlib
 import os
-from flask import Flask, render_template, request, jsonify, session
-from datetime import datetime
+from flask import Flask, Response, g, render_template, request, jsonify, send_file, session
 import json
-import nltk
-import textstat
-import markdown
+import logging
+import multiprocessing
+import random
 import re
-from typing import Dict, List, Optional
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 import uuid
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.local import LocalProxy
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+import metrics
+import nlp
+import readability
+from nlp import sent_tokenize, word_tokenize
+from cache import LRUCache
+from content_registry import ContentRegistry
+from interactions import Interaction, InteractionKind
+from profiling import RequestProfiler
+from memory_store import DictMemoryStore, MemoryStore, create_memory_store
+from quiz_bank import QuizBank
+from recommender import Recommender
+from streaming import UploadTooLarge, spool_to_tempfile, summarize_sections
 
-from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk.corpus import stopwords
-from collections import Counter
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-this')
 
+# Requests are profiled when they send PROFILE_TOKEN in X-Profile-Token,
+# or one in every PROFILE_SAMPLE_EVERY requests; both are off by default
+profiler = RequestProfiler(
+    os.environ.get('PROFILE_DIR', 'profiles'),
+    token=os.environ.get('PROFILE_TOKEN') or None,
+    sample_every=int(os.environ.get('PROFILE_SAMPLE_EVERY', 0)),
+    keep=int(os.environ.get('PROFILE_KEEP', 50))
+)
+
 class StudyAssistant:
-    def __init__(self):
-        self.memory_file = 'student_memory.json'
+    def __init__(self, store: Optional[MemoryStore] = None):
+        self.memory_file = os.environ.get('MEMORY_FILE', 'student_memory.json')
+        if store is None:
+            # 'json' rewrites the whole memory file on every update, 'journal'
+            # appends each update to a log and compacts periodically, 'sqlite'
+            # keeps memory in indexed tables shared by all workers
+            store = create_memory_store(
+                os.environ.get('MEMORY_BACKEND', 'json'),
+                self.memory_file,
+                compact_every=int(os.environ.get('MEMORY_COMPACT_EVERY', 1000)),
+                db_file=os.environ.get('MEMORY_DB'),
+                durability=os.environ.get('MEMORY_DURABILITY', 'always'),
+                flush_interval=float(os.environ.get('MEMORY_FLUSH_INTERVAL', 1.0)),
+                flush_max_pending=int(os.environ.get('MEMORY_FLUSH_MAX_PENDING', 100)),
+                # If set, only the newest interactions are kept per student;
+                # totals, per-type and daily counts still cover all of them.
+                # Off by default: loading trims existing histories too
+                history_limit=int(os.environ.get('MEMORY_HISTORY_LIMIT', 0)) or None,
+                history_days=int(os.environ.get('MEMORY_HISTORY_DAYS', 365)) or None,
+                archive_dir=os.environ.get('MEMORY_ARCHIVE_DIR') or None
+            )
+        self.store = store
+        # Topic explanations, activities, related topics and quiz questions
+        # come from the content packs in CONTENT_DIR
+        self.content = ContentRegistry(
+            os.environ.get('CONTENT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content')),
+            reload_interval=float(os.environ.get('CONTENT_RELOAD_INTERVAL', 2.0)),
+            min_confidence=float(os.environ.get('TOPIC_MIN_CONFIDENCE', 0.6))
+        )
+        # 'python' scores sentences with plain loops, 'numpy' with a
+        # vectorized sentence x term matrix (faster on long documents)
+        self.summary_engine = os.environ.get('SUMMARY_ENGINE', 'python')
+        # Longest wait in seconds for the process pool to summarize a document
+        self.summary_timeout = float(os.environ.get('SUMMARY_TIMEOUT', 60))
+        # Identical texts (the same handout pasted by a whole class) are
+        # summarized once; keyed by a hash of the cleaned text
+        ttl = os.environ.get('SUMMARY_CACHE_TTL')
+        self.summary_cache = LRUCache(
+            max_entries=int(os.environ.get('SUMMARY_CACHE_SIZE', 256)),
+            max_bytes=int(os.environ.get('SUMMARY_CACHE_BYTES', 32 * 1024 * 1024)),
+            ttl=float(ttl) if ttl else None,
+            sizeof=lambda result: len(json.dumps(result))
+        )
+        # Token count, filtered words and readability counts per sentence,
+        # keyed by a hash of the sentence: an edited document that is
+        # summarized again only tokenizes the sentences that changed
+        self.sentence_cache = LRUCache(max_entries=int(os.environ.get('SENTENCE_CACHE_SIZE', 50000)))
+        # Weak topics and next-topic scores, updated as events are recorded
+        self.recommender = Recommender(
+            self.content,
+            max_students=int(os.environ.get('RECOMMENDER_MAX_STUDENTS', 10000)),
+            ttl=float(os.environ.get('RECOMMENDER_TTL', 300))
+        )
+        # Generated quizzes, kept until they are graded or expire
+        self.quiz_sessions = LRUCache(
+            max_entries=int(os.environ.get('QUIZ_SESSION_MAX', 10000)),
+            ttl=float(os.environ.get('QUIZ_SESSION_TTL', 3600))
+        )
+        # Held while a quiz session's answers are checked and updated
+        self.quiz_lock = threading.Lock()
+        self.register_metrics()
         self.load_memory()
+        # Write out anything still queued by the write-behind flusher
+        atexit.register(self.store.close)
+    
+    def register_metrics(self):
+        """Report store writes and export cache and store statistics on /metrics"""
+        backend = type(self.store).__name__.replace('MemoryStore', '').lower()
+        
+        def on_commit(seconds, written, records):
+            metrics.STORE_COMMIT_LATENCY.observe(seconds, backend=backend)
+            metrics.STORE_COMMIT_RECORDS.inc(records, backend=backend)
+            if written is not None:
+                metrics.STORE_COMMIT_BYTES.observe(written, backend=backend)
+        
+        self.store.on_commit = on_commit
+        metrics.register_store(self.store.size, backend)
+        metrics.register_caches(lambda: {
+            'summary': self.summary_cache,
+            'sentences': self.sentence_cache,
+            'quiz_sessions': self.quiz_sessions,
+            'topic_resolver': self.content.snapshot.resolver,
+            'recommender': self.recommender,
+            'syllables': readability.SYLLABLE_CACHE
+        })
     
     def load_memory(self):
-        """Load student memory from file"""
-        try:
-            with open(self.memory_file, 'r', encoding='utf-8') as f:
-                self.memory = json.load(f)
-        except FileNotFoundError:
-            self.memory = {}
+        """Load student memory from storage"""
+        self.store.load()
     
     def save_memory(self):
-        """Save student memory to file"""
-        with open(self.memory_file, 'w', encoding='utf-8') as f:
-            json.dump(self.memory, f, indent=2, ensure_ascii=False)
+        """Save student memory to storage"""
+        self.store.save()
+    
+    @property
+    def stop_words(self) -> set:
+        """English stopwords, loaded once per process"""
+        return nlp.stop_words()
     
     def get_student_id(self, session_id: str) -> str:
         """Get or create student ID"""
@@ -51,73 +151,330 @@ class StudyAssistant:
             session['student_id'] = str(uuid.uuid4())
         return session['student_id']
     
-    def add_to_memory(self, student_id: str, interaction_type: str, content: str, topic: str = None):
+    def new_interaction(self, kind: InteractionKind, topic: str = None, detail=None) -> Interaction:
+        """A compact interaction record; its content is rendered from kind, topic and detail when read"""
+        return Interaction.now(kind, topic, detail)
+    
+    # Store writes and the recommender updates for the same events happen
+    # under the student's recommender lock, so that recommendations rebuilt
+    # from the store in between don't count the events twice
+    
+    def add_to_memory(self, student_id: str, kind: InteractionKind, topic: str = None, detail=None):
         """Add interaction to student memory"""
-        if student_id not in self.memory:
-            self.memory[student_id] = {
-                'interactions': [],
-                'topics_studied': {},
-                'quiz_performance': {},
-                'preferences': {}
-            }
-        
-        interaction = {
-            'timestamp': datetime.now().isoformat(),
-            'type': interaction_type,
-            'content': content,
-            'topic': topic
-        }
-        
-        self.memory[student_id]['interactions'].append(interaction)
-        
-        if topic:
-            if topic not in self.memory[student_id]['topics_studied']:
-                self.memory[student_id]['topics_studied'][topic] = 0
-            self.memory[student_id]['topics_studied'][topic] += 1
-        
-        self.save_memory()
+        with self.recommender.updating(student_id):
+            self.store.record_interaction(student_id, self.new_interaction(kind, topic, detail))
+            self.recommender.record_interaction(student_id, topic)
+    
+    def add_many_to_memory(self, student_id: str, entries: List[tuple]):
+        """Add (kind, topic, detail) interactions to student memory in one store commit"""
+        with self.recommender.updating(student_id):
+            self.store.record_batch([
+                {'op': 'interaction', 'student_id': student_id, 'interaction': self.new_interaction(kind, topic, detail)}
+                for kind, topic, detail in entries
+            ])
+            for kind, topic, detail in entries:
+                self.recommender.record_interaction(student_id, topic)
+    
+    def record_quiz_result(self, student_id: str, topic: str, is_correct: bool):
+        """Update quiz performance for a topic in student memory"""
+        with self.recommender.updating(student_id):
+            self.store.record_quiz_result(student_id, topic, is_correct)
+            self.recommender.record_quiz_result(student_id, topic, is_correct)
+    
+    def record_quiz_answers(self, student_id: str, topic: str, results: List[Dict]):
+        """Record graded answers and their quiz performance updates in one store commit"""
+        records = []
+        for result in results:
+            interaction = self.new_interaction(
+                InteractionKind.ANSWERED_CORRECTLY if result['is_correct'] else InteractionKind.ANSWERED_INCORRECTLY,
+                topic,
+                result['question_index']
+            )
+            records.append({'op': 'interaction', 'student_id': student_id, 'interaction': interaction})
+            records.append({'op': 'quiz', 'student_id': student_id, 'topic': topic, 'correct': result['is_correct']})
+        with self.recommender.updating(student_id):
+            self.store.record_batch(records)
+            for result in results:
+                self.recommender.record_interaction(student_id, topic)
+                self.recommender.record_quiz_result(student_id, topic, result['is_correct'])
     
     def get_student_history(self, student_id: str) -> Dict:
         """Get student's learning history"""
-        return self.memory.get(student_id, {})
+        return self.store.get_student(student_id)
+    
+    def get_student_progress(self, student_id: str) -> Dict:
+        """Get student's topics studied and quiz performance"""
+        return self.store.get_progress(student_id)
+    
+    def get_memory_summary(self, student_id: str, recent: int = 10) -> Dict:
+        """Get interaction totals, progress and recent interactions"""
+        return self.store.get_summary(student_id, recent)
+    
+    def get_recommendations(self, student_id: str) -> List[str]:
+        """Topics to review and related topics to study next"""
+        recommendations = self.recommender.recommend(student_id, self.store.get_progress)
+        if not recommendations:
+            recommendations.append("Keep up the great work! Try exploring new topics or taking more quizzes.")
+        return recommendations
+    
+    # Request handling shared by the Flask views and the ASGI routes. Each
+    # handle_* method takes the student ID and the JSON body of a request
+    # and returns the status code and the JSON payload of the response.
     
-    def summarize_text(self, text: str) -> Dict:
+    def summarize_request_error(self, data: Dict) -> Optional[Tuple[int, Dict]]:
+        """Error response for an invalid /summarize request"""
+        if not data.get('text', ''):
+            return 400, {"error": "Please provide text to summarize"}
+        return None
+    
+    def record_summary(self, student_id: str, text: str):
+        self.add_to_memory(student_id, InteractionKind.SUMMARIZED_TEXT, 'text_summarization', text[:100])
+    
+    def handle_summarize(self, student_id: str, data: Dict) -> Tuple[int, Dict]:
+        error = self.summarize_request_error(data)
+        if error:
+            return error
+        result = self.summarize_text(data['text'])
+        self.record_summary(student_id, data['text'])
+        return 200, result
+    
+    def handle_explain(self, student_id: str, data: Dict) -> Tuple[int, Dict]:
+        topic = data.get('topic', '')
+        difficulty = data.get('difficulty', 'simple')
+        if not topic:
+            return 400, {"error": "Please provide a topic to explain"}
+        result = self.explain_topic(topic, difficulty)
+        self.add_to_memory(student_id, InteractionKind.EXPLAINED, topic, difficulty)
+        return 200, result
+    
+    def handle_quiz(self, student_id: str, data: Dict) -> Tuple[int, Dict]:
+        topic = data.get('topic', '')
+        num_questions = data.get('num_questions', 5)
+        if not topic:
+            return 400, {"error": "Please provide a topic for the quiz"}
+        result = self.generate_quiz(topic, num_questions, data.get('seed'), student_id)
+        self.add_to_memory(student_id, InteractionKind.GENERATED_QUIZ, topic, num_questions)
+        return 200, result
+    
+    def handle_check_answer(self, student_id: str, data: Dict) -> Tuple[int, Dict]:
+        quiz_id = data.get('quiz_id', '')
+        question_index = data.get('question_index')
+        selected_answer = data.get('selected_answer', 0)
+        if (not quiz_id or not isinstance(quiz_id, str) or not isinstance(question_index, int)
+                or isinstance(question_index, bool)):
+            return 400, {"error": "Please provide a quiz_id and an integer question_index"}
+        # Only questions of the student's own quiz are graded, each once,
+        # against the stored answer key
+        with self.quiz_lock:
+            quiz = self.quiz_sessions.get(quiz_id)
+            if quiz is None or quiz['student_id'] != student_id:
+                return 404, {"error": "Quiz not found or expired. Please generate a new quiz."}
+            if not 0 <= question_index < len(quiz['questions']):
+                return 400, {"error": "question_index is out of range"}
+            if question_index in quiz['answered']:
+                return 409, {"error": "This question has already been answered"}
+            quiz['answered'][question_index] = selected_answer
+        correct_answer = quiz['questions'][question_index]['correct']
+        result = dict(self.check_quiz_answer(question_index, selected_answer, correct_answer),
+                      question_index=question_index)
+        # Add to memory and update quiz performance in one store commit
+        self.record_quiz_answers(student_id, quiz['topic'], [result])
+        # The answer key is only sent back once the whole quiz is graded
+        del result['correct']
+        return 200, result
+    
+    def handle_check_answers(self, student_id: str, data: Dict) -> Tuple[int, Dict]:
+        quiz_id = data.get('quiz_id', '')
+        answers = data.get('answers')
+        if not quiz_id or not isinstance(quiz_id, str) or not isinstance(answers, list):
+            return 400, {"error": "Please provide a quiz_id and a list of answers"}
+        graded = self.grade_quiz(quiz_id, answers, student_id)
+        if graded is None:
+            return 404, {"error": "Quiz not found or expired. Please generate a new quiz."}
+        result, new_results = graded
+        # Answers already recorded by /check_answer aren't recorded again
+        self.record_quiz_answers(student_id, result['topic'], new_results)
+        return 200, result
+    
+    def handle_memory(self, student_id: str, data: Dict) -> Tuple[int, Dict]:
+        # Format the response for better presentation
+        return 200, self.get_memory_summary(student_id, recent=10)
+    
+    def handle_recommendations(self, student_id: str, data: Dict) -> Tuple[int, Dict]:
+        return 200, {'recommendations': self.get_recommendations(student_id)}
+    
+    def summarize_text(self, text: str, engine: Optional[str] = None) -> Dict:
         """Enhanced text summarization using improved extractive methods"""
         if not text.strip():
             return {"error": "Please provide text to summarize"}
         
         # Clean and preprocess text
-        text = self.clean_text(text)
+        with metrics.SUMMARIZE_STAGE.time(stage='clean'):
+            text = self.clean_text(text)
+        
+        cache_key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        cached = self.summary_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        result = self.summarize_clean_text(text, engine)
+        self.summary_cache.put(cache_key, result)
+        return dict(result)
+    
+    def summarize_batch(self, texts: List[str]) -> List[Dict]:
+        """Summarize many documents in parallel on the summary process pool.
         
+        Results come back in input order. A document that is invalid or
+        fails to summarize gets an error entry instead of failing the batch.
+        """
+        results = [None] * len(texts)
+        keys = {}
+        pending = {}
+        for i, text in enumerate(texts):
+            if not isinstance(text, str) or not text.strip():
+                results[i] = {"error": "Please provide text to summarize"}
+                continue
+            text = self.clean_text(text)
+            cache_key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+            cached = self.summary_cache.get(cache_key)
+            if cached is not None:
+                results[i] = dict(cached)
+                continue
+            # Repeats of a document within the batch share one worker task
+            pending[cache_key] = text
+            keys[i] = cache_key
+        
+        summaries = self.summarize_on_pool(pending) if pending else {}
+        for cache_key, result in summaries.items():
+            if "error" not in result:
+                self.summary_cache.put(cache_key, result)
+        for i, cache_key in keys.items():
+            results[i] = dict(summaries[cache_key])
+        return results
+    
+    def summarize_on_pool(self, texts: Dict[str, str]) -> Dict[str, Dict]:
+        """Summarize cleaned documents on the process pool, keyed like texts.
+        
+        If a worker dies, the pool is replaced and the documents it didn't
+        finish are tried once more on the new one. Waiting for the whole
+        batch is limited to summary_timeout seconds.
+        """
+        results = {}
+        deadline = time.monotonic() + self.summary_timeout
+        for attempt in range(2):
+            pool = get_summary_pool()
+            futures = {}
+            try:
+                for cache_key, text in texts.items():
+                    if cache_key not in results:
+                        futures[cache_key] = pool.submit(_summarize_in_worker, text, self.summary_engine)
+            except BrokenProcessPool:
+                pass
+            broken = len(futures) < len(texts) - len(results)
+            for cache_key, future in futures.items():
+                try:
+                    results[cache_key] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except BrokenProcessPool:
+                    broken = True
+                except FutureTimeoutError:
+                    future.cancel()
+                    results[cache_key] = {"error": f"Summarization timed out after {self.summary_timeout:g} seconds"}
+                except Exception as e:
+                    results[cache_key] = {"error": f"Summarization failed: {e}"}
+            if not broken:
+                break
+            logger.warning("A summary worker process died; starting a new pool")
+            reset_summary_pool(pool)
+        for cache_key in texts:
+            results.setdefault(cache_key, {"error": "Summarization failed: the worker process died"})
+        return results
+    
+    def summarize_clean_text(self, text: str, engine: Optional[str] = None) -> Dict:
+        """Summarize text that has already been through clean_text"""
         # Tokenize into sentences
-        sentences = sent_tokenize(text)
+        with metrics.SUMMARIZE_STAGE.time(stage='sentence_split'):
+            sentences = sent_tokenize(text)
         if len(sentences) <= 2:
+            with metrics.SUMMARIZE_STAGE.time(stage='readability'):
+                readability_scores = self.get_readability_score(text)
             return {
                 "summary": text,
                 "key_points": sentences,
-                "readability": self.get_readability_score(text),
+                "readability": readability_scores,
                 "confidence": 1.0
             }
         
-        # Enhanced preprocessing
-        stop_words = set(stopwords.words('english'))
+        scoring_start = time.perf_counter()
+        # Tokenize and filter every sentence exactly once; scoring, key
+        # points, confidence and word count all reuse these results
+        analysis = self.analyze_sentences(sentences)
+        
+        # Select top sentences for summary (improved selection)
+        num_sentences = max(1, min(4, len(sentences) // 3))
+        engine = engine or self.summary_engine
+        matrix_scoring = None
+        if engine == 'numpy':
+            try:
+                # Imported on first use; NumPy is optional and slow to import
+                matrix_scoring = importlib.import_module('matrix_scoring')
+            except ImportError:
+                logger.warning("SUMMARY_ENGINE=numpy needs NumPy; falling back to the python engine")
+                engine = 'python'
+        
+        if engine == 'numpy':
+            scores = matrix_scoring.score_sentences(analysis['words'])
+            top_sentences = matrix_scoring.select_top_sentences(scores, num_sentences)
+            sentence_scores = dict(enumerate(scores.tolist()))
+        elif engine == 'python':
+            sentence_scores = self.score_sentences(analysis['words'], analysis['word_freq'])
+            top_sentences = self.select_top_sentences(sentence_scores, num_sentences)
+        else:
+            raise ValueError(f"Unknown summary engine: {engine}")
+        
+        summary_sentences = [sentences[i] for i in top_sentences]
+        summary = ' '.join(summary_sentences)
+        
+        # Extract enhanced key points
+        key_points = self.extract_enhanced_key_points(sentences, sentence_scores)
+        
+        # Calculate confidence score
+        confidence = self.calculate_summary_confidence(sentence_scores, top_sentences)
+        metrics.SUMMARIZE_STAGE.observe(time.perf_counter() - scoring_start, stage='scoring')
+        
+        # Scored from the counts collected while tokenizing
+        with metrics.SUMMARIZE_STAGE.time(stage='readability'):
+            readability_scores = self.get_readability_score(text, analysis['readability_counts'])
+        
+        return {
+            "summary": summary,
+            "key_points": key_points,
+            "readability": readability_scores,
+            "word_count": analysis['token_count'],
+            "sentence_count": len(sentences),
+            "confidence": confidence,
+            "summary_ratio": round(len(summary) / len(text) * 100, 1)
+        }
+    
+    def clean_text(self, text: str) -> str:
+        """Clean and normalize input text"""
+        # Remove excessive whitespace
+        text = re.sub(r'\s+', ' ', text)
+        # Fix common punctuation issues
+        text = re.sub(r'\s+([.!?])', r'\1', text)
+        # Ensure proper sentence spacing
+        text = re.sub(r'([.!?])\s*', r'\1 ', text)
+        return text.strip()
+    
+    def score_sentences(self, sentence_words: List[List[str]], word_freq: Counter) -> Dict[int, float]:
+        """Score each sentence using frequency, position, length and keyword density"""
+        # Top 10 most frequent words are the document's keywords
+        top_keywords = set(word for word, freq in word_freq.most_common(10))
         
         # Calculate sentence importance using multiple factors
         sentence_scores = {}
-        word_freq = Counter()
-        
-        # Build word frequency from all sentences
-        for sentence in sentences:
-            words = word_tokenize(sentence.lower())
-            words = [word for word in words if word.isalnum() and word not in stop_words and len(word) > 2]
-            for word in words:
-                word_freq[word] += 1
+        num_sentences = len(sentence_words)
         
-        # Score sentences using multiple criteria
-        for i, sentence in enumerate(sentences):
-            words = word_tokenize(sentence.lower())
-            words = [word for word in words if word.isalnum() and word not in stop_words and len(word) > 2]
-            
+        for i, words in enumerate(sentence_words):
             if len(words) == 0:
                 sentence_scores[i] = 0
                 continue
@@ -127,9 +484,9 @@ class StudyAssistant:
             
             # Position score (first and last sentences are often important)
             position_score = 0.5
-            if i == 0 or i == len(sentences) - 1:
+            if i == 0 or i == num_sentences - 1:
                 position_score = 1.0
-            elif i < len(sentences) * 0.3:  # First third
+            elif i < num_sentences * 0.3:  # First third
                 position_score = 0.8
             
             # Length score (moderate length sentences preferred)
@@ -140,7 +497,7 @@ class StudyAssistant:
                 length_score = 0.7
             
             # Keyword density score
-            keyword_score = self.calculate_keyword_score(sentence, word_freq)
+            keyword_score = self.calculate_keyword_score(words, top_keywords)
             
             # Combined score with weights
             sentence_scores[i] = (
@@ -150,51 +507,47 @@ class StudyAssistant:
                 keyword_score * 0.2
             )
         
-        # Select top sentences for summary (improved selection)
-        num_sentences = max(1, min(4, len(sentences) // 3))
+        return sentence_scores
+    
+    def select_top_sentences(self, sentence_scores: Dict[int, float], num_sentences: int) -> List[int]:
+        """Indices of the highest scoring sentences, in document order"""
         top_sentences = sorted(sentence_scores.items(), key=lambda x: x[1], reverse=True)[:num_sentences]
-        top_sentences = sorted([item[0] for item in top_sentences])
-        
-        summary_sentences = [sentences[i] for i in top_sentences]
-        summary = ' '.join(summary_sentences)
-        
-        # Extract enhanced key points
-        key_points = self.extract_enhanced_key_points(sentences, sentence_scores)
+        return sorted([item[0] for item in top_sentences])
+    
+    def analyze_sentences(self, sentences: List[str]) -> Dict:
+        """Tokenize each sentence once and build document word frequencies"""
+        stop_words = self.stop_words
+        sentence_words = []
+        word_freq = Counter()
+        token_count = 0
+        counts = []
         
-        # Calculate confidence score
-        confidence = self.calculate_summary_confidence(sentence_scores, top_sentences)
+        for sentence in sentences:
+            key = hashlib.blake2b(sentence.encode('utf-8'), digest_size=16).digest()
+            artifacts = self.sentence_cache.get(key)
+            if artifacts is None:
+                tokens = word_tokenize(sentence.lower())
+                words = tuple(word for word in tokens if word.isalnum() and word not in stop_words and len(word) > 2)
+                artifacts = (len(tokens), words, readability.sentence_counts(tokens))
+                self.sentence_cache.put(key, artifacts)
+            sentence_tokens, words, sentence_counts = artifacts
+            token_count += sentence_tokens
+            word_freq.update(words)
+            sentence_words.append(list(words))
+            counts.append(sentence_counts)
         
         return {
-            "summary": summary,
-            "key_points": key_points,
-            "readability": self.get_readability_score(text),
-            "word_count": len(word_tokenize(text)),
-            "sentence_count": len(sentences),
-            "confidence": confidence,
-            "summary_ratio": round(len(summary) / len(text) * 100, 1)
+            "words": sentence_words,
+            "word_freq": word_freq,
+            "token_count": token_count,
+            "readability_counts": readability.combine(counts)
         }
     
-    def clean_text(self, text: str) -> str:
-        """Clean and normalize input text"""
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Fix common punctuation issues
-        text = re.sub(r'\s+([.!?])', r'\1', text)
-        # Ensure proper sentence spacing
-        text = re.sub(r'([.!?])\s*', r'\1 ', text)
-        return text.strip()
-    
-    def calculate_keyword_score(self, sentence: str, word_freq: Counter) -> float:
+    def calculate_keyword_score(self, words: List[str], top_keywords: set) -> float:
         """Calculate importance based on keyword density"""
-        words = word_tokenize(sentence.lower())
-        stop_words = set(stopwords.words('english'))
-        words = [word for word in words if word.isalnum() and word not in stop_words and len(word) > 2]
-        
         if not words:
             return 0
         
-        # Find top 10 most frequent words as keywords
-        top_keywords = set([word for word, freq in word_freq.most_common(10)])
         keyword_count = sum(1 for word in words if word in top_keywords)
         
         return keyword_count / len(words)
@@ -241,53 +594,62 @@ class StudyAssistant:
     
     def explain_topic(self, topic: str, difficulty_level: str = "simple") -> Dict:
         """Enhanced topic explanation with more comprehensive content"""
-        explanations = {
-            "photosynthesis": {
-                "simple": "Photosynthesis is how plants make their own food using sunlight, water, and air. Plants use their green leaves to catch sunlight and turn it into energy, just like how solar panels work! The plants breathe in carbon dioxide from the air and drink water from their roots. When sunlight hits the green parts of leaves, it helps mix these ingredients together to make sugar (food for the plant). As a bonus, plants release oxygen into the air - the same oxygen we need to breathe!",
-                "intermediate": "Photosynthesis is the process where plants convert carbon dioxide and water into glucose using chlorophyll and sunlight. This process occurs mainly in the leaves and releases oxygen as a byproduct. The green chemical chlorophyll captures light energy, which powers the chemical reactions that combine CO2 and H2O to create glucose (C6H12O6). This glucose serves as food for the plant and forms the base of most food chains on Earth.",
-                "advanced": "Photosynthesis consists of two main stages: light-dependent reactions (photo phase) occurring in thylakoids and light-independent reactions (Calvin cycle) in the chloroplast stroma. Chlorophyll absorbs photons, exciting electrons that drive ATP and NADPH production through the electron transport chain. These energy carriers power the Calvin cycle, where CO2 is fixed into organic molecules through the enzyme RuBisCO. The overall equation: 6CO2 + 6H2O + light energy → C6H12O6 + 6O2."
-            },
-            "gravity": {
-                "simple": "Gravity is the invisible force that pulls things toward the Earth. It's why when you drop a ball, it falls down instead of floating away! Everything with weight gets pulled by gravity - that's why we stay on the ground instead of floating around like astronauts in space. The bigger and heavier something is, the stronger its gravity pull. Earth is very big and heavy, so it has strong gravity that keeps everything on its surface.",
-                "intermediate": "Gravity is a fundamental force that attracts objects with mass toward each other. The more massive an object, the stronger its gravitational pull. Earth's gravity (9.8 m/s²) keeps us grounded and pulls all objects toward the planet's center. This same force keeps the Moon orbiting Earth and Earth orbiting the Sun. Gravity's strength decreases with distance - that's why astronauts experience weightlessness in space, far from Earth's gravitational influence.",
-                "advanced": "Gravity is described by Einstein's General Theory of Relativity as the curvature of spacetime caused by mass and energy. Massive objects warp the fabric of spacetime, creating what we experience as gravitational attraction. Newton's law of universal gravitation (F = G(m1×m2)/r²) provides accurate calculations for most scenarios, while Einstein's field equations describe extreme cases like black holes and gravitational waves."
-            },
-            "democracy": {
-                "simple": "Democracy is when people get to vote and choose their leaders, like choosing a class president at school! In a democracy, everyone's opinion matters and everyone gets a fair say in making important decisions. People vote for the person they think will do the best job leading them. The person who gets the most votes becomes the leader. It's like a big, fair game where everyone gets to participate and the majority decides what happens.",
-                "intermediate": "Democracy is a system of government where citizens exercise power through voting and elected representatives. Key principles include majority rule (decisions made by more than half the people), protection of minority rights, individual freedoms, and regular elections. Democratic governments have checks and balances to prevent any one person or group from having too much power. Examples include parliamentary and presidential systems.",
-                "advanced": "Democracy encompasses various forms including direct democracy (citizens vote on issues directly), representative democracy (elected officials make decisions), and deliberative democracy (emphasis on discussion and debate). It requires robust institutions: independent judiciary, free press, civil society, and constitutional protections for civil liberties. Modern democracies face challenges like political polarization, disinformation, and balancing majority rule with minority rights."
-            },
-            "evolution": {
-                "simple": "Evolution is how living things slowly change over a very long time. Just like how you grow and change as you get older, all living things - plants, animals, and even tiny germs - change over many, many years. The animals and plants that are best at surviving and having babies pass on their good traits to their children. Over millions of years, these small changes add up to make completely new types of animals and plants!",
-                "intermediate": "Evolution is the process by which species change over time through natural selection. Organisms with traits that help them survive and reproduce are more likely to pass these beneficial traits to their offspring. Over many generations, these advantageous traits become more common in the population. This process explains the diversity of life on Earth and how all living things are related through common ancestors.",
-                "advanced": "Evolution operates through several mechanisms: natural selection, genetic drift, gene flow, and mutation. Darwin's theory explains how heritable variations that improve survival and reproductive success become more frequent in populations over time. Modern synthesis incorporates genetics, showing how DNA mutations provide the raw material for evolution, while population genetics quantifies evolutionary change using mathematical models."
-            },
-            "climate change": {
-                "simple": "Climate change means the weather on Earth is changing in ways that can be harmful. It's getting warmer because of pollution, especially from cars and factories that put bad gases into the air. These gases trap heat from the sun, making Earth warmer - like being under a thick blanket. This causes problems like melting ice, changing weather patterns, and making it hard for some animals and plants to live in their homes.",
-                "intermediate": "Climate change refers to long-term shifts in global weather patterns, primarily caused by human activities that increase greenhouse gas concentrations in the atmosphere. Burning fossil fuels releases CO2, which traps heat and raises global temperatures. This leads to melting ice caps, rising sea levels, extreme weather events, and disruptions to ecosystems and agriculture. Scientists measure these changes and predict future impacts using climate models.",
-                "advanced": "Climate change involves complex feedback loops in Earth's climate system. Anthropogenic greenhouse gas emissions (primarily CO2, CH4, N2O) enhance the natural greenhouse effect, causing radiative forcing and global warming. Positive feedbacks (ice-albedo, water vapor) amplify warming, while negative feedbacks provide some stability. Climate sensitivity, tipping points, and regional variations make prediction challenging, requiring sophisticated coupled atmosphere-ocean-land models."
-            }
-        }
-        
-        topic_lower = topic.lower()
-        explanation_text = ""
+        snapshot = self.content.snapshot
+        content, match = snapshot.resolve(topic)
         
-        if topic_lower in explanations:
-            explanation_text = explanations[topic_lower].get(difficulty_level, explanations[topic_lower]["simple"])
-        else:
-            # Enhanced generic explanations using AI-like reasoning
-            explanation_text = self.generate_generic_explanation(topic, difficulty_level)
+        if content and 'explanations' in content:
+            response = self.curated_explanation(snapshot, content, difficulty_level)
+            # The cached response is shared, so the caller gets its own lists
+            return dict(response, topic=topic, difficulty_level=difficulty_level,
+                        match_confidence=match.confidence,
+                        suggested_activities=list(response['suggested_activities']),
+                        related_topics=list(response['related_topics']),
+                        key_concepts=list(response['key_concepts']))
         
+        # Enhanced generic explanations using AI-like reasoning
+        explanation_text = self.generate_generic_explanation(topic, difficulty_level)
+        response = self.build_explanation(topic, explanation_text, content)
+        response["difficulty_level"] = difficulty_level
+        response["match_confidence"] = match.confidence if match else 0.0
+        return response
+    
+    def curated_explanation(self, snapshot, content: Dict, difficulty_level: str) -> Dict:
+        """Explanation of a curated topic, built once per content snapshot"""
+        explanations = content['explanations']
+        level = difficulty_level if difficulty_level in explanations else "simple"
+        key = ('explain', content['key'], level)
+        response = snapshot.derived.get(key)
+        if response is None:
+            response = self.build_explanation(content['title'], explanations[level], content)
+            response["difficulty_level"] = level
+            response["match_confidence"] = 1.0
+            snapshot.derived[key] = response
+        return response
+    
+    def build_explanation(self, topic: str, explanation_text: str, content: Optional[Dict]) -> Dict:
         return {
             "topic": topic,
-            "difficulty_level": difficulty_level,
+            "matched_topic": content['title'] if content else None,
+            "difficulty_level": None,
+            "match_confidence": 0.0,
             "explanation": explanation_text,
-            "suggested_activities": self.get_suggested_activities(topic),
-            "related_topics": self.get_related_topics(topic),
+            "suggested_activities": self.get_suggested_activities(topic, content),
+            "related_topics": self.get_related_topics(topic, content),
             "estimated_reading_time": self.estimate_reading_time(explanation_text),
             "key_concepts": self.extract_key_concepts(explanation_text)
         }
     
+    def precompute_explanations(self) -> int:
+        """Build every curated (topic, level) explanation ahead of the first request"""
+        snapshot = self.content.snapshot
+        count = 0
+        for key in snapshot.canonical_topics():
+            content = snapshot.topics[key]
+            for level in content.get('explanations', {}):
+                self.curated_explanation(snapshot, content, level)
+                count += 1
+        return count
+    
     def generate_generic_explanation(self, topic: str, difficulty_level: str) -> str:
         """Generate explanations for topics not in the database"""
         if difficulty_level == "simple":
@@ -309,7 +671,7 @@ class StudyAssistant:
     def extract_key_concepts(self, text: str) -> List[str]:
         """Extract key concepts from explanation text"""
         # Simple keyword extraction based on word frequency and importance
-        stop_words = set(stopwords.words('english'))
+        stop_words = self.stop_words
         words = word_tokenize(text.lower())
         words = [word for word in words if word.isalnum() and word not in stop_words and len(word) > 3]
         
@@ -319,49 +681,12 @@ class StudyAssistant:
         
         return key_concepts[:4]  # Limit to 4 key concepts
     
-    def get_suggested_activities(self, topic: str) -> List[str]:
+    def get_suggested_activities(self, topic: str, content: Optional[Dict] = None) -> List[str]:
         """Enhanced suggested learning activities for topics"""
-        activities = {
-            "photosynthesis": [
-                "🌱 Grow plants in different light conditions and observe differences",
-                "🔬 Create a simple experiment with aquatic plants producing oxygen bubbles",
-                "🎨 Draw and label a detailed diagram of photosynthesis process",
-                "📱 Use a light meter app to measure light intensity in different locations",
-                "🍃 Collect different types of leaves and examine their green chlorophyll"
-            ],
-            "gravity": [
-                "🏀 Drop different objects from the same height and time their fall",
-                "⚖️ Build a simple pendulum and observe its motion patterns",
-                "🌍 Research how gravity affects different planets and their moons",
-                "🚀 Watch videos of astronauts in zero gravity and compare to Earth",
-                "📐 Calculate the gravitational force between different objects"
-            ],
-            "democracy": [
-                "🗳️ Organize a class election with proper voting procedures",
-                "📊 Research and compare different voting systems worldwide",
-                "🏛️ Visit local government buildings or attend town hall meetings",
-                "📰 Follow a current political issue and track different viewpoints",
-                "🎭 Role-play different government systems and their decision-making"
-            ],
-            "evolution": [
-                "🦴 Examine fossil records and create an evolutionary timeline",
-                "🔬 Observe fruit flies or bacteria to see rapid generation changes",
-                "🌳 Create a family tree showing how species might be related",
-                "🧬 Learn about DNA and how mutations provide variation",
-                "🐦 Study Darwin's finches and their beak adaptations"
-            ],
-            "climate change": [
-                "🌡️ Track local temperature and weather patterns over time",
-                "📊 Analyze global climate data and create graphs",
-                "♻️ Calculate your carbon footprint and find reduction strategies",
-                "🌊 Research sea level changes and their impact on coastal areas",
-                "🌿 Plant trees or start a school garden to offset carbon"
-            ]
-        }
-        
-        topic_lower = topic.lower()
-        if topic_lower in activities:
-            return activities[topic_lower]
+        content = content or self.content.resolve(topic)[0]
+        if content and 'activities' in content:
+            # A copy: the content snapshot is shared by every request
+            return list(content['activities'])
         
         # Generate generic activities based on topic type
         return [
@@ -373,212 +698,47 @@ class StudyAssistant:
             f"🧪 Look for hands-on experiments or activities related to {topic}"
         ]
     
-    def get_related_topics(self, topic: str) -> List[str]:
+    def get_related_topics(self, topic: str, content: Optional[Dict] = None) -> List[str]:
         """Enhanced related topics with more comprehensive connections"""
-        related = {
-            "photosynthesis": [
-                "Cellular Respiration", "Chlorophyll", "Plant Biology", "Ecosystems", 
-                "Carbon Cycle", "Food Chains", "Solar Energy", "Biochemistry"
-            ],
-            "gravity": [
-                "Physics", "Newton's Laws", "Motion", "Astronomy", "Space Exploration",
-                "Planetary Science", "Einstein's Relativity", "Force and Energy"
-            ],
-            "democracy": [
-                "Government Systems", "Voting Rights", "Civil Rights", "Political Science",
-                "Constitution", "Elections", "Citizenship", "Rule of Law"
-            ],
-            "evolution": [
-                "Natural Selection", "Genetics", "Adaptation", "Species", "DNA",
-                "Fossils", "Biodiversity", "Charles Darwin", "Molecular Biology"
-            ],
-            "climate change": [
-                "Global Warming", "Greenhouse Effect", "Renewable Energy", "Weather Patterns",
-                "Ocean Currents", "Biodiversity Loss", "Sustainability", "Carbon Footprint"
-            ]
-        }
-        return related.get(topic.lower(), [
+        content = content or self.content.resolve(topic)[0]
+        if content and 'related' in content:
+            return list(content['related'])
+        return [
             "Scientific Method", "Research Skills", "Critical Thinking", "Data Analysis"
-        ])
+        ]
     
-    def generate_quiz(self, topic: str, num_questions: int = 5) -> Dict:
+    def generate_quiz(self, topic: str, num_questions: int = 5, seed: Optional[int] = None,
+                      student_id: Optional[str] = None) -> Dict:
         """Enhanced quiz generation with improved question quality"""
-        quiz_bank = {
-            "photosynthesis": [
-                {
-                    "question": "What are the main ingredients plants need for photosynthesis?",
-                    "options": ["Sunlight, water, carbon dioxide", "Only water and soil", "Only sunlight and air", "Soil, fertilizer, and water"],
-                    "correct": 0,
-                    "explanation": "Plants need three main ingredients: sunlight for energy, water from their roots, and carbon dioxide from the air to make glucose.",
-                    "difficulty": "easy"
-                },
-                {
-                    "question": "What gas do plants release during photosynthesis?",
-                    "options": ["Carbon dioxide", "Nitrogen", "Oxygen", "Hydrogen"],
-                    "correct": 2,
-                    "explanation": "Plants release oxygen (O2) as a beneficial byproduct of photosynthesis, which is essential for most life on Earth.",
-                    "difficulty": "easy"
-                },
-                {
-                    "question": "Where in the plant cell does photosynthesis mainly occur?",
-                    "options": ["Nucleus", "Mitochondria", "Chloroplasts", "Cell wall"],
-                    "correct": 2,
-                    "explanation": "Photosynthesis occurs in chloroplasts, which contain chlorophyll that captures light energy.",
-                    "difficulty": "medium"
-                },
-                {
-                    "question": "What is the chemical equation for photosynthesis?",
-                    "options": ["6CO2 + 6H2O + energy → C6H12O6 + 6O2", "CO2 + H2O → glucose", "O2 + H2O → CO2 + glucose", "C6H12O6 → CO2 + H2O"],
-                    "correct": 0,
-                    "explanation": "The balanced equation shows 6 molecules of CO2 plus 6 molecules of water plus light energy produce glucose and 6 molecules of oxygen.",
-                    "difficulty": "hard"
-                },
-                {
-                    "question": "What role does chlorophyll play in photosynthesis?",
-                    "options": ["Stores water", "Captures light energy", "Produces oxygen", "Creates carbon dioxide"],
-                    "correct": 1,
-                    "explanation": "Chlorophyll is the green pigment that absorbs light energy, which powers the photosynthesis process.",
-                    "difficulty": "medium"
-                }
-            ],
-            "gravity": [
-                {
-                    "question": "What happens when you drop an object on Earth?",
-                    "options": ["It floats in the air", "It falls toward the ground", "It moves sideways", "It disappears"],
-                    "correct": 1,
-                    "explanation": "Gravity pulls objects toward Earth's center, making them fall downward when dropped.",
-                    "difficulty": "easy"
-                },
-                {
-                    "question": "Which celestial body has stronger gravity?",
-                    "options": ["Moon", "Earth", "They're exactly the same", "It depends on the weather"],
-                    "correct": 1,
-                    "explanation": "Earth has much stronger gravity than the Moon because Earth has much more mass (about 81 times more massive).",
-                    "difficulty": "easy"
-                },
-                {
-                    "question": "What is Earth's approximate gravitational acceleration?",
-                    "options": ["5.8 m/s²", "9.8 m/s²", "15.2 m/s²", "20.1 m/s²"],
-                    "correct": 1,
-                    "explanation": "Earth's gravitational acceleration is approximately 9.8 meters per second squared (9.8 m/s²).",
-                    "difficulty": "medium"
-                },
-                {
-                    "question": "According to Einstein's theory, what causes gravity?",
-                    "options": ["Magnetic fields", "Curved spacetime", "Electric charges", "Air pressure"],
-                    "correct": 1,
-                    "explanation": "Einstein's General Relativity explains gravity as the curvature of spacetime caused by mass and energy.",
-                    "difficulty": "hard"
-                },
-                {
-                    "question": "How does distance affect gravitational force?",
-                    "options": ["Force increases with distance", "Force decreases with distance squared", "Distance doesn't matter", "Force only depends on mass"],
-                    "correct": 1,
-                    "explanation": "Gravitational force decreases with the square of the distance between objects (inverse square law).",
-                    "difficulty": "medium"
-                }
-            ],
-            "democracy": [
-                {
-                    "question": "In a democracy, who has the power to choose leaders?",
-                    "options": ["The king or queen", "The citizens through voting", "The military", "Only wealthy people"],
-                    "correct": 1,
-                    "explanation": "In a democracy, all eligible citizens have the right to vote and choose their representatives and leaders.",
-                    "difficulty": "easy"
-                },
-                {
-                    "question": "What is the main purpose of voting in a democracy?",
-                    "options": ["To make money", "To choose leaders and make decisions", "To have fun", "To create problems"],
-                    "correct": 1,
-                    "explanation": "Voting allows citizens to participate in government by choosing leaders and sometimes deciding on important issues directly.",
-                    "difficulty": "easy"
-                },
-                {
-                    "question": "What principle protects the rights of people who didn't win an election?",
-                    "options": ["Majority rule only", "Minority rights protection", "Winner takes all", "Popular vote"],
-                    "correct": 1,
-                    "explanation": "Democratic systems protect minority rights to ensure that losing groups still have fundamental freedoms and representation.",
-                    "difficulty": "medium"
-                },
-                {
-                    "question": "What is the difference between direct and representative democracy?",
-                    "options": ["No difference", "Direct means citizens vote on issues; representative means elected officials decide", "Direct is only for small countries", "Representative is older"],
-                    "correct": 1,
-                    "explanation": "Direct democracy has citizens vote directly on issues, while representative democracy has elected officials make decisions on behalf of citizens.",
-                    "difficulty": "medium"
-                },
-                {
-                    "question": "What are 'checks and balances' in a democratic system?",
-                    "options": ["Banking regulations", "Ways to prevent any one branch of government from becoming too powerful", "Voting procedures", "Economic policies"],
-                    "correct": 1,
-                    "explanation": "Checks and balances ensure that different branches of government (executive, legislative, judicial) can limit each other's power.",
-                    "difficulty": "hard"
-                }
-            ],
-            "evolution": [
-                {
-                    "question": "What is natural selection?",
-                    "options": ["Animals choosing their habitat", "Survival and reproduction of organisms with helpful traits", "Humans selecting pets", "Plants growing toward light"],
-                    "correct": 1,
-                    "explanation": "Natural selection is the process where organisms with traits that help survival and reproduction become more common over time.",
-                    "difficulty": "medium"
-                },
-                {
-                    "question": "Who developed the theory of evolution by natural selection?",
-                    "options": ["Albert Einstein", "Charles Darwin", "Isaac Newton", "Gregor Mendel"],
-                    "correct": 1,
-                    "explanation": "Charles Darwin developed the theory of evolution by natural selection, published in 'On the Origin of Species' in 1859.",
-                    "difficulty": "easy"
-                },
-                {
-                    "question": "What provides the variation that evolution acts upon?",
-                    "options": ["Environmental changes", "Genetic mutations", "Learning", "Diet"],
-                    "correct": 1,
-                    "explanation": "Genetic mutations create the variation in traits that natural selection can then act upon over generations.",
-                    "difficulty": "medium"
-                }
-            ],
-            "climate change": [
-                {
-                    "question": "What is the main cause of current climate change?",
-                    "options": ["Natural weather cycles", "Human activities releasing greenhouse gases", "Solar activity", "Volcanic eruptions"],
-                    "correct": 1,
-                    "explanation": "Scientific evidence shows that current climate change is primarily caused by human activities that increase greenhouse gas concentrations.",
-                    "difficulty": "medium"
-                },
-                {
-                    "question": "Which gas is the most significant contributor to human-caused climate change?",
-                    "options": ["Oxygen", "Carbon dioxide", "Nitrogen", "Helium"],
-                    "correct": 1,
-                    "explanation": "Carbon dioxide (CO2) from burning fossil fuels is the largest single contributor to human-caused climate change.",
-                    "difficulty": "easy"
-                },
-                {
-                    "question": "What is the greenhouse effect?",
-                    "options": ["Growing plants in greenhouses", "Gases in the atmosphere trapping heat", "Green energy production", "Plant photosynthesis"],
-                    "correct": 1,
-                    "explanation": "The greenhouse effect occurs when certain gases in the atmosphere trap heat from the sun, warming the planet.",
-                    "difficulty": "medium"
-                }
-            ]
-        }
-        
-        topic_lower = topic.lower()
-        if topic_lower not in quiz_bank:
-            # Generate adaptive questions for unknown topics
-            questions = self.generate_adaptive_questions(topic, num_questions)
+        content, match = self.content.resolve(topic)
+        if content and content.get('quiz'):
+            bank = content['quiz_bank']
         else:
-            questions = quiz_bank[topic_lower]
+            # Generate adaptive questions for unknown topics
+            bank = QuizBank(self.generate_adaptive_questions(topic, num_questions))
         
-        # Intelligent question selection based on difficulty progression
-        selected_questions = self.select_optimal_questions(questions, num_questions)
+        # Intelligent question selection based on difficulty progression;
+        # the same seed always gives the same quiz
+        rng = random.Random(seed) if seed is not None else None
+        selected_questions = bank.select(num_questions, rng)
         
         quiz_id = str(uuid.uuid4())
+        # Answers are graded against the stored questions, not ones sent back
+        # by the client, and only for the student the quiz was generated for
+        # answered maps each question answered through /check_answer to the
+        # selected option, so that it only counts once
+        self.quiz_sessions.put(quiz_id, {'topic': topic, 'questions': selected_questions, 'student_id': student_id,
+                                         'answered': {}})
         
         return {
             "quiz_id": quiz_id,
             "topic": topic,
-            "questions": selected_questions,
+            "matched_topic": content['title'] if content else None,
+            "match_confidence": match.confidence if match else 0.0,
+            # The answer key, and the explanations that give it away, are
+            # only sent back once the quiz is graded
+            "questions": [{key: value for key, value in question.items() if key not in ('correct', 'explanation')}
+                          for question in selected_questions],
             "total_questions": len(selected_questions),
             "estimated_time": f"{len(selected_questions) * 2} minutes",
             "difficulty_distribution": self.analyze_difficulty_distribution(selected_questions)
@@ -611,39 +771,10 @@ class StudyAssistant:
         ]
         return base_questions[:num_questions]
     
-    def select_optimal_questions(self, questions: List[Dict], num_questions: int) -> List[Dict]:
+    def select_optimal_questions(self, questions: List[Dict], num_questions: int,
+                                 rng: Optional[random.Random] = None) -> List[Dict]:
         """Select questions with optimal difficulty progression"""
-        if len(questions) <= num_questions:
-            return questions
-        
-        # Sort by difficulty
-        difficulty_order = {"easy": 1, "medium": 2, "hard": 3}
-        sorted_questions = sorted(questions, key=lambda q: difficulty_order.get(q.get("difficulty", "medium"), 2))
-        
-        # Select with balanced difficulty
-        selected = []
-        easy_count = max(1, num_questions // 3)
-        medium_count = max(1, num_questions // 3)
-        hard_count = num_questions - easy_count - medium_count
-        
-        easy_questions = [q for q in sorted_questions if q.get("difficulty") == "easy"]
-        medium_questions = [q for q in sorted_questions if q.get("difficulty") == "medium"]
-        hard_questions = [q for q in sorted_questions if q.get("difficulty") == "hard"]
-        
-        import random
-        selected.extend(random.sample(easy_questions, min(easy_count, len(easy_questions))))
-        selected.extend(random.sample(medium_questions, min(medium_count, len(medium_questions))))
-        selected.extend(random.sample(hard_questions, min(hard_count, len(hard_questions))))
-        
-        # Fill remaining spots if needed
-        while len(selected) < num_questions and len(selected) < len(questions):
-            remaining = [q for q in questions if q not in selected]
-            if remaining:
-                selected.append(random.choice(remaining))
-        
-        # Shuffle final order
-        random.shuffle(selected)
-        return selected[:num_questions]
+        return QuizBank(questions).select(num_questions, rng)
     
     def analyze_difficulty_distribution(self, questions: List[Dict]) -> Dict:
         """Analyze the difficulty distribution of selected questions"""
@@ -653,6 +784,44 @@ class StudyAssistant:
             distribution[difficulty] += 1
         return distribution
     
+    def grade_quiz(self, quiz_id: str, answers: List[Optional[int]],
+                   student_id: Optional[str] = None) -> Optional[Tuple[Dict, List[Dict]]]:
+        """Grade a whole quiz session for the student it was generated for; each quiz can be submitted once.
+        
+        Questions already answered through /check_answer keep that answer.
+        Returns the graded quiz and the results of the other questions,
+        which are the ones still to be recorded.
+        """
+        with self.quiz_lock:
+            quiz = self.quiz_sessions.get(quiz_id)
+            if quiz is None or quiz['student_id'] != student_id:
+                return None
+            self.quiz_sessions.pop(quiz_id)
+        results = []
+        new_results = []
+        for index, question in enumerate(quiz['questions']):
+            answered = index in quiz['answered']
+            selected = quiz['answered'][index] if answered else answers[index] if index < len(answers) else None
+            if selected is None:
+                continue
+            result = self.check_quiz_answer(index, selected, question['correct'])
+            result['question_index'] = index
+            result['explanation'] = question.get('explanation', '')
+            results.append(result)
+            if not answered:
+                new_results.append(result)
+        score = sum(1 for result in results if result['is_correct'])
+        total = len(quiz['questions'])
+        return {
+            "quiz_id": quiz_id,
+            "topic": quiz['topic'],
+            "results": results,
+            "score": score,
+            "answered": len(results),
+            "total_questions": total,
+            "percentage": round(score / total * 100, 1) if total else 0.0
+        }, new_results
+    
     def check_quiz_answer(self, question_index: int, selected_answer: int, correct_answer: int) -> Dict:
         """Check if quiz answer is correct"""
         is_correct = selected_answer == correct_answer
@@ -662,32 +831,35 @@ class StudyAssistant:
             "correct": correct_answer
         }
     
-    def get_readability_score(self, text: str) -> Dict:
-        """Calculate readability scores for text"""
+    def reading_level(self, flesch_reading_ease: float) -> str:
+        """Map a Flesch reading ease score to a reading level"""
+        if flesch_reading_ease >= 90:
+            return "Very Easy"
+        elif flesch_reading_ease >= 80:
+            return "Easy"
+        elif flesch_reading_ease >= 70:
+            return "Fairly Easy"
+        elif flesch_reading_ease >= 60:
+            return "Standard"
+        elif flesch_reading_ease >= 50:
+            return "Fairly Difficult"
+        elif flesch_reading_ease >= 30:
+            return "Difficult"
+        else:
+            return "Very Difficult"
+    
+    def get_readability_score(self, text: str, counts: Optional[readability.TextCounts] = None) -> Dict:
+        """Calculate readability scores for text, reusing its sentence, word and syllable counts if known"""
         try:
-            flesch_reading_ease = textstat.flesch_reading_ease(text)
-            flesch_kincaid_grade = textstat.flesch_kincaid_grade(text)
-            
-            # Determine reading level
-            if flesch_reading_ease >= 90:
-                level = "Very Easy"
-            elif flesch_reading_ease >= 80:
-                level = "Easy"
-            elif flesch_reading_ease >= 70:
-                level = "Fairly Easy"
-            elif flesch_reading_ease >= 60:
-                level = "Standard"
-            elif flesch_reading_ease >= 50:
-                level = "Fairly Difficult"
-            elif flesch_reading_ease >= 30:
-                level = "Difficult"
-            else:
-                level = "Very Difficult"
+            if counts is None:
+                counts = readability.text_counts(text)
+            flesch_reading_ease = readability.flesch_reading_ease(counts)
+            flesch_kincaid_grade = readability.flesch_kincaid_grade(counts)
             
             return {
                 "flesch_reading_ease": round(flesch_reading_ease, 1),
                 "flesch_kincaid_grade": round(flesch_kincaid_grade, 1),
-                "reading_level": level
+                "reading_level": self.reading_level(flesch_reading_ease)
             }
         except:
             return {
@@ -696,8 +868,132 @@ class StudyAssistant:
                 "reading_level": "Unknown"
             }
 
-# Initialize the study assistant
-study_assistant = StudyAssistant()
+# Summarization is CPU-bound, so batches are fanned out to worker processes
+_summary_pool = None
+_summary_pool_lock = threading.Lock()
+_worker_assistant = None
+
+def _init_summary_worker():
+    """Load NLTK data once when a pool worker starts"""
+    global _worker_assistant
+    nlp.preload()
+    _worker_assistant = StudyAssistant(store=DictMemoryStore())
+
+def _summarize_in_worker(text: str, engine: str) -> Dict:
+    """Summarize one cleaned document inside a pool worker"""
+    try:
+        return _worker_assistant.summarize_clean_text(text, engine)
+    except Exception as e:
+        return {"error": f"Summarization failed: {e}"}
+
+def get_summary_pool() -> ProcessPoolExecutor:
+    """Create the summary process pool on first use, sized to the CPU count"""
+    global _summary_pool
+    with _summary_pool_lock:
+        if _summary_pool is None:
+            workers = int(os.environ.get('SUMMARY_WORKERS', 0)) or os.cpu_count() or 1
+            # Forking a threaded server would copy locks held by other
+            # threads (metrics, store stripes) into the workers, locked
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _summary_pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                initializer=_init_summary_worker)
+            atexit.register(_summary_pool.shutdown)
+        return _summary_pool
+
+def reset_summary_pool(broken: ProcessPoolExecutor):
+    """Drop a pool whose worker died, so the next get_summary_pool starts a new one"""
+    global _summary_pool
+    with _summary_pool_lock:
+        if _summary_pool is broken:
+            _summary_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+# The study assistant is built on first use, so importing this module
+# doesn't read the memory store
+_study_assistant = None
+_study_assistant_lock = threading.Lock()
+
+def get_study_assistant() -> StudyAssistant:
+    global _study_assistant
+    if _study_assistant is None:
+        with _study_assistant_lock:
+            if _study_assistant is None:
+                _study_assistant = StudyAssistant()
+    return _study_assistant
+
+def warm_up():
+    """Build the assistant, load NLTK data and precompute curated explanations before serving requests"""
+    nlp.preload()
+    get_study_assistant().precompute_explanations()
+
+study_assistant = LocalProxy(get_study_assistant)
+
+def record_request(route: str, method: str, status: int, seconds: float):
+    """Request metrics for a served request, under its route pattern"""
+    metrics.REQUEST_LATENCY.observe(seconds, route=route, method=method)
+    metrics.REQUESTS.inc(route=route, method=method, status=status)
+    if status >= 400:
+        metrics.REQUEST_ERRORS.inc(route=route, method=method)
+
+def api_response(handler, data=None):
+    """Run a StudyAssistant.handle_* method for the current request"""
+    student_id = study_assistant.get_student_id(session.get('session_id', ''))
+    status, payload = handler(student_id, data if data is not None else request.get_json())
+    return jsonify(payload), status
+
+# Monitoring endpoints are never profiled themselves
+UNPROFILED_ENDPOINTS = {'get_metrics', 'list_profiles', 'get_profile'}
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if request.endpoint not in UNPROFILED_ENDPOINTS:
+        g.profile = profiler.start(request.headers)
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    run = g.pop('profile', None)
+    if run is not None:
+        response.headers['X-Profile-Id'] = profiler.profile_id(run, route)
+        if response.is_streamed:
+            # The body is generated after this hook returns, so the profile
+            # is finished once the server has sent it
+            method, status = request.method, response.status_code
+            response.call_on_close(lambda: profiler.finish(run, route, method, status))
+        else:
+            profiler.finish(run, route, request.method, response.status_code)
+    start = g.pop('request_start', None)
+    if start is not None:
+        record_request(route, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
+@app.teardown_request
+def stop_unfinished_profile(exc):
+    # A request that failed before after_request still releases the profiler
+    run = g.pop('profile', None)
+    if run is not None:
+        profiler.stop(run)
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/profiles')
+def list_profiles():
+    # Without the profiling token the endpoint doesn't exist
+    if not profiler.authorized(request.headers):
+        return jsonify({"error": "Not found"}), 404
+    return jsonify({'profiles': profiler.profiles()})
+
+@app.route('/profiles/<profile_id>')
+def get_profile(profile_id):
+    path = profiler.path(profile_id) if profiler.authorized(request.headers) else None
+    if path is None:
+        return jsonify({"error": "Not found"}), 404
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f"{profile_id}.prof")
 
 @app.route('/')
 def index():
@@ -705,142 +1001,105 @@ def index():
 
 @app.route('/summarize', methods=['POST'])
 def summarize():
+    return api_response(study_assistant.handle_summarize)
+
+@app.route('/summarize/batch', methods=['POST'])
+def summarize_batch():
     data = request.get_json()
-    text = data.get('text', '')
+    documents = data.get('documents', [])
+    max_documents = int(os.environ.get('SUMMARY_BATCH_MAX_DOCUMENTS', 50))
     
-    if not text:
-        return jsonify({"error": "Please provide text to summarize"}), 400
+    if not isinstance(documents, list) or not documents:
+        return jsonify({"error": "Please provide a list of documents to summarize"}), 400
+    if len(documents) > max_documents:
+        return jsonify({"error": f"A batch can contain at most {max_documents} documents"}), 400
+    
+    # Documents may be plain strings or {"id": ..., "text": ...} objects
+    texts = [doc.get('text', '') if isinstance(doc, dict) else doc for doc in documents]
     
     student_id = study_assistant.get_student_id(session.get('session_id', ''))
-    result = study_assistant.summarize_text(text)
+    results = study_assistant.summarize_batch(texts)
+    
+    summarized = []
+    for i, (doc, text, result) in enumerate(zip(documents, texts, results)):
+        result["index"] = i
+        if isinstance(doc, dict) and 'id' in doc:
+            result["id"] = doc['id']
+        if "error" not in result:
+            summarized.append((InteractionKind.SUMMARIZED_TEXT, 'text_summarization', text[:100]))
     
-    # Add to memory
-    study_assistant.add_to_memory(
-        student_id, 
-        'summarization', 
-        f"Summarized text: {text[:100]}...",
-        'text_summarization'
-    )
+    # Add to memory in one store commit
+    study_assistant.add_many_to_memory(student_id, summarized)
     
-    return jsonify(result)
+    return jsonify({
+        "results": results,
+        "total_documents": len(results),
+        "failed": sum(1 for result in results if "error" in result)
+    })
 
-@app.route('/explain', methods=['POST'])
-def explain():
-    data = request.get_json()
-    topic = data.get('topic', '')
-    difficulty = data.get('difficulty', 'simple')
+@app.route('/summarize/upload', methods=['POST'])
+def summarize_upload():
+    """Summarize a large document as a stream of NDJSON events.
     
-    if not topic:
-        return jsonify({"error": "Please provide a topic to explain"}), 400
+    Accepts a multipart form with a ``file`` field or a raw text body. The
+    response has one JSON object per line: a ``section`` and a ``progress``
+    event per section, then a final ``summary`` event.
+    """
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    name = upload.filename if upload else 'uploaded text'
+    
+    try:
+        path = spool_to_tempfile(stream, int(os.environ.get('UPLOAD_MAX_BYTES', 50 * 1024 * 1024)))
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    if os.path.getsize(path) == 0:
+        os.unlink(path)
+        return jsonify({"error": "Please provide text to summarize"}), 400
     
     student_id = study_assistant.get_student_id(session.get('session_id', ''))
-    result = study_assistant.explain_topic(topic, difficulty)
+    section_chars = int(os.environ.get('UPLOAD_SECTION_CHARS', 20000))
     
-    # Add to memory
-    study_assistant.add_to_memory(
-        student_id,
-        'explanation',
-        f"Explained {topic} at {difficulty} level",
-        topic
-    )
+    def generate():
+        for event in summarize_sections(study_assistant, path, section_chars):
+            if event["type"] == "summary":
+                study_assistant.add_to_memory(
+                    student_id,
+                    InteractionKind.SUMMARIZED_FILE,
+                    'text_summarization',
+                    (name, event['word_count'])
+                )
+            yield json.dumps(event, ensure_ascii=False) + '\n'
     
-    return jsonify(result)
+    response = Response(generate(), mimetype='application/x-ndjson')
+    response.call_on_close(lambda: os.path.exists(path) and os.unlink(path))
+    return response
+
+@app.route('/explain', methods=['POST'])
+def explain():
+    return api_response(study_assistant.handle_explain)
 
 @app.route('/quiz', methods=['POST'])
 def generate_quiz():
-    data = request.get_json()
-    topic = data.get('topic', '')
-    num_questions = data.get('num_questions', 5)
-    
-    if not topic:
-        return jsonify({"error": "Please provide a topic for the quiz"}), 400
-    
-    student_id = study_assistant.get_student_id(session.get('session_id', ''))
-    result = study_assistant.generate_quiz(topic, num_questions)
-    
-    # Add to memory
-    study_assistant.add_to_memory(
-        student_id,
-        'quiz_generation',
-        f"Generated quiz for {topic} with {num_questions} questions",
-        topic
-    )
-    
-    return jsonify(result)
+    return api_response(study_assistant.handle_quiz)
 
 @app.route('/check_answer', methods=['POST'])
 def check_answer():
-    data = request.get_json()
-    question_index = data.get('question_index', 0)
-    selected_answer = data.get('selected_answer', 0)
-    correct_answer = data.get('correct_answer', 0)
-    topic = data.get('topic', '')
-    
-    student_id = study_assistant.get_student_id(session.get('session_id', ''))
-    result = study_assistant.check_quiz_answer(question_index, selected_answer, correct_answer)
-    
-    # Add to memory
-    study_assistant.add_to_memory(
-        student_id,
-        'quiz_answer',
-        f"Answered question {question_index}: {'correct' if result['is_correct'] else 'incorrect'}",
-        topic
-    )
-    
-    # Update quiz performance in memory
-    if student_id in study_assistant.memory:
-        if topic not in study_assistant.memory[student_id]['quiz_performance']:
-            study_assistant.memory[student_id]['quiz_performance'][topic] = {'correct': 0, 'total': 0}
-        
-        study_assistant.memory[student_id]['quiz_performance'][topic]['total'] += 1
-        if result['is_correct']:
-            study_assistant.memory[student_id]['quiz_performance'][topic]['correct'] += 1
-        
-        study_assistant.save_memory()
-    
-    return jsonify(result)
+    return api_response(study_assistant.handle_check_answer)
+
+@app.route('/check_answers', methods=['POST'])
+def check_answers():
+    return api_response(study_assistant.handle_check_answers)
 
 @app.route('/memory')
 def get_memory():
-    student_id = study_assistant.get_student_id(session.get('session_id', ''))
-    history = study_assistant.get_student_history(student_id)
-    
-    # Format the response for better presentation
-    formatted_history = {
-        'total_interactions': len(history.get('interactions', [])),
-        'topics_studied': history.get('topics_studied', {}),
-        'quiz_performance': history.get('quiz_performance', {}),
-        'recent_interactions': history.get('interactions', [])[-10:]  # Last 10 interactions
-    }
-    
-    return jsonify(formatted_history)
+    return api_response(study_assistant.handle_memory, {})
 
 @app.route('/recommendations')
 def get_recommendations():
-    student_id = study_assistant.get_student_id(session.get('session_id', ''))
-    history = study_assistant.get_student_history(student_id)
-    
-    recommendations = []
-    
-    # Analyze quiz performance
-    quiz_performance = history.get('quiz_performance', {})
-    for topic, performance in quiz_performance.items():
-        accuracy = performance['correct'] / performance['total'] if performance['total'] > 0 else 0
-        if accuracy < 0.7:  # Less than 70% accuracy
-            recommendations.append(f"Consider reviewing {topic} - current accuracy: {accuracy:.1%}")
-    
-    # Suggest new topics based on studied topics
-    topics_studied = history.get('topics_studied', {})
-    if 'photosynthesis' in topics_studied and 'cellular respiration' not in topics_studied:
-        recommendations.append("Since you studied photosynthesis, you might enjoy learning about cellular respiration!")
-    
-    if 'gravity' in topics_studied and 'motion' not in topics_studied:
-        recommendations.append("You've studied gravity - motion and Newton's laws would be great next topics!")
-    
-    if not recommendations:
-        recommendations.append("Keep up the great work! Try exploring new topics or taking more quizzes.")
-    
-    return jsonify({'recommendations': recommendations})
+    return api_response(study_assistant.handle_recommendations, {})
 
 if __name__ == '__main__':
+    if os.environ.get('PRELOAD', '').lower() in ('1', 'true', 'yes'):
+        warm_up()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,365 @@
+"""
+Async (ASGI) serving mode.
+
+Run with an ASGI server, for example:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+The JSON API routes are served on the event loop. Summarization runs on
+the summary process pool, and memory store reads and writes run on a
+thread pool and are awaited. A slow summary or disk write therefore
+never holds up other connections, and the number of open connections
+is not limited by a thread count. Every other route (the page, uploads,
+/metrics, /profiles) is passed to the Flask app on its own thread pool.
+Responses are streamed back as the app produces them.
+
+The JSON API routes run the same StudyAssistant.handle_* methods as the
+Flask views; only summarizing is done differently, on the process pool.
+They are profiled and counted in the request metrics like the Flask
+routes. A profiled request is served entirely on a store pool thread,
+since cProfile only sees the thread it runs on.
+
+Both modes share Flask's signed session cookie and the same memory
+store, so students keep their history when switching between them.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+
+from werkzeug.datastructures import Headers
+
+from app import (_summarize_in_worker, app, get_study_assistant, get_summary_pool, profiler, record_request,
+                 reset_summary_pool, warm_up)
+
+logger = logging.getLogger(__name__)
+
+# Memory store reads and writes
+STORE_THREADS = int(os.environ.get('ASYNC_STORE_THREADS', 8))
+# Requests handed to the Flask app
+WSGI_THREADS = int(os.environ.get('ASYNC_WSGI_THREADS', 8))
+# Request bodies for the Flask app are kept in memory up to this size,
+# then spooled to a temporary file
+SPOOL_BYTES = 1024 * 1024
+
+_store_pool = ThreadPoolExecutor(max_workers=STORE_THREADS, thread_name_prefix='store')
+_wsgi_pool = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='wsgi')
+
+
+class Session:
+    """Flask's signed cookie session, read and written outside Flask"""
+
+    def __init__(self, headers: Dict[bytes, bytes]):
+        self.serializer = app.session_interface.get_signing_serializer(app)
+        self.data = {}
+        self.modified = False
+        cookie = _cookies(headers).get(app.config['SESSION_COOKIE_NAME'])
+        if cookie and self.serializer is not None:
+            try:
+                self.data = self.serializer.loads(cookie, max_age=int(app.permanent_session_lifetime.total_seconds()))
+            except Exception:
+                self.data = {}
+
+    def student_id(self) -> str:
+        """Get or create the student ID, as StudyAssistant.get_student_id does"""
+        if 'student_id' not in self.data:
+            self.data['student_id'] = str(uuid.uuid4())
+            self.modified = True
+        return self.data['student_id']
+
+    def set_cookie(self) -> Optional[Tuple[bytes, bytes]]:
+        if not self.modified or self.serializer is None:
+            return None
+        parts = [f"{app.config['SESSION_COOKIE_NAME']}={self.serializer.dumps(self.data)}",
+                 f"Path={app.config['SESSION_COOKIE_PATH'] or '/'}"]
+        if app.config['SESSION_COOKIE_HTTPONLY']:
+            parts.append('HttpOnly')
+        if app.config['SESSION_COOKIE_SECURE']:
+            parts.append('Secure')
+        if app.config['SESSION_COOKIE_SAMESITE']:
+            parts.append(f"SameSite={app.config['SESSION_COOKIE_SAMESITE']}")
+        return b'set-cookie', '; '.join(parts).encode('latin-1')
+
+
+def _cookies(headers: Dict[bytes, bytes]) -> Dict[str, str]:
+    cookies = {}
+    for part in headers.get(b'cookie', b'').decode('latin-1').split(';'):
+        name, _, value = part.strip().partition('=')
+        if name:
+            cookies[name] = value
+    return cookies
+
+
+async def _blocking(executor, func: Callable, *args):
+    """Run a blocking call on an executor without blocking the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+async def summarize_text(assistant, text: str) -> Dict:
+    """StudyAssistant.summarize_text with the summarizing done on the process pool"""
+    if not text.strip():
+        return {"error": "Please provide text to summarize"}
+    text = assistant.clean_text(text)
+    cache_key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    cached = assistant.summary_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+    result = None
+    # A pool whose worker died is replaced and the document tried once more
+    for attempt in range(2):
+        pool = get_summary_pool()
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(pool.submit(_summarize_in_worker, text, assistant.summary_engine)),
+                assistant.summary_timeout
+            )
+            break
+        except BrokenProcessPool:
+            logger.warning("A summary worker process died; starting a new pool")
+            reset_summary_pool(pool)
+        except asyncio.TimeoutError:
+            result = {"error": f"Summarization timed out after {assistant.summary_timeout:g} seconds"}
+            break
+    if result is None:
+        result = {"error": "Summarization failed: the worker process died"}
+    if "error" not in result:
+        assistant.summary_cache.put(cache_key, result)
+    return dict(result)
+
+
+async def summarize(assistant, student_id: str, data: Dict) -> Tuple[int, Dict]:
+    """StudyAssistant.handle_summarize with the summarizing done on the process pool"""
+    error = assistant.summarize_request_error(data)
+    if error:
+        return error
+    result = await summarize_text(assistant, data['text'])
+    await _blocking(_store_pool, assistant.record_summary, student_id, data['text'])
+    return 200, result
+
+
+# (method, path) -> the StudyAssistant.handle_* method the Flask view of
+# the same path runs
+ROUTES = {
+    ('POST', '/summarize'): 'handle_summarize',
+    ('POST', '/explain'): 'handle_explain',
+    ('POST', '/quiz'): 'handle_quiz',
+    ('POST', '/check_answer'): 'handle_check_answer',
+    ('POST', '/check_answers'): 'handle_check_answers',
+    ('GET', '/memory'): 'handle_memory',
+    ('GET', '/recommendations'): 'handle_recommendations'
+}
+# Handlers served by a coroutine; the others run on the store pool, as
+# they read or write the store and may load content or run NLTK
+ASYNC_HANDLERS = {'handle_summarize': summarize}
+
+
+def run_profiled(reason: str, route: str, method: str, handler: Callable,
+                 student_id: str, data: Dict) -> Tuple[int, Dict, Optional[str]]:
+    """Run a handler under the profiler on this thread; also returns the profile id"""
+    run = profiler.begin(reason)
+    if run is None:
+        # Another request is being profiled
+        return handler(student_id, data) + (None,)
+    try:
+        status, payload = handler(student_id, data)
+    except BaseException:
+        profiler.stop(run)
+        raise
+    profiler.finish(run, route, method, status)
+    return status, payload, profiler.profile_id(run, route)
+
+
+async def handle_route(assistant, headers: Dict[bytes, bytes], route: str, method: str,
+                       session: Session, data: Dict) -> Tuple[int, Dict, List[Tuple[bytes, bytes]]]:
+    name = ROUTES[(method, route)]
+    handler = getattr(assistant, name)
+    student_id = session.student_id()
+    reason = profiler.select(Headers([(k.decode('latin-1'), v.decode('latin-1')) for k, v in headers.items()]))
+    if reason is not None:
+        status, payload, profile_id = await _blocking(_store_pool, run_profiled, reason, route, method,
+                                                      handler, student_id, data)
+        return status, payload, [(b'x-profile-id', profile_id.encode('latin-1'))] if profile_id else []
+    if name in ASYNC_HANDLERS:
+        status, payload = await ASYNC_HANDLERS[name](assistant, student_id, data)
+    else:
+        status, payload = await _blocking(_store_pool, handler, student_id, data)
+    return status, payload, []
+
+
+async def read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def send_json(send, status: int, payload, extra_headers: List[Tuple[bytes, bytes]] = ()):
+    body = json.dumps(payload).encode('utf-8')
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    headers.extend(extra_headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def handle_native(scope, receive, send):
+    start = time.perf_counter()
+    route, method = scope['path'], scope['method']
+    headers = dict(scope['headers'])
+    session = Session(headers)
+    extra_headers = []
+    try:
+        body = await read_body(receive)
+        data = json.loads(body) if body else {}
+        if not isinstance(data, dict):
+            raise ValueError("JSON body must be an object")
+    except ValueError:
+        status, payload = 400, {"error": "Request body must be a JSON object"}
+    else:
+        try:
+            status, payload, extra_headers = await handle_route(get_study_assistant(), headers, route, method,
+                                                                session, data)
+        except Exception:
+            logger.exception("Exception on %s [%s]", route, method)
+            status, payload = 500, {"error": "Internal server error"}
+    cookie = session.set_cookie()
+    if cookie:
+        extra_headers.append(cookie)
+    await send_json(send, status, payload, extra_headers)
+    # ROUTES paths have no variables, so the path is the route pattern
+    record_request(route, method, status, time.perf_counter() - start)
+
+
+def wsgi_environ(scope, body) -> Dict:
+    """A WSGI environ for an ASGI HTTP request"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def run_wsgi(environ, emit) -> None:
+    """Run the Flask app for one request, emitting ('start' | 'body', ...) events"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+    result = app(environ, start_response)
+    try:
+        started = False
+        for chunk in result:
+            if not started:
+                emit(('start', response['status'], response['headers']))
+                started = True
+            if chunk:
+                emit(('body', chunk))
+        if not started:
+            emit(('start', response['status'], response['headers']))
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+        environ['wsgi.input'].close()
+
+
+async def handle_wsgi(scope, receive, send):
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body.write(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    body.seek(0)
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    task = loop.run_in_executor(_wsgi_pool, run_wsgi, wsgi_environ(scope, body), emit)
+    task.add_done_callback(lambda _: emit(('done',)))
+    started = False
+    while True:
+        event = await events.get()
+        if event[0] == 'start':
+            await send({'type': 'http.response.start', 'status': event[1], 'headers': event[2]})
+            started = True
+        elif event[0] == 'body':
+            await send({'type': 'http.response.body', 'body': event[1], 'more_body': True})
+        else:
+            break
+    try:
+        await task
+    except Exception:
+        logger.exception("Exception on %s [%s]", scope['path'], scope['method'])
+        if not started:
+            await send_json(send, 500, {"error": "Internal server error"})
+            return
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Load the memory store before accepting requests
+            await _blocking(_store_pool, warm_up if os.environ.get('PRELOAD', '').lower() in ('1', 'true', 'yes')
+                            else get_study_assistant)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await _blocking(_store_pool, get_study_assistant().store.close)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """The ASGI application"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    if (scope['method'], scope['path']) in ROUTES:
+        await handle_native(scope, receive, send)
+    else:
+        await handle_wsgi(scope, receive, send)
@@ -0,0 +1,111 @@
+"""
+Concurrent-connection throughput of the threaded and async serving modes.
+
+Starts the app twice, each time as a real HTTP server on a local port
+with its own scratch memory file:
+- threaded: the Flask app on Werkzeug's threaded server, as ``app.run``
+  serves it
+- async: ``asgi:application`` on uvicorn
+
+Both are driven by the load generator in load_test.py, replaying the
+recorded interaction mix at each concurrency level. The summary and
+sentence caches are off by default, so every summarization request does
+real work.
+
+Usage:
+    python benchmarks/bench_async.py --concurrency 8 32 64 --duration 15
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.load_test import HttpTransport, LoadRunner, MixWorkload, report
+
+SERVERS = {
+    'threaded': [sys.executable, '-c',
+                 'import sys, app; from werkzeug.serving import run_simple; '
+                 'run_simple("127.0.0.1", int(sys.argv[1]), app.app, threaded=True)'],
+    'async': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+              '--log-level', 'warning', '--port']
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode: str, env) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    process = subprocess.Popen(SERVERS[mode] + [str(port)], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return process, url
+        except OSError:
+            if process.poll() is not None:
+                raise SystemExit(f"{mode} server exited with status {process.returncode}")
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f"{mode} server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32, 64])
+    parser.add_argument('--duration', type=float, default=15.0, help="seconds per mode and level")
+    parser.add_argument('--students', type=int, default=100)
+    parser.add_argument('--modes', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument('--memory-file', default=os.path.join(ROOT, 'student_memory.json'),
+                        help="recorded interactions that define the request mix")
+    parser.add_argument('--summary-cache', action='store_true', help="keep the summary and sentence caches on")
+    args = parser.parse_args()
+
+    print(f"{'mode':<9} {'conns':>5} {'req/s':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+          f" {'fast p99 ms':>12}")
+    for concurrency in args.concurrency:
+        for mode in args.modes:
+            workdir = tempfile.mkdtemp(prefix='bench-async-')
+            env = dict(os.environ, MEMORY_FILE=os.path.join(workdir, 'student_memory.json'), PRELOAD='1')
+            if not args.summary_cache:
+                env['SUMMARY_CACHE_SIZE'] = '0'
+                env['SENTENCE_CACHE_SIZE'] = '0'
+            process, url = start_server(mode, env)
+            try:
+                runner = LoadRunner(HttpTransport(url, timeout=60), MixWorkload(args.memory_file, seed=0),
+                                    args.students)
+                # Warm up connections and lazily loaded data before measuring
+                runner.run_closed(concurrency, time.perf_counter() + 2, 0)
+                runner = LoadRunner(HttpTransport(url, timeout=60), MixWorkload(args.memory_file, seed=1),
+                                    args.students)
+                start = time.perf_counter()
+                runner.run_closed(concurrency, start + args.duration, 0)
+                result = report(runner, time.perf_counter() - start)
+            finally:
+                process.terminate()
+                process.wait()
+                shutil.rmtree(workdir, ignore_errors=True)
+
+            total = result['total']
+            # Requests that never summarize, to show head-of-line blocking
+            fast = [stats['p99_ms'] for path, stats in result['routes'].items() if path != '/summarize']
+            print(f"{mode:<9} {concurrency:>5} {total['throughput']:>8.1f} {total['errors']:>6} {total['p50_ms']:>9.1f}"
+                  f" {total['p95_ms']:>9.1f} {total['p99_ms']:>9.1f} {max(fast, default=0.0):>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
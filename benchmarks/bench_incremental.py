@@ -0,0 +1,109 @@
+"""
+Edit-one-paragraph benchmark for re-summarizing edited documents.
+
+A student summarizes their notes, edits one paragraph and summarizes
+them again. Each round edits a different paragraph, and the time to
+summarize the edited document is measured three ways:
+- without a sentence cache, as before: every sentence is tokenized again
+- with a cold sentence cache: the first time a document is seen
+- with a warm sentence cache: the unedited version was summarized
+  before, so only the edited paragraph's sentences are tokenized
+
+The demo corpus repeats its sentences, so every sentence of a test
+document is numbered to make it unique, as real notes are. The three
+summaries must be identical.
+
+Usage:
+    python benchmarks/bench_incremental.py --sizes 1000 3000 30000 --rounds 5
+"""
+
+import argparse
+import itertools
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import StudyAssistant
+from benchmarks.corpus import make_document
+from cache import LRUCache
+from memory_store import DictMemoryStore
+
+
+def unique_document(num_words: int, seed: int) -> str:
+    """A corpus document with every sentence numbered"""
+    numbers = itertools.count(1)
+    return re.sub(r'([.!?])(?=\s|$)', lambda m: f" (point {next(numbers)}){m.group(1)}",
+                  make_document(num_words, seed=seed))
+
+
+def edit_paragraph(document: str, index: int, revision: int) -> str:
+    """Rewrite one paragraph: drop its first sentence and add a new one"""
+    paragraphs = document.split('\n\n')
+    index %= len(paragraphs)
+    sentences = paragraphs[index].strip().split('. ')
+    sentences[0] = f"Revision {revision} of these notes rewrites paragraph {index} in the student's own words"
+    paragraphs[index] = ' ' + '. '.join(sentences) + ' '
+    return '\n\n'.join(paragraphs)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 3000, 30000])
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    uncached = StudyAssistant(store=DictMemoryStore())
+    uncached.sentence_cache = LRUCache(max_entries=0)
+    cached = StudyAssistant(store=DictMemoryStore())
+    # Load NLTK data before timing anything
+    uncached.summarize_text(make_document(100, seed=99))
+
+    rng = random.Random(0)
+    print(f"{'words':>7} {'no cache (ms)':>14} {'cold (ms)':>10} {'warm (ms)':>10} {'speedup':>8} {'re-tokenized':>13}")
+    revision = 0
+    for words in args.sizes:
+        times = {'none': [], 'cold': [], 'warm': []}
+        retokenized = []
+        for _ in range(args.rounds):
+            document = unique_document(words, rng.randrange(1 << 30))
+            revision += 1
+            edited = edit_paragraph(document, rng.randrange(1 << 30), revision)
+
+            seconds, expected = timed(uncached.summarize_text, edited)
+            times['none'].append(seconds)
+
+            cached.sentence_cache.clear()
+            cached.summary_cache.clear()
+            seconds, cold = timed(cached.summarize_text, edited)
+            times['cold'].append(seconds)
+
+            cached.sentence_cache.clear()
+            cached.summary_cache.clear()
+            cached.summarize_text(document)
+            misses = cached.sentence_cache.misses
+            seconds, warm = timed(cached.summarize_text, edited)
+            times['warm'].append(seconds)
+            retokenized.append(cached.sentence_cache.misses - misses)
+
+            if not (expected == cold == warm):
+                print(f"Summaries of a {words} word document differ with the sentence cache")
+                sys.exit(1)
+
+        none, cold, warm = (statistics.median(times[k]) for k in ('none', 'cold', 'warm'))
+        print(f"{words:>7} {none * 1000:>14.2f} {cold * 1000:>10.2f} {warm * 1000:>10.2f} {none / warm:>7.1f}x"
+              f" {statistics.median(retokenized):>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Bytes per stored interaction, before and after compact records.
+
+Generates --events interactions (1M by default) for --per-student
+interactions per student, with the recorded mix of summarizations,
+explanations, quizzes and answers, and stores them both ways:
+- dicts: one dict per interaction with an ISO timestamp, type, topic
+  and rendered content, as memory was kept before; the memory file was
+  pretty-printed JSON and the SQLite table had a text column per field
+- compact: interactions.py records, the column-wise memory file and the
+  current SQLite schema
+
+For each it reports the bytes per interaction held in RAM after loading
+the memory file (measured with tracemalloc), in the memory file, in
+journal lines and in a SQLite database, and the time to load and save
+the memory file.
+
+Usage:
+    python benchmarks/bench_interactions.py --events 1000000
+"""
+
+import argparse
+import gc
+import glob
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import make_document
+from benchmarks.load_test import DEFAULT_MIX, LEVELS
+from interactions import Interaction, InteractionKind
+from memory_store import (SqliteMemoryStore, apply_record, atomic_write_json, decode_memory, encode_memory,
+                          encode_record)
+
+# The SQLite table as it was before interactions were compact
+LEGACY_SCHEMA = """
+    CREATE TABLE interactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        type TEXT NOT NULL,
+        content TEXT,
+        topic TEXT
+    );
+    CREATE INDEX idx_interactions_student ON interactions (student_id, id);
+"""
+
+
+def content_topics():
+    topics = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'content', '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            topics.extend(json.load(f).get('topics', {}))
+    return topics
+
+
+def generate(events: int, per_student: int, seed: int = 0):
+    """(student_id, Interaction) pairs in the recorded mix, a year of activity"""
+    rng = random.Random(seed)
+    topics = content_topics()
+    text = ' '.join(make_document(5000, seed=seed).split())
+    kinds = list(DEFAULT_MIX)
+    weights = [DEFAULT_MIX[kind] for kind in kinds]
+    start = int(time.time()) - 365 * 86400
+    for i in range(events):
+        student_id = f"student-{i // per_student:06d}"
+        timestamp = start + i * 365 * 86400 // events
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'summarization':
+            offset = rng.randrange(len(text) - 100)
+            interaction = Interaction(timestamp, InteractionKind.SUMMARIZED_TEXT, 'text_summarization',
+                                      text[offset:offset + 100])
+        elif kind == 'explanation':
+            interaction = Interaction(timestamp, InteractionKind.EXPLAINED, rng.choice(topics), rng.choice(LEVELS))
+        elif kind == 'quiz_generation':
+            interaction = Interaction(timestamp, InteractionKind.GENERATED_QUIZ, rng.choice(topics), rng.randint(3, 10))
+        else:
+            kind = rng.choice((InteractionKind.ANSWERED_CORRECTLY, InteractionKind.ANSWERED_INCORRECTLY))
+            interaction = Interaction(timestamp, kind, rng.choice(topics), rng.randrange(10))
+        yield student_id, interaction
+
+
+def retained_bytes(load, *args) -> int:
+    """Bytes still allocated by what load(*args) returns"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = load(*args)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return retained
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def save_compact(path: str, memory) -> None:
+    atomic_write_json(path, encode_memory(memory), fsync=False)
+
+
+def save_dicts(path: str, memory) -> None:
+    atomic_write_json(path, memory, indent=2, fsync=False)
+
+
+def sqlite_bytes(path: str) -> int:
+    conn = sqlite3.connect(path)
+    conn.execute('VACUUM')
+    conn.close()
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--per-student', type=int, default=200, help="e.g. a MEMORY_HISTORY_LIMIT of 200")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-interactions-')
+    results = {'dicts': {}, 'compact': {}}
+    try:
+        memory = {}
+        journal = {'dicts': 0, 'compact': 0}
+        for seq, (student_id, interaction) in enumerate(generate(args.events, args.per_student), 1):
+            record = {'op': 'interaction', 'student_id': student_id, 'interaction': interaction}
+            apply_record(memory, record)
+            journal['compact'] += len(json.dumps(dict(encode_record(record), seq=seq), ensure_ascii=False,
+                                                 separators=(',', ':'))) + 1
+            journal['dicts'] += len(json.dumps(dict(record, interaction=interaction.to_dict(), seq=seq),
+                                               ensure_ascii=False, separators=(',', ':'))) + 1
+        for name in results:
+            results[name]['journal'] = journal[name]
+
+        # Memory files, written the way each version of JsonMemoryStore wrote them
+        files = {name: os.path.join(workdir, f'{name}.json') for name in results}
+        legacy = {student_id: dict(student, interactions=[interaction.to_dict()
+                                                          for interaction in student['interactions']])
+                  for student_id, student in memory.items()}
+        results['compact']['save'] = timed(save_compact, files['compact'], memory)
+        results['dicts']['save'] = timed(save_dicts, files['dicts'], legacy)
+        for name, path in files.items():
+            results[name]['file'] = os.path.getsize(path)
+
+        # SQLite: the current store, and the same rows in the old table layout
+        store = SqliteMemoryStore(os.path.join(workdir, 'compact.db'), durability='shutdown')
+        store.load()
+        store.import_memory(memory)
+        store.close()
+        results['compact']['sqlite'] = sqlite_bytes(store.db_file)
+        conn = sqlite3.connect(os.path.join(workdir, 'dicts.db'))
+        conn.executescript(LEGACY_SCHEMA)
+        with conn:
+            conn.executemany(
+                'INSERT INTO interactions (student_id, timestamp, type, content, topic) VALUES (?, ?, ?, ?, ?)',
+                ((student_id, i['timestamp'], i['type'], i['content'], i['topic'])
+                 for student_id, student in legacy.items() for i in student['interactions'])
+            )
+        conn.close()
+        results['dicts']['sqlite'] = sqlite_bytes(os.path.join(workdir, 'dicts.db'))
+        del memory, legacy, store
+
+        # RAM held by memory loaded from each file; the file text is read
+        # before tracing starts so only the loaded memory is counted
+        loaders = {'dicts': json.loads, 'compact': lambda text: decode_memory(json.loads(text))}
+        for name, path in files.items():
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            results[name]['ram'] = retained_bytes(loaders[name], text)
+            results[name]['load'] = timed(loaders[name], text)
+            del text
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.events} interactions, {args.per_student} per student; bytes per interaction:")
+    print(f"{'records':<8} {'RAM':>7} {'file':>7} {'journal':>8} {'SQLite':>7} {'load (s)':>9} {'save (s)':>9}")
+    for name, result in results.items():
+        print(f"{name:<8} {result['ram'] / args.events:>7.1f} {result['file'] / args.events:>7.1f}"
+              f" {result['journal'] / args.events:>8.1f} {result['sqlite'] / args.events:>7.1f}"
+              f" {result['load']:>9.2f} {result['save']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Before/after benchmark for quiz question selection on large banks.
+
+``legacy_select_optimal_questions`` is the selection as it was before
+QuizBank: the whole bank is sorted and filtered three times per quiz,
+and missing spots are filled by rebuilding the list of unselected
+questions with dict comparisons. Each run selects quizzes from a balanced
+bank and from a bank without hard questions, which forces the fill loop.
+
+Usage:
+    python benchmarks/bench_quiz.py --bank-size 10000 --num-questions 5 20 50
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quiz_bank import QuizBank
+
+
+def legacy_select_optimal_questions(questions, num_questions):
+    if len(questions) <= num_questions:
+        return questions
+    difficulty_order = {"easy": 1, "medium": 2, "hard": 3}
+    sorted_questions = sorted(questions, key=lambda q: difficulty_order.get(q.get("difficulty", "medium"), 2))
+    selected = []
+    easy_count = max(1, num_questions // 3)
+    medium_count = max(1, num_questions // 3)
+    hard_count = num_questions - easy_count - medium_count
+    easy_questions = [q for q in sorted_questions if q.get("difficulty") == "easy"]
+    medium_questions = [q for q in sorted_questions if q.get("difficulty") == "medium"]
+    hard_questions = [q for q in sorted_questions if q.get("difficulty") == "hard"]
+    selected.extend(random.sample(easy_questions, min(easy_count, len(easy_questions))))
+    selected.extend(random.sample(medium_questions, min(medium_count, len(medium_questions))))
+    selected.extend(random.sample(hard_questions, min(hard_count, len(hard_questions))))
+    while len(selected) < num_questions and len(selected) < len(questions):
+        remaining = [q for q in questions if q not in selected]
+        if remaining:
+            selected.append(random.choice(remaining))
+    random.shuffle(selected)
+    return selected[:num_questions]
+
+
+def make_bank(size, difficulties, seed=0):
+    """Synthetic questions shaped like the ones in the content packs"""
+    rng = random.Random(seed)
+    return [{
+        "question": f"Question {i} about topic {i % 97}?",
+        "options": [f"Option {j} for {i}" for j in range(4)],
+        "correct": rng.randrange(4),
+        "explanation": f"Explanation for question {i}.",
+        "difficulty": difficulties[i % len(difficulties)]
+    } for i in range(size)]
+
+
+def per_call(repeat, func, *args):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bank-size', type=int, default=10000)
+    parser.add_argument('--num-questions', type=int, nargs='+', default=[5, 20, 50])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    banks = {
+        'balanced': make_bank(args.bank_size, ['easy', 'medium', 'hard']),
+        'no hard': make_bank(args.bank_size, ['easy', 'medium'])
+    }
+    print(f"{'bank':<10} {'questions':>9} {'before (ms)':>12} {'after (ms)':>11} {'speedup':>8}")
+    for name, questions in banks.items():
+        start = time.perf_counter()
+        bank = QuizBank(questions)
+        build = time.perf_counter() - start
+
+        # Selection must be reproducible from a seed and never repeat a question
+        for num_questions in args.num_questions:
+            first = bank.select(num_questions, random.Random(42))
+            if first != bank.select(num_questions, random.Random(42)):
+                print("Seeded selections differ")
+                sys.exit(1)
+            if len({id(q) for q in first}) != num_questions:
+                print(f"Selection of {num_questions} from {name} bank repeats or misses questions")
+                sys.exit(1)
+
+            before = per_call(args.repeat, legacy_select_optimal_questions, questions, num_questions)
+            after = per_call(args.repeat, bank.select, num_questions)
+            print(f"{name:<10} {num_questions:>9} {before * 1000:>12.3f} {after * 1000:>11.4f} {before / after:>7.0f}x")
+        print(f"{name:<10} bank of {len(bank)} built once in {build * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Readability scores from summarizer counts, checked against textstat.
+
+The test texts are documents of several sizes built from the demo
+corpus, plus the curated explanations and quiz explanations. For each,
+textstat's scores are compared with get_readability_score on raw text
+and with the scores summarize_text computes from its own tokens. The
+script exits with status 1 when any raw text score differs from
+textstat's, or when a token-based mean difference, or the largest
+difference on a document of at least --min-words words, is beyond
+tolerance. Short texts scored from tokens are only reported: one
+sentence split differently moves their scores a lot.
+
+It also times three ways of scoring a document:
+- textstat, as get_readability_score used to
+- readability.py from the summarizer's tokens, which is the extra work
+  summarize_text now does
+- readability.py on raw text, tokenizing it first
+
+Usage:
+    python benchmarks/bench_readability.py --sizes 300 3000 30000
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import readability
+from app import StudyAssistant
+from benchmarks.corpus import make_document
+from memory_store import DictMemoryStore
+from nlp import sent_tokenize, word_tokenize
+
+
+def content_texts():
+    """Explanation texts from the content packs"""
+    texts = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'content', '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            topics = json.load(f).get('topics', {})
+        for topic in (topics.values() if isinstance(topics, dict) else topics):
+            texts.extend(topic.get('explanations', {}).values())
+            texts.extend(question['explanation'] for question in topic.get('quiz', []) if question.get('explanation'))
+    return texts
+
+
+def per_call(repeat, func, texts):
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(texts[i % len(texts)])
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[30, 100, 300, 3000, 30000])
+    parser.add_argument('--documents', type=int, default=10, help="documents per size")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-words', type=int, default=300)
+    parser.add_argument('--ease-tolerance', type=float, default=5.0)
+    parser.add_argument('--grade-tolerance', type=float, default=1.5)
+    parser.add_argument('--mean-ease-tolerance', type=float, default=1.5)
+    parser.add_argument('--mean-grade-tolerance', type=float, default=0.5)
+    args = parser.parse_args()
+
+    import textstat
+    assistant = StudyAssistant(store=DictMemoryStore())
+
+    documents = [('content', text) for text in content_texts()]
+    documents += [(str(words), make_document(words, seed=seed))
+                  for words in args.sizes for seed in range(args.documents)]
+
+    failed = False
+    print(f"{'scored from':<12} {'documents':<10} {'count':>5} {'ease max':>9} {'ease mean':>10} {'grade max':>10}"
+          f" {'grade mean':>11} {'same level':>11}")
+    for path in ('text', 'tokens'):
+        differences = {'ease': [], 'grade': []}
+        by_group = {}
+        for group, text in documents:
+            text = assistant.clean_text(text)
+            counts = None
+            if path == 'tokens':
+                counts = assistant.analyze_sentences(sent_tokenize(text))['readability_counts']
+            ours = assistant.get_readability_score(text, counts)
+            reference = textstat.flesch_reading_ease(text)
+            ease = abs(ours['flesch_reading_ease'] - round(reference, 1))
+            grade = abs(ours['flesch_kincaid_grade'] - round(textstat.flesch_kincaid_grade(text), 1))
+            differences['ease'].append(ease)
+            differences['grade'].append(grade)
+            stats = by_group.setdefault(group, {'ease': [], 'grade': [], 'level': 0})
+            stats['ease'].append(ease)
+            stats['grade'].append(grade)
+            stats['level'] += ours['reading_level'] == assistant.reading_level(reference)
+            if path == 'text':
+                # Raw text is counted exactly as textstat counts it
+                if ease > 1e-9 or grade > 1e-9:
+                    failed = True
+            elif group != 'content' and int(group) >= args.min_words and (
+                    ease > args.ease_tolerance or grade > args.grade_tolerance):
+                failed = True
+
+        for group, stats in by_group.items():
+            print(f"{path:<12} {group:<10} {len(stats['ease']):>5} {max(stats['ease']):>9.2f}"
+                  f" {statistics.mean(stats['ease']):>10.2f} {max(stats['grade']):>10.2f}"
+                  f" {statistics.mean(stats['grade']):>11.2f} {stats['level'] / len(stats['ease']):>10.0%}")
+        mean_ease, mean_grade = statistics.mean(differences['ease']), statistics.mean(differences['grade'])
+        print(f"{path:<12} mean difference: ease {mean_ease:.2f}, grade {mean_grade:.2f}")
+        if mean_ease > args.mean_ease_tolerance or mean_grade > args.mean_grade_tolerance:
+            failed = True
+
+    print(f"\n{'words':>7} {'textstat (ms)':>14} {'from tokens (ms)':>17} {'from text (ms)':>15} {'speedup':>8}")
+    for words in args.sizes:
+        base = assistant.clean_text(make_document(words, seed=99))
+        # A different last sentence per call, so textstat's caches never hit
+        texts = [f"{base} This is revision number {i}." for i in range(args.repeat)]
+        tokens = [[word_tokenize(sentence.lower()) for sentence in sent_tokenize(text)] for text in texts]
+
+        def with_textstat(text):
+            textstat.flesch_reading_ease(text)
+            textstat.flesch_kincaid_grade(text)
+
+        def from_tokens(sentence_tokens):
+            counts = readability.combine(readability.sentence_counts(tokens) for tokens in sentence_tokens)
+            readability.flesch_reading_ease(counts)
+            readability.flesch_kincaid_grade(counts)
+
+        before = per_call(args.repeat, with_textstat, texts)
+        summarizer = per_call(args.repeat, from_tokens, tokens)
+        standalone = per_call(args.repeat, assistant.get_readability_score, texts)
+        print(f"{words:>7} {before * 1000:>14.3f} {summarizer * 1000:>17.3f} {standalone * 1000:>15.3f}"
+              f" {before / summarizer:>7.1f}x")
+    print(f"syllable cache: {readability.SYLLABLE_CACHE.stats()}")
+
+    if failed:
+        print("Readability scores differ from textstat beyond tolerance")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Topic resolution checks and timing on large topic sets.
+
+The shipped content packs are loaded and a list of queries is resolved
+against them: queries that must find their topic (filler words, typos,
+an extra word next to a two-word name) and queries that must find
+nothing because they are about something else ("evolution of stars",
+"gravity waves"). The script exits with status 1 when any query
+resolves differently.
+
+It then builds resolvers over synthetic topic sets of several sizes and
+times resolving queries that miss the cache.
+
+Usage:
+    python benchmarks/bench_resolver.py --topics 1000 10000 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from content_registry import ContentRegistry
+from topic_resolver import TopicResolver
+
+# Query -> topic key it must resolve to, or None
+CASES = {
+    'gravity': 'gravity',
+    'what is gravity': 'gravity',
+    'Explain photosynthesis, please': 'photosynthesis',
+    'photosynthsis': 'photosynthesis',
+    'evoluton': 'evolution',
+    'how does evolution work': 'evolution',
+    'climate chang': 'climate change',
+    'global climate change': 'climate change',
+    'evolution of stars': None,
+    'gravity waves': None,
+    'quantum gravity': None,
+    'the gravity of the situation': None,
+    'climate': None,
+    'stars': None,
+}
+
+SYLLABLES = ['ba', 'co', 'di', 'fe', 'gu', 'ka', 'lo', 'mi', 'no', 'pe', 'ra', 'si', 'tu', 'vo', 'ze']
+
+
+def make_names(count, rng):
+    """count distinct topic names of one to three made-up words"""
+    names = {}
+    while len(names) < count:
+        words = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                 for _ in range(rng.randint(1, 3))]
+        name = ' '.join(words)
+        names[name] = name
+    return names
+
+
+def misspell(name, rng):
+    """name with one letter dropped from its longest word"""
+    words = name.split()
+    longest = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[longest]
+    position = rng.randrange(len(word))
+    words[longest] = word[:position] + word[position + 1:]
+    return ' '.join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--topics', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    resolver = ContentRegistry(os.path.join(ROOT, 'content')).snapshot.resolver
+    failed = False
+    for query, expected in CASES.items():
+        match = resolver.resolve(query)
+        key = match.key if match else None
+        print(f"{query!r:<34} {str(key):<16} {match.confidence if match else '':>6}"
+              f"{'' if key == expected else f'  expected {expected}'}")
+        failed |= key != expected
+
+    rng = random.Random(42)
+    print(f"\n{'topics':>7} {'build (ms)':>11} {'exact (us)':>11} {'misspelled (us)':>16} {'unrelated (us)':>15}")
+    for count in args.topics:
+        names = make_names(count, rng)
+        start = time.perf_counter()
+        resolver = TopicResolver(names, cache_size=0)
+        build = time.perf_counter() - start
+
+        sample = rng.sample(list(names), min(args.queries, count))
+        queries = {
+            'exact': [f"what is {name}" for name in sample],
+            'misspelled': [misspell(name, rng) for name in sample],
+            'unrelated': [f"{name} and the history of rome" for name in sample],
+        }
+        timings = {}
+        for kind, texts in queries.items():
+            start = time.perf_counter()
+            for text in texts:
+                resolver.resolve(text)
+            timings[kind] = (time.perf_counter() - start) / len(texts)
+        print(f"{count:>7} {build * 1000:>11.1f} {timings['exact'] * 1e6:>11.1f}"
+              f" {timings['misspelled'] * 1e6:>16.1f} {timings['unrelated'] * 1e6:>15.1f}")
+
+    if failed:
+        print("Some queries resolved to the wrong topic")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
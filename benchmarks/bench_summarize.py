@@ -0,0 +1,139 @@
+"""
+Before/after benchmark for summarize_text.
+
+``legacy_summarize_text`` is the summarizer as it was before the
+single-pass pipeline: every sentence is tokenized three times, stopwords
+and the top keywords are rebuilt per sentence, and the whole text is
+tokenized again for the word count. Both versions run on the same
+documents and their results must be identical, except readability:
+summarize_text scores it from its own token counts and the legacy
+version with textstat on the raw text, so the scores only have to agree
+within the tolerances benchmarks/bench_readability.py uses.
+
+Usage:
+    python benchmarks/bench_summarize.py --sizes 10000 100000 [--engine numpy]
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nltk.corpus import stopwords
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+from app import StudyAssistant
+from cache import LRUCache
+from benchmarks.corpus import make_document
+from memory_store import DictMemoryStore
+
+
+def legacy_keyword_score(sentence, word_freq):
+    words = word_tokenize(sentence.lower())
+    stop_words = set(stopwords.words('english'))
+    words = [word for word in words if word.isalnum() and word not in stop_words and len(word) > 2]
+    if not words:
+        return 0
+    top_keywords = set([word for word, freq in word_freq.most_common(10)])
+    keyword_count = sum(1 for word in words if word in top_keywords)
+    return keyword_count / len(words)
+
+
+def legacy_summarize_text(assistant, text):
+    text = assistant.clean_text(text)
+    sentences = sent_tokenize(text)
+    stop_words = set(stopwords.words('english'))
+    sentence_scores = {}
+    word_freq = Counter()
+    for sentence in sentences:
+        words = word_tokenize(sentence.lower())
+        words = [word for word in words if word.isalnum() and word not in stop_words and len(word) > 2]
+        for word in words:
+            word_freq[word] += 1
+    for i, sentence in enumerate(sentences):
+        words = word_tokenize(sentence.lower())
+        words = [word for word in words if word.isalnum() and word not in stop_words and len(word) > 2]
+        if len(words) == 0:
+            sentence_scores[i] = 0
+            continue
+        freq_score = sum(word_freq.get(word, 0) for word in words) / len(words)
+        position_score = 0.5
+        if i == 0 or i == len(sentences) - 1:
+            position_score = 1.0
+        elif i < len(sentences) * 0.3:
+            position_score = 0.8
+        length_score = 1.0
+        if len(words) < 5:
+            length_score = 0.5
+        elif len(words) > 30:
+            length_score = 0.7
+        keyword_score = legacy_keyword_score(sentence, word_freq)
+        sentence_scores[i] = freq_score * 0.4 + position_score * 0.2 + length_score * 0.2 + keyword_score * 0.2
+    num_sentences = max(1, min(4, len(sentences) // 3))
+    top_sentences = sorted(sentence_scores.items(), key=lambda x: x[1], reverse=True)[:num_sentences]
+    top_sentences = sorted([item[0] for item in top_sentences])
+    summary = ' '.join(sentences[i] for i in top_sentences)
+    return {
+        "summary": summary,
+        "key_points": assistant.extract_enhanced_key_points(sentences, sentence_scores),
+        "readability": assistant.get_readability_score(text),
+        "word_count": len(word_tokenize(text)),
+        "sentence_count": len(sentences),
+        "confidence": assistant.calculate_summary_confidence(sentence_scores, top_sentences),
+        "summary_ratio": round(len(summary) / len(text) * 100, 1)
+    }
+
+
+# Largest per-document differences bench_readability.py accepts
+EASE_TOLERANCE = 5.0
+GRADE_TOLERANCE = 1.5
+
+
+def same_result(actual, expected) -> bool:
+    """Equal apart from readability, which has to be within tolerance"""
+    actual, expected = dict(actual), dict(expected)
+    ours, theirs = actual.pop('readability'), expected.pop('readability')
+    return (actual == expected
+            and abs(ours['flesch_reading_ease'] - theirs['flesch_reading_ease']) <= EASE_TOLERANCE
+            and abs(ours['flesch_kincaid_grade'] - theirs['flesch_kincaid_grade']) <= GRADE_TOLERANCE)
+
+
+def best_of(repeat, func, *args):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help="document sizes in words")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--engine', default='python', choices=['python', 'numpy'], help="summary engine to time")
+    args = parser.parse_args()
+
+    assistant = StudyAssistant(store=DictMemoryStore())
+    # Time the summarizer itself, not cache hits on repeated runs or on the
+    # demo corpus' repeated sentences
+    assistant.summary_cache = LRUCache(max_entries=0)
+    assistant.sentence_cache = LRUCache(max_entries=0)
+    print(f"{'words':>8} {'before (s)':>11} {'after (s)':>10} {'speedup':>8}")
+    for size in args.sizes:
+        text = make_document(size, seed=size)
+        before, expected = best_of(args.repeat, legacy_summarize_text, assistant, text)
+        after, actual = best_of(args.repeat, assistant.summarize_text, text, args.engine)
+        if not same_result(actual, expected):
+            print(f"Results differ for {size} words")
+            sys.exit(1)
+        print(f"{size:>8} {before:>11.3f} {after:>10.3f} {before / after:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
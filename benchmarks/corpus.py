@@ -0,0 +1,37 @@
+"""
+Synthetic documents for benchmarks, scaled up from the demo corpus.
+"""
+
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from demo import demo_text_for_summarization
+
+
+def demo_sentences():
+    """Split the demo summarization text into sentences"""
+    text = ' '.join(demo_text_for_summarization().split())
+    return [s for s in re.split(r'(?<=[.!?])\s+', text) if s]
+
+
+def make_document(num_words: int, seed: int = 0) -> str:
+    """Build a document of roughly num_words words from shuffled demo sentences.
+
+    Every fifth sentence is split into paragraphs so the text looks like
+    pasted notes rather than one long line.
+    """
+    rng = random.Random(seed)
+    sentences = demo_sentences()
+    parts = []
+    words = 0
+    while words < num_words:
+        sentence = rng.choice(sentences)
+        parts.append(sentence)
+        words += len(sentence.split())
+        if len(parts) % 5 == 0:
+            parts.append('\n\n')
+    return ' '.join(parts)
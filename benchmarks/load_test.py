@@ -0,0 +1,366 @@
+"""
+Traffic-replay load generator with per-route latency percentiles.
+
+The request mix is taken from the interaction types recorded in a memory
+file (summarization, explanation, quiz_generation, quiz_answer), with
+topics and explanation levels drawn from the recorded interactions. It
+can also come from a recorded requests file with one JSON object per line:
+
+    {"method": "POST", "path": "/explain", "json": {"topic": "gravity"}, "student": "a"}
+
+Requests are sent by simulated students, each with its own cookie session,
+so memory and quiz sessions behave as they would for real users. Quiz
+answers go to the next unanswered question of the student's latest quiz,
+and a student whose quiz is fully answered generates a new one.
+
+Load is either closed-loop (``--concurrency`` students sending back to
+back) or open-loop (``--rate`` requests per second, whatever the response
+times). Open-loop latency is measured from the time a request was due, so
+queueing delay when the app falls behind is part of the percentiles.
+
+Requests go through the Flask test client by default, or over HTTP with
+``--url``. In test client mode the app uses a throwaway copy of the memory
+file unless MEMORY_FILE is set, and the sentence cache is off unless
+SENTENCE_CACHE_SIZE is set: the replayed documents are built from a demo
+corpus of a few repeated sentences, which real notes don't repeat.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 8 --duration 30
+    python benchmarks/load_test.py --rate 20 --duration 60 --url http://localhost:5000
+    python benchmarks/load_test.py --requests-file recorded.jsonl --concurrency 4 --json report.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import make_document
+from interactions import InteractionKind
+from memory_store import load_memory_file
+
+INTERACTION_TYPES = ('summarization', 'explanation', 'quiz_generation', 'quiz_answer')
+# Used when the memory file has no interactions
+DEFAULT_MIX = {'summarization': 2, 'explanation': 4, 'quiz_generation': 2, 'quiz_answer': 5}
+DEFAULT_TOPICS = ['photosynthesis', 'gravity', 'democracy', 'evolution', 'climate change']
+LEVELS = ('simple', 'intermediate', 'advanced')
+
+
+def interaction_mix(memory_file: str):
+    """Weights of each interaction type and the topics recorded for each"""
+    weights = Counter()
+    topics = defaultdict(list)
+    levels = []
+    try:
+        memory = load_memory_file(memory_file)
+    except (OSError, ValueError):
+        memory = {}
+    for student in memory.values():
+        for interaction in student.get('interactions', []):
+            kind = interaction.type
+            if kind not in INTERACTION_TYPES:
+                continue
+            weights[kind] += 1
+            if interaction.topic and kind != 'summarization':
+                topics[kind].append(interaction.topic)
+            if interaction.kind == InteractionKind.EXPLAINED and isinstance(interaction.detail, str):
+                # The detail of an explanation is its difficulty
+                levels.append(interaction.detail)
+    return dict(weights) or dict(DEFAULT_MIX), dict(topics), levels or list(LEVELS)
+
+
+class Student:
+    """One simulated student: a cookie session and their latest quiz, as its id and unanswered questions"""
+
+    def __init__(self, name: str, session):
+        self.name = name
+        self.session = session
+        self.quiz = None
+        self.lock = threading.Lock()
+
+
+class TestClientTransport:
+    """Sends requests through the Flask test client, in process"""
+
+    def __init__(self):
+        import app as study_app
+        self.app = study_app.app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def send(method, path, payload):
+            response = client.open(path, method=method, json=payload)
+            return response.status_code, response.get_json(silent=True)
+        return send
+
+
+class HttpTransport:
+    """Sends requests to a running server, one requests.Session per student"""
+
+    def __init__(self, base_url: str, timeout: float):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def session(self):
+        http = self.requests.Session()
+
+        def send(method, path, payload):
+            response = http.request(method, self.base_url + path, json=payload, timeout=self.timeout)
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            return response.status_code, body
+        return send
+
+
+class MixWorkload:
+    """Requests drawn at random from the recorded interaction mix"""
+
+    def __init__(self, memory_file: str, seed: int):
+        self.weights, self.topics, self.levels = interaction_mix(memory_file)
+        self.kinds = list(self.weights)
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        # A few note-sized documents, each resubmitted by many students
+        self.documents = [make_document(words, seed=i) for i, words in enumerate((150, 400, 1000, 2500))]
+
+    def topic(self, kind):
+        return self.rng.choice(self.topics.get(kind) or self.topics.get('explanation') or DEFAULT_TOPICS)
+
+    def next_request(self, student: Student):
+        with self.rng_lock:
+            kind = self.rng.choices(self.kinds, weights=[self.weights[k] for k in self.kinds])[0]
+            if kind == 'summarization':
+                return 'POST', '/summarize', {'text': self.rng.choice(self.documents)}
+            if kind == 'explanation':
+                return 'POST', '/explain', {'topic': self.topic(kind), 'difficulty': self.rng.choice(self.levels)}
+            if kind == 'quiz_generation' or student.quiz is None or not student.quiz[1]:
+                return 'POST', '/quiz', {'topic': self.topic('quiz_generation'), 'num_questions': 5}
+            # Each question can only be answered once; called under the student's lock
+            quiz_id, unanswered = student.quiz
+            return 'POST', '/check_answer', {
+                'quiz_id': quiz_id,
+                'question_index': unanswered.pop(0),
+                'selected_answer': self.rng.randrange(4)
+            }
+
+    def students(self):
+        return None
+
+
+class RecordedWorkload:
+    """Requests replayed from a recorded requests file.
+
+    Each student replays their own recorded requests in order, over and
+    over. Requests without a student are dealt out round-robin.
+    """
+
+    def __init__(self, path: str, num_students: int):
+        with open(path, 'r', encoding='utf-8') as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        if not requests:
+            raise SystemExit(f"No requests in {path}")
+        names = list(dict.fromkeys(entry['student'] for entry in requests if entry.get('student')))
+        self.names = names or [f'student-{i}' for i in range(num_students)]
+        self.queues = {name: [] for name in self.names}
+        for i, entry in enumerate(requests):
+            self.queues[entry.get('student') or self.names[i % len(self.names)]].append(entry)
+        self.names = [name for name in self.names if self.queues[name]]
+        self.positions = Counter()
+
+    def next_request(self, student: Student):
+        # Only called while holding the student's lock
+        queue = self.queues[student.name]
+        entry = queue[self.positions[student.name] % len(queue)]
+        self.positions[student.name] += 1
+        return entry.get('method', 'GET').upper(), entry['path'], entry.get('json')
+
+    def students(self):
+        return self.names
+
+
+class LoadRunner:
+    def __init__(self, transport, workload, num_students: int):
+        names = workload.students() or [f'student-{i}' for i in range(num_students)]
+        self.students = [Student(name, transport.session()) for name in names]
+        self.workload = workload
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.lock = threading.Lock()
+
+    def send(self, student: Student, due: float = None):
+        with student.lock:
+            method, path, payload = self.workload.next_request(student)
+            start = time.perf_counter()
+            try:
+                status, body = student.session(method, path, payload)
+            except Exception as e:
+                status, body = type(e).__name__, None
+            latency = time.perf_counter() - (due if due is not None else start)
+            if path == '/quiz' and isinstance(body, dict) and body.get('quiz_id'):
+                student.quiz = (body['quiz_id'], list(range(len(body.get('questions', [])))))
+        with self.lock:
+            self.latencies[path].append(latency)
+            self.statuses[path][status] += 1
+
+    def run_closed(self, concurrency: int, deadline: float, max_requests: int):
+        """Each worker keeps one request in flight for its share of the students"""
+        sent = iter(range(max_requests)) if max_requests else None
+        sent_lock = threading.Lock()
+
+        def worker(index):
+            own = self.students[index::concurrency] or self.students
+            i = 0
+            while time.perf_counter() < deadline:
+                if sent is not None:
+                    with sent_lock:
+                        if next(sent, None) is None:
+                            return
+                self.send(own[i % len(own)])
+                i += 1
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_open(self, rate: float, deadline: float, max_requests: int, max_workers: int, seed: int):
+        """Start requests on a fixed schedule, independent of response times"""
+        rng = random.Random(seed)
+        interval = 1.0 / rate
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            due = time.perf_counter()
+            count = 0
+            while due < deadline and (not max_requests or count < max_requests):
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.send, rng.choice(self.students), due)
+                count += 1
+                due += interval
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values), max(1, math.ceil(fraction * len(values)))) - 1]
+
+
+def report(runner: LoadRunner, elapsed: float):
+    routes = {}
+    all_latencies = []
+    for path in sorted(runner.latencies):
+        latencies = sorted(runner.latencies[path])
+        all_latencies.extend(latencies)
+        statuses = runner.statuses[path]
+        routes[path] = route_stats(latencies, elapsed)
+        routes[path]['errors'] = sum(count for status, count in statuses.items()
+                                     if not isinstance(status, int) or status >= 400)
+        routes[path]['statuses'] = {str(status): count for status, count in statuses.items()}
+    total = route_stats(sorted(all_latencies), elapsed)
+    total['errors'] = sum(route['errors'] for route in routes.values())
+    return {'elapsed_seconds': elapsed, 'total': total, 'routes': routes}
+
+
+def route_stats(latencies, elapsed):
+    return {
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000
+    }
+
+
+def print_report(result):
+    print(f"{'route':<16} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    rows = list(result['routes'].items()) + [('all', result['total'])]
+    for path, stats in rows:
+        print(f"{path:<16} {stats['requests']:>8} {stats['errors']:>6} {stats['throughput']:>8.1f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument('--concurrency', type=int, default=4, help="closed loop: requests kept in flight")
+    load.add_argument('--rate', type=float, help="open loop: requests started per second")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    parser.add_argument('--requests', type=int, default=0, help="stop after this many requests")
+    parser.add_argument('--students', type=int, default=20, help="simulated students")
+    parser.add_argument('--memory-file', default=os.path.join(ROOT, 'student_memory.json'),
+                        help="recorded interactions that define the request mix")
+    parser.add_argument('--requests-file', help="replay these recorded requests instead")
+    parser.add_argument('--url', help="send requests to this server instead of the test client")
+    parser.add_argument('--timeout', type=float, default=30.0, help="HTTP request timeout")
+    parser.add_argument('--max-workers', type=int, default=64, help="open loop: most requests in flight")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    workdir = None
+    if args.url:
+        transport = HttpTransport(args.url, args.timeout)
+    else:
+        if 'MEMORY_FILE' not in os.environ:
+            workdir = tempfile.mkdtemp(prefix='load-test-')
+            os.environ['MEMORY_FILE'] = os.path.join(workdir, 'student_memory.json')
+            if os.path.exists(args.memory_file):
+                shutil.copy(args.memory_file, os.environ['MEMORY_FILE'])
+        os.environ.setdefault('SENTENCE_CACHE_SIZE', '0')
+        transport = TestClientTransport()
+
+    if args.requests_file:
+        workload = RecordedWorkload(args.requests_file, args.students)
+    else:
+        workload = MixWorkload(args.memory_file, args.seed)
+    runner = LoadRunner(transport, workload, args.students)
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    if args.rate:
+        runner.run_open(args.rate, deadline, args.requests, args.max_workers, args.seed)
+    else:
+        runner.run_closed(args.concurrency, deadline, args.requests)
+    elapsed = time.perf_counter() - start
+
+    result = report(runner, elapsed)
+    result['config'] = {
+        'mode': 'open' if args.rate else 'closed',
+        'rate': args.rate,
+        'concurrency': None if args.rate else args.concurrency,
+        'students': len(runner.students),
+        'target': args.url or 'test client',
+        'workload': args.requests_file or args.memory_file
+    }
+    if isinstance(workload, MixWorkload):
+        result['config']['mix'] = workload.weights
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    if workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Import-time and first-request latency budget check.
+
+Starts a fresh interpreter several times. Each run imports the app, then
+sends the first request to each main route through the Flask test client.
+The median of every timing is compared with its budget, and the script
+exits with status 1 if any budget is exceeded, so it can run as a
+regression check in CI.
+
+Usage:
+    python benchmarks/startup_budget.py --runs 5 --import-budget 0.35
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+import app
+timings = {"import": time.perf_counter() - start}
+client = app.app.test_client()
+requests = [
+    ("explain", "/explain", {"topic": "photosynthesis", "difficulty": "simple"}),
+    ("quiz", "/quiz", {"topic": "gravity", "num_questions": 3}),
+    ("summarize", "/summarize", {"text": sys.argv[1]}),
+]
+for name, path, payload in requests:
+    start = time.perf_counter()
+    response = client.post(path, json=payload)
+    timings[name] = time.perf_counter() - start
+    if response.status_code != 200:
+        raise SystemExit(f"{path} returned {response.status_code}")
+print(json.dumps(timings))
+'''
+
+DEFAULT_BUDGETS = {
+    'import': 0.35,
+    'explain': 1.5,
+    'quiz': 0.1,
+    'summarize': 1.5
+}
+
+
+def run_probe(text, env):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, text],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    sys.path.insert(0, ROOT)
+    from demo import demo_text_for_summarization
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    for name, budget in DEFAULT_BUDGETS.items():
+        parser.add_argument(f'--{name}-budget', type=float, default=budget,
+                            help=f"seconds allowed for {name} (default {budget})")
+    parser.add_argument('--json', help="also write the medians to this file")
+    args = parser.parse_args()
+
+    # Run against a throwaway copy of the memory file, never the real one
+    workdir = tempfile.mkdtemp(prefix='startup-budget-')
+    memory_file = os.path.join(workdir, 'student_memory.json')
+    if os.path.exists(os.path.join(ROOT, 'student_memory.json')):
+        shutil.copy(os.path.join(ROOT, 'student_memory.json'), memory_file)
+    env = dict(os.environ, MEMORY_FILE=memory_file)
+
+    runs = [run_probe(demo_text_for_summarization(), env) for _ in range(args.runs)]
+    medians = {name: statistics.median(run[name] for run in runs) for name in DEFAULT_BUDGETS}
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    failed = False
+    print(f"{'stage':<12} {'median (s)':>11} {'budget (s)':>11}")
+    for name, value in medians.items():
+        budget = getattr(args, f'{name}_budget')
+        over = value > budget
+        failed = failed or over
+        print(f"{name:<12} {value:>11.3f} {budget:>11.3f}{'  OVER BUDGET' if over else ''}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(medians, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
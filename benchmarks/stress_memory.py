@@ -0,0 +1,244 @@
+"""
+Concurrency stress test for student memory.
+
+Runs many threads against the Flask app at once, each acting as one of a
+small set of students so that requests for the same student contend with
+each other. Afterwards the interaction totals, topics_studied counters and
+quiz_performance tallies are checked exactly, both in the live store and
+after reloading it from disk. Then a commit is made to fail, as a full
+disk or a locked database does, and the updates it held must still reach
+disk with the next flush; with the journal backend a second failure
+comes after the records were written, when the journal is synced. With
+the journal backend it also restarts after a torn final record, as a
+crash mid-append leaves it, writes more updates and checks that they
+survive the next restart.
+
+Usage:
+    python benchmarks/stress_memory.py --backend journal --threads 32 --requests 200
+"""
+
+import argparse
+import errno
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as study_app
+from interactions import Interaction, InteractionKind
+from memory_store import create_memory_store
+
+TOPICS = ["photosynthesis", "gravity", "democracy", "evolution", "climate change"]
+
+
+def run_client(client, student_id, num_requests, seed, expected, expected_lock, errors):
+    """Generate quizzes and answer their questions as one student.
+
+    Answers are tallied from the server's verdicts. Now and then the
+    client also answers a question a second time and answers without a
+    quiz; both must be refused and leave the counters alone.
+    """
+    rng = random.Random(seed)
+    with client.session_transaction() as sess:
+        sess['student_id'] = student_id
+
+    interactions = 0
+    topics = Counter()
+    quiz = {}
+    quiz_id, quiz_topic, unanswered = None, None, []
+    for _ in range(num_requests):
+        if not unanswered or rng.random() < 0.3:
+            topic = rng.choice(TOPICS)
+            response = client.post('/quiz', json={'topic': topic, 'num_questions': 3})
+            if response.status_code == 200:
+                body = response.get_json()
+                quiz_id, quiz_topic, unanswered = body['quiz_id'], topic, list(range(len(body['questions'])))
+        else:
+            topic = quiz_topic
+            question_index = unanswered.pop(0)
+            response = client.post('/check_answer', json={
+                'quiz_id': quiz_id,
+                'question_index': question_index,
+                'selected_answer': rng.randint(0, 3)
+            })
+            if response.status_code == 200:
+                counts = quiz.setdefault(topic, [0, 0])
+                counts[0] += int(response.get_json()['is_correct'])
+                counts[1] += 1
+            if rng.random() < 0.1:
+                again = client.post('/check_answer', json={'quiz_id': quiz_id, 'question_index': question_index,
+                                                           'selected_answer': 0})
+                forged = client.post('/check_answer', json={'question_index': 0, 'selected_answer': 0,
+                                                            'correct_answer': 0, 'topic': topic})
+                if again.status_code != 409 or forged.status_code != 400:
+                    errors.append(f"repeat {again.status_code}, forged {forged.status_code} from {student_id}")
+        if response.status_code != 200:
+            errors.append(f"{response.status_code} from {student_id}")
+            continue
+        interactions += 1
+        topics[topic] += 1
+
+    with expected_lock:
+        student = expected.setdefault(student_id, {'interactions': 0, 'topics': Counter(), 'quiz': {}})
+        student['interactions'] += interactions
+        student['topics'].update(topics)
+        for topic, (correct, total) in quiz.items():
+            counts = student['quiz'].setdefault(topic, [0, 0])
+            counts[0] += correct
+            counts[1] += total
+
+
+def check_store(store, expected):
+    """Return a list of mismatches between the store and the expected counts"""
+    problems = []
+    for student_id, want in expected.items():
+        summary = store.get_summary(student_id, recent=0)
+        if summary['total_interactions'] != want['interactions']:
+            problems.append(f"{student_id}: {summary['total_interactions']} interactions, expected {want['interactions']}")
+        if summary['topics_studied'] != dict(want['topics']):
+            problems.append(f"{student_id}: topics_studied {summary['topics_studied']} != {dict(want['topics'])}")
+        quiz = {topic: {'correct': c, 'total': t} for topic, (c, t) in want['quiz'].items()}
+        if summary['quiz_performance'] != quiz:
+            problems.append(f"{student_id}: quiz_performance {summary['quiz_performance']} != {quiz}")
+    return problems
+
+
+def check_failed_commit(make_store, backend, expected):
+    """Fail commits once or twice and check that the next flush still writes every update"""
+    store = make_store()
+    student_id = next(iter(expected))
+    commit = store.commit
+    failures = [1]
+
+    def failing_commit(records, sync):
+        if failures:
+            failures.pop()
+            raise OSError(errno.ENOSPC, "injected commit failure")
+        return commit(records, sync)
+
+    store.commit = failing_commit
+    faults = ['commit']
+    if backend == 'journal':
+        faults.append('fsync')
+    problems = []
+    for fault in faults:
+        fsync = os.fsync
+        if fault == 'fsync':
+            failures.append(1)
+
+            def failing_fsync(fd):
+                if failures:
+                    failures.pop()
+                    raise OSError(errno.EIO, "injected fsync failure")
+                return fsync(fd)
+            store.commit = commit
+            os.fsync = failing_fsync
+        # Depending on the durability mode the failure hits a record call,
+        # the background flusher or the flush below
+        try:
+            for _ in range(5):
+                try:
+                    store.record_interaction(student_id,
+                                             Interaction.now(InteractionKind.GENERATED_QUIZ, 'gravity', 3))
+                except OSError:
+                    pass
+            try:
+                store.flush()
+            except OSError:
+                pass
+        finally:
+            os.fsync = fsync
+        expected[student_id]['interactions'] += 5
+        expected[student_id]['topics']['gravity'] += 5
+        if failures:
+            problems.append(f"the injected {fault} failure never happened")
+        failures.clear()
+        store.flush()
+    store.close()
+    return problems + check_store(make_store(), expected)
+
+
+def check_torn_tail(make_store, journal_file, expected):
+    """Restart after a crash mid-append, record more updates and restart again"""
+    with open(journal_file, 'ab') as f:
+        f.write(b'{"op":"interaction","student_id":"torn')
+    store = make_store()
+    student_id = next(iter(expected))
+    for _ in range(5):
+        store.record_interaction(student_id, Interaction.now(InteractionKind.GENERATED_QUIZ, 'gravity', 3))
+    expected[student_id]['interactions'] += 5
+    expected[student_id]['topics']['gravity'] += 5
+    store.close()
+    return check_store(make_store(), expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', default='json', choices=['json', 'journal', 'sqlite'])
+    parser.add_argument('--durability', default='batched', choices=['always', 'batched', 'shutdown'])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--students', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=100, help="requests per thread")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='stress-memory-')
+    memory_file = os.path.join(workdir, 'student_memory.json')
+
+    def make_store():
+        store = create_memory_store(args.backend, memory_file, durability=args.durability,
+                                    flush_interval=0.05, compact_every=500)
+        store.load()
+        return store
+
+    store = make_store()
+    study_app.study_assistant = study_app.StudyAssistant(store=store)
+
+    students = [f"stress-student-{i}" for i in range(args.students)]
+    expected = {}
+    expected_lock = threading.Lock()
+    errors = []
+    threads = [
+        threading.Thread(target=run_client, args=(
+            study_app.app.test_client(), students[i % len(students)], args.requests, i,
+            expected, expected_lock, errors
+        ))
+        for i in range(args.threads)
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = args.threads * args.requests
+    print(f"{total} requests from {args.threads} threads in {elapsed:.2f}s ({total / elapsed:.0f} req/s)")
+
+    problems = list(errors)
+    problems += check_store(store, expected)
+    store.close()
+    reloaded = make_store()
+    problems += [f"after reload: {p}" for p in check_store(reloaded, expected)]
+    reloaded.close()
+    if expected:
+        problems += [f"after a failed commit: {p}" for p in check_failed_commit(make_store, args.backend, expected)]
+    if args.backend == 'journal' and expected:
+        problems += [f"after torn tail: {p}" for p in check_torn_tail(make_store, reloaded.journal.journal_file,
+                                                                      expected)]
+
+    if problems:
+        print(f"FAILED with {len(problems)} problems:")
+        for problem in problems[:20]:
+            print(f"  {problem}")
+        sys.exit(1)
+    print(f"OK: counters exact for {len(expected)} students ({args.backend}, {args.durability})")
+
+
+if __name__ == '__main__':
+    main()
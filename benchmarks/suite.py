@@ -0,0 +1,270 @@
+"""
+Benchmark suite for the assistant's hot paths, with regression checks.
+
+``run`` times each benchmark in-process and can save the results as JSON.
+It covers:
+- summarize_text on documents of several sizes built from the demo corpus
+- explain_topic for curated and unknown topics
+- generate_quiz, and select_optimal_questions on a large bank
+- get_readability_score
+- add_to_memory + save_memory with 1k, 10k and 100k stored interactions
+
+Every document is given a unique final sentence per call, so the summary
+cache and textstat's own caches never hide the real cost. The sentence
+cache is off: the demo corpus repeats a few sentences, which real notes
+don't.
+
+``compare`` reads two result files and flags every benchmark whose median
+got slower by more than the threshold. It exits with status 1 when there
+is a regression, so it can gate CI.
+
+Usage:
+    python benchmarks/suite.py run --output results.json
+    python benchmarks/suite.py run --only summarize memory --baseline results.json
+    python benchmarks/suite.py compare before.json after.json --threshold 0.1
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_quiz import make_bank
+from benchmarks.corpus import make_document
+from cache import LRUCache
+from interactions import InteractionKind
+
+SUMMARIZE_WORDS = (300, 3000, 30000)
+MEMORY_INTERACTIONS = (1000, 10000, 100000)
+# Stored interactions per simulated student
+INTERACTIONS_PER_STUDENT = 100
+# The app's default retention settings
+STORE_OPTIONS = {'history_limit': None, 'history_days': 365}
+
+
+def measure(func, rounds: int, min_time: float):
+    """Median, min and mean seconds per call of func.
+
+    The number of calls per round grows until a round takes at least
+    min_time, so fast functions aren't dominated by timer overhead.
+    """
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    per_call = [elapsed / number]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - start) / number)
+    return {
+        'median': statistics.median(per_call),
+        'min': min(per_call),
+        'mean': statistics.fmean(per_call),
+        'rounds': rounds,
+        'number': number
+    }
+
+
+def unique_texts(text: str):
+    """Endless copies of text, each ending in a different sentence"""
+    return (f"{text} This is revision number {i}." for i in itertools.count())
+
+
+def summarize_benchmarks(assistant):
+    for words in SUMMARIZE_WORDS:
+        texts = unique_texts(make_document(words))
+        yield f'summarize_text[{words}w]', lambda texts=texts: assistant.summarize_text(next(texts))
+
+
+def explain_benchmarks(assistant):
+    yield 'explain_topic[curated]', lambda: assistant.explain_topic('photosynthesis', 'intermediate')
+    yield 'explain_topic[fuzzy]', lambda: assistant.explain_topic('photosynthsis', 'simple')
+    yield 'explain_topic[unknown]', lambda: assistant.explain_topic('quantum physics', 'advanced')
+
+
+def quiz_benchmarks(assistant):
+    yield 'generate_quiz[curated]', lambda: assistant.generate_quiz('gravity', 5)
+    yield 'generate_quiz[unknown]', lambda: assistant.generate_quiz('quantum physics', 3)
+    bank = make_bank(10000, ['easy', 'medium', 'hard'])
+    yield 'select_optimal_questions[10000]', lambda: assistant.select_optimal_questions(bank, 20)
+
+
+def readability_benchmarks(assistant):
+    for words in (300, 3000):
+        texts = unique_texts(make_document(words, seed=1))
+        yield f'get_readability_score[{words}w]', lambda texts=texts: assistant.get_readability_score(next(texts))
+
+
+def memory_benchmarks(assistant_factory, backend, sizes):
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix='bench-suite-')
+        assistant = assistant_factory(backend, os.path.join(workdir, 'student_memory.json'))
+        records = []
+        for i in range(size):
+            student_id = f'student-{i // INTERACTIONS_PER_STUDENT}'
+            interaction = assistant.new_interaction(InteractionKind.EXPLAINED, f'topic {i % 50}', 'simple')
+            records.append({'op': 'interaction', 'student_id': student_id, 'interaction': interaction})
+        assistant.store.record_batch(records)
+
+        def add_and_save(assistant=assistant):
+            assistant.add_to_memory('student-0', InteractionKind.EXPLAINED, 'gravity', 'simple')
+            assistant.save_memory()
+
+        yield f'add_to_memory+save_memory[{backend},{size}]', add_and_save, lambda assistant=assistant, workdir=workdir: (
+            assistant.store.close(), shutil.rmtree(workdir, ignore_errors=True))
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    import app as study_app
+    from memory_store import DictMemoryStore, create_memory_store
+
+    def assistant_factory(backend, memory_file):
+        if backend == 'dict':
+            store = DictMemoryStore(**STORE_OPTIONS)
+        else:
+            store = create_memory_store(backend, memory_file, **STORE_OPTIONS)
+        assistant = study_app.StudyAssistant(store=store)
+        assistant.sentence_cache = LRUCache(max_entries=0)
+        return assistant
+
+    # Benchmarks that don't touch memory share an assistant with an in-memory store
+    assistant = assistant_factory('dict', None)
+    groups = {
+        'summarize': lambda: summarize_benchmarks(assistant),
+        'explain': lambda: explain_benchmarks(assistant),
+        'quiz': lambda: quiz_benchmarks(assistant),
+        'readability': lambda: readability_benchmarks(assistant),
+        'memory': lambda: memory_benchmarks(assistant_factory, args.backend, args.memory_sizes)
+    }
+
+    results = {}
+    print(f"{'benchmark':<46} {'median':>12} {'min':>12} {'calls':>7}")
+    for group in args.only or groups:
+        for name, func, *cleanup in groups[group]():
+            try:
+                result = measure(func, args.rounds, args.min_time)
+            finally:
+                for callback in cleanup:
+                    callback()
+            results[name] = dict(result, group=group)
+            print(f"{name:<46} {format_seconds(result['median']):>12} {format_seconds(result['min']):>12} "
+                  f"{result['rounds'] * result['number']:>7}")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'summary_engine': assistant.summary_engine,
+            'memory_backend': args.backend
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        return compare_reports(baseline, report, args.threshold)
+    return 0
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def compare_reports(baseline, current, threshold: float) -> int:
+    """Print per-benchmark changes; returns 1 if anything regressed"""
+    before, after = baseline['results'], current['results']
+    regressions = 0
+    print(f"\n{'benchmark':<46} {'before':>12} {'after':>12} {'change':>8}")
+    for name in list(before) + [name for name in after if name not in before]:
+        if name not in before or name not in after:
+            print(f"{name:<46} {'only in ' + ('baseline' if name in before else 'current'):>34}")
+            continue
+        old, new = before[name]['median'], after[name]['median']
+        change = new / old - 1 if old else 0.0
+        if change > threshold:
+            regressions += 1
+            flag = '  REGRESSION'
+        elif change < -threshold:
+            flag = '  improved'
+        else:
+            flag = ''
+        print(f"{name:<46} {format_seconds(old):>12} {format_seconds(new):>12} {change:>+8.1%}{flag}")
+    print(f"\n{regressions} regression(s) beyond {threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def compare(args):
+    reports = []
+    for path in (args.before, args.after):
+        with open(path, 'r', encoding='utf-8') as f:
+            reports.append(json.load(f))
+    return compare_reports(reports[0], reports[1], args.threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="time the benchmarks")
+    run_parser.add_argument('--only', nargs='+', choices=['summarize', 'explain', 'quiz', 'readability', 'memory'])
+    run_parser.add_argument('--rounds', type=int, default=5)
+    run_parser.add_argument('--min-time', type=float, default=0.2, help="minimum seconds per round")
+    run_parser.add_argument('--backend', default='json', choices=['json', 'journal', 'sqlite', 'dict'],
+                            help="memory store for the memory benchmarks")
+    run_parser.add_argument('--memory-sizes', type=int, nargs='+', default=list(MEMORY_INTERACTIONS))
+    run_parser.add_argument('--output', help="write results to this JSON file")
+    run_parser.add_argument('--baseline', help="compare against an earlier results file")
+    run_parser.add_argument('--threshold', type=float, default=0.1)
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser('compare', help="compare two results files")
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help="relative slowdown of the median counted as a regression")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Topic content loaded from versioned content packs.
+
+A content pack is a JSON file in the content directory:
+
+    {
+      "format": 1,
+      "pack": "core",
+      "version": 3,
+      "topics": {
+        "photosynthesis": {
+          "title": "Photosynthesis",
+          "aliases": ["photosynthesis in plants"],
+          "explanations": {"simple": "...", "intermediate": "...", "advanced": "..."},
+          "activities": ["..."],
+          "related": ["Cellular Respiration", "..."],
+          "quiz": [{"question": "...", "options": [...], "correct": 0,
+                    "explanation": "...", "difficulty": "easy"}]
+        }
+      }
+    }
+
+Every section of a topic is optional. Packs are loaded in file name
+order; when two packs define the same topic the later one wins.
+
+All packs are parsed once into an immutable ``ContentSnapshot`` indexed
+by normalized topic name. ``ContentRegistry`` checks the content
+directory for changes at most every ``reload_interval`` seconds and
+builds a new snapshot when something changed. Each snapshot carries a
+``TopicResolver`` that maps free-form queries to its topics. Requests already holding
+the old snapshot keep using it, so a reload never disturbs in-flight
+requests, and a pack that fails to load leaves the current snapshot in
+place.
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
+
+from quiz_bank import QuizBank
+from topic_resolver import TopicMatch, TopicResolver
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+SECTIONS = ('explanations', 'activities', 'related', 'quiz')
+
+
+def normalize_topic(topic: str) -> str:
+    """Lowercase a topic name and collapse its whitespace"""
+    return ' '.join(topic.lower().split())
+
+
+class ContentSnapshot:
+    """One immutable, fully indexed version of all content packs"""
+
+    def __init__(self, topics: Dict[str, Dict], packs: List[Dict], min_confidence: float = 0.6):
+        self.topics = MappingProxyType(topics)
+        self.packs = tuple(packs)
+        self.loaded_at = time.time()
+        self.resolver = TopicResolver({name: entry['key'] for name, entry in topics.items()},
+                                      min_confidence=min_confidence)
+        # Responses derived from this snapshot's content, keyed by the caller.
+        # They are dropped with the snapshot when the content changes.
+        self.derived = {}
+
+    def get(self, topic: str) -> Optional[Dict]:
+        """Content for a topic or one of its aliases"""
+        return self.topics.get(normalize_topic(topic))
+
+    def resolve(self, query: str) -> Tuple[Optional[Dict], Optional[TopicMatch]]:
+        """Content for the topic a free-form query is about, and how it matched"""
+        match = self.resolver.resolve(query)
+        if match is None:
+            return None, None
+        return self.topics[match.key], match
+
+    def canonical_topics(self) -> List[str]:
+        """Normalized names of every topic, without aliases"""
+        return sorted({entry['key'] for entry in self.topics.values()})
+
+
+def load_pack(path: str) -> Dict:
+    """Read and validate one content pack"""
+    with open(path, 'r', encoding='utf-8') as f:
+        pack = json.load(f)
+    if pack.get('format') != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported content pack format {pack.get('format')!r}")
+    if not isinstance(pack.get('topics'), dict):
+        raise ValueError(f"{path}: 'topics' must be an object")
+    for name, topic in pack['topics'].items():
+        unknown = set(topic) - set(SECTIONS) - {'title', 'aliases'}
+        if unknown:
+            raise ValueError(f"{path}: topic {name!r} has unknown sections {sorted(unknown)}")
+        for question in topic.get('quiz', []):
+            if not 0 <= question.get('correct', -1) < len(question.get('options', [])):
+                raise ValueError(f"{path}: quiz question {question.get('question')!r} has no valid answer")
+    return pack
+
+
+def build_snapshot(paths: List[str], min_confidence: float = 0.6) -> ContentSnapshot:
+    """Parse content packs and index their topics and aliases"""
+    topics = {}
+    packs = []
+    for path in paths:
+        pack = load_pack(path)
+        packs.append({
+            'pack': pack.get('pack', os.path.splitext(os.path.basename(path))[0]),
+            'version': pack.get('version'),
+            'path': path,
+            'topics': len(pack['topics'])
+        })
+        for name, topic in pack['topics'].items():
+            key = normalize_topic(name)
+            entry = {section: topic[section] for section in SECTIONS if section in topic}
+            entry['key'] = key
+            entry['title'] = topic.get('title', name)
+            entry['pack'] = packs[-1]['pack']
+            if topic.get('quiz'):
+                entry['quiz_bank'] = QuizBank(topic['quiz'])
+            if key in topics and topics[key]['key'] == key:
+                logger.warning("Topic %r from pack %s overrides pack %s", key, entry['pack'], topics[key]['pack'])
+            topics[key] = entry
+            for alias in topic.get('aliases', []):
+                topics.setdefault(normalize_topic(alias), entry)
+    return ContentSnapshot(topics, packs, min_confidence)
+
+
+class ContentRegistry:
+    """Loads content packs once and hot-reloads them when files change"""
+
+    def __init__(self, content_dir: str, reload_interval: float = 2.0, min_confidence: float = 0.6):
+        self.content_dir = content_dir
+        self.reload_interval = reload_interval
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        self._snapshot = None
+        self.reload()
+
+    def _pack_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.content_dir, '*.json')))
+
+    def _current_signature(self, paths: List[str]) -> Tuple:
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def reload(self, blocking: bool = True) -> bool:
+        """Rebuild the snapshot if any pack changed; returns True if it did"""
+        # Requests that find another thread already reloading keep serving
+        # the current snapshot instead of waiting
+        if not self._lock.acquire(blocking=blocking):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            paths = self._pack_paths()
+            signature = self._current_signature(paths)
+            if signature == self._signature:
+                return False
+            try:
+                snapshot = build_snapshot(paths, self.min_confidence)
+            except (OSError, ValueError) as e:
+                if self._snapshot is None:
+                    raise
+                logger.error("Keeping previous content after failed reload: %s", e)
+                self._signature = signature
+                return False
+            self._snapshot = snapshot
+            self._signature = signature
+            logger.info("Loaded %d content packs with %d topics", len(snapshot.packs), len(snapshot.canonical_topics()))
+            return True
+        finally:
+            self._lock.release()
+
+    @property
+    def snapshot(self) -> ContentSnapshot:
+        """The current snapshot; hold on to it for the duration of a request"""
+        if self.reload_interval and time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload(blocking=False)
+        return self._snapshot
+
+    def get(self, topic: str) -> Optional[Dict]:
+        return self.snapshot.get(topic)
+
+    def resolve(self, query: str) -> Tuple[Optional[Dict], Optional[TopicMatch]]:
+        return self.snapshot.resolve(query)
@@ -0,0 +1,336 @@
+"""
+Compact student interaction records.
+
+An interaction used to be a dict of an ISO timestamp string, a type
+string, a topic string and a content string such as "Explained gravity
+at simple level", and most of the content repeats the other fields. A
+record now keeps:
+- the timestamp, as whole seconds since the epoch
+- an InteractionKind, which stands for both the type and the template
+  the content is rendered from
+- the topic, interned in a process-wide TopicTable; topics are free
+  text, so the table is bounded and topics beyond it are kept as strings
+- a detail: the one value the template needs besides the topic, such as
+  the difficulty or the number of questions
+
+The content is only rendered when an interaction is returned to a
+client. Each student's interactions are stored column by column in an
+InteractionLog rather than as one object per interaction.
+"""
+
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime
+from enum import IntEnum
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class InteractionKind(IntEnum):
+    """What happened, which decides the interaction type and content template"""
+    # Anything else; the detail is the (type, content) pair as recorded
+    OTHER = 0
+    # Detail: the first 100 characters of the text
+    SUMMARIZED_TEXT = 1
+    # Detail: (file name, word count)
+    SUMMARIZED_FILE = 2
+    # Detail: the difficulty
+    EXPLAINED = 3
+    # Detail: the number of questions
+    GENERATED_QUIZ = 4
+    # Detail: the question index
+    ANSWERED_CORRECTLY = 5
+    ANSWERED_INCORRECTLY = 6
+
+
+KIND_TYPES = {
+    InteractionKind.SUMMARIZED_TEXT: 'summarization',
+    InteractionKind.SUMMARIZED_FILE: 'summarization',
+    InteractionKind.EXPLAINED: 'explanation',
+    InteractionKind.GENERATED_QUIZ: 'quiz_generation',
+    InteractionKind.ANSWERED_CORRECTLY: 'quiz_answer',
+    InteractionKind.ANSWERED_INCORRECTLY: 'quiz_answer'
+}
+
+# Kinds whose detail is a pair, stored as a JSON list on disk
+_PAIR_DETAILS = (InteractionKind.OTHER, InteractionKind.SUMMARIZED_FILE)
+
+
+def render_content(kind: InteractionKind, topic: Optional[str], detail) -> str:
+    """The content text of an interaction, as it was recorded before records were compact"""
+    if kind == InteractionKind.SUMMARIZED_TEXT:
+        return f"Summarized text: {detail}..."
+    if kind == InteractionKind.SUMMARIZED_FILE:
+        return f"Summarized file: {detail[0]} ({detail[1]} words)"
+    if kind == InteractionKind.EXPLAINED:
+        return f"Explained {topic} at {detail} level"
+    if kind == InteractionKind.GENERATED_QUIZ:
+        return f"Generated quiz for {topic} with {detail} questions"
+    if kind == InteractionKind.ANSWERED_CORRECTLY:
+        return f"Answered question {detail}: correct"
+    if kind == InteractionKind.ANSWERED_INCORRECTLY:
+        return f"Answered question {detail}: incorrect"
+    return detail[1]
+
+
+def _number(text: str):
+    """text as an int if it renders back to the same text, otherwise text"""
+    try:
+        number = int(text)
+    except ValueError:
+        return text
+    return number if str(number) == text else text
+
+
+def _parse_content(interaction_type: str, content: str, topic: Optional[str]):
+    """The kind and detail a legacy content string was rendered from"""
+    if interaction_type == 'summarization':
+        if content.startswith('Summarized text: ') and content.endswith('...'):
+            return InteractionKind.SUMMARIZED_TEXT, content[17:-3]
+        if content.startswith('Summarized file: ') and content.endswith(' words)') and ' (' in content:
+            name, _, words = content[17:-7].rpartition(' (')
+            if isinstance(_number(words), int):
+                return InteractionKind.SUMMARIZED_FILE, (name, int(words))
+    elif interaction_type == 'explanation' and topic is not None:
+        prefix = f"Explained {topic} at "
+        if content.startswith(prefix) and content.endswith(' level') and len(content) >= len(prefix) + 6:
+            return InteractionKind.EXPLAINED, sys.intern(content[len(prefix):-6])
+    elif interaction_type == 'quiz_generation' and topic is not None:
+        prefix = f"Generated quiz for {topic} with "
+        if content.startswith(prefix) and content.endswith(' questions') and len(content) >= len(prefix) + 10:
+            return InteractionKind.GENERATED_QUIZ, _number(content[len(prefix):-10])
+    elif interaction_type == 'quiz_answer' and content.startswith('Answered question '):
+        index, _, result = content[18:].rpartition(': ')
+        if result == 'correct':
+            return InteractionKind.ANSWERED_CORRECTLY, _number(index)
+        if result == 'incorrect':
+            return InteractionKind.ANSWERED_INCORRECTLY, _number(index)
+    return InteractionKind.OTHER, (interaction_type, content)
+
+
+# Topics interned per process; students mostly study the same few
+# hundred, so the table only fills up with one-off topics
+MAX_TOPICS = 65536
+
+
+class TopicTable:
+    """Interns topics as small integer ids; 0 stands for no topic.
+
+    Ids are never reused, so once max_topics topics are interned new ones
+    get no id and callers keep them as they are.
+    """
+
+    def __init__(self, max_topics: int = MAX_TOPICS):
+        self.max_topics = max_topics
+        self._ids = {None: 0}
+        self._names = [None]
+        self._lock = threading.Lock()
+
+    def id(self, topic: Optional[str]) -> Optional[int]:
+        """The topic's id, or None if it is new and the table is full"""
+        topic_id = self._ids.get(topic)
+        if topic_id is None:
+            with self._lock:
+                topic_id = self._ids.get(topic)
+                if topic_id is None:
+                    if len(self._names) > self.max_topics:
+                        return None
+                    topic_id = len(self._names)
+                    # The name must be there before another thread can see the id
+                    self._names.append(topic)
+                    self._ids[topic] = topic_id
+        return topic_id
+
+    def name(self, topic_id: int) -> Optional[str]:
+        return self._names[topic_id]
+
+    def __len__(self) -> int:
+        return len(self._names) - 1
+
+
+TOPICS = TopicTable()
+
+# Topic id of an interaction whose topic TOPICS had no room for
+_SPILLED = 0xFFFFFFFF
+
+
+class Interaction:
+    """One interaction, as passed between the assistant and the stores"""
+
+    __slots__ = ('timestamp', 'kind', 'topic', 'detail')
+
+    def __init__(self, timestamp: int, kind: InteractionKind, topic: Optional[str] = None, detail=None):
+        self.timestamp = timestamp
+        self.kind = kind
+        self.topic = topic
+        self.detail = detail
+
+    @classmethod
+    def now(cls, kind: InteractionKind, topic: Optional[str] = None, detail=None) -> 'Interaction':
+        if kind == InteractionKind.EXPLAINED and isinstance(detail, str):
+            # A handful of difficulties, shared by every explanation
+            detail = sys.intern(detail)
+        return cls(int(time.time()), kind, topic, detail)
+
+    @classmethod
+    def from_dict(cls, interaction: Dict) -> 'Interaction':
+        """Convert an interaction dict in the format used before records were compact"""
+        try:
+            timestamp = int(datetime.fromisoformat(str(interaction.get('timestamp'))).timestamp())
+        except ValueError:
+            timestamp = 0
+        topic = interaction.get('topic')
+        kind, detail = _parse_content(interaction.get('type'), interaction.get('content') or '', topic)
+        return cls(timestamp, kind, topic, detail)
+
+    @classmethod
+    def from_json(cls, value) -> 'Interaction':
+        """Decode to_json output, or an interaction dict in the old format"""
+        if isinstance(value, dict):
+            return cls.from_dict(value)
+        timestamp, kind, topic, detail = value
+        kind = InteractionKind(kind)
+        if kind in _PAIR_DETAILS:
+            detail = tuple(detail)
+        return cls(timestamp, kind, topic, detail)
+
+    def to_json(self) -> List:
+        return [self.timestamp, int(self.kind), self.topic, self.detail]
+
+    @property
+    def type(self) -> str:
+        return KIND_TYPES.get(self.kind) or self.detail[0]
+
+    @property
+    def content(self) -> str:
+        return render_content(self.kind, self.topic, self.detail)
+
+    @property
+    def day(self) -> str:
+        """Local date of the interaction, the key of the daily rollup"""
+        return time.strftime('%Y-%m-%d', time.localtime(self.timestamp))
+
+    def to_dict(self) -> Dict:
+        """The interaction as clients see it, with its content rendered"""
+        return {
+            'timestamp': datetime.fromtimestamp(self.timestamp).isoformat(),
+            'type': self.type,
+            'content': self.content,
+            'topic': self.topic
+        }
+
+
+class InteractionLog:
+    """A student's interactions, oldest first, stored column by column.
+
+    Timestamps, kinds and interned topic ids live in typed arrays; only
+    the details are Python objects, and most of those are small ints or
+    interned strings shared between records. Topics TOPICS had no room
+    for are kept in a spilled column, which only exists once a log has
+    one. Indexing returns Interaction objects built on the fly.
+    """
+
+    __slots__ = ('timestamps', 'kinds', 'topics', 'details', 'spilled')
+
+    def __init__(self, interactions: Iterable[Interaction] = ()):
+        self.timestamps = array('q')
+        self.kinds = array('B')
+        self.topics = array('I')
+        self.details = []
+        self.spilled = None
+        for interaction in interactions:
+            self.append(interaction)
+
+    def append(self, interaction: Interaction) -> None:
+        self.timestamps.append(interaction.timestamp)
+        self.kinds.append(interaction.kind)
+        self._append_topic(interaction.topic)
+        self.details.append(interaction.detail)
+
+    def _append_topic(self, topic: Optional[str]) -> None:
+        topic_id = TOPICS.id(topic)
+        if topic_id is None:
+            if self.spilled is None:
+                self.spilled = [None] * len(self.topics)
+            self.topics.append(_SPILLED)
+            self.spilled.append(topic)
+            return
+        self.topics.append(topic_id)
+        if self.spilled is not None:
+            self.spilled.append(None)
+
+    def _topic(self, index: int) -> Optional[str]:
+        topic_id = self.topics[index]
+        return self.spilled[index] if topic_id == _SPILLED else TOPICS.name(topic_id)
+
+    def _get(self, index: int) -> Interaction:
+        return Interaction(self.timestamps[index], InteractionKind(self.kinds[index]),
+                           self._topic(index), self.details[index])
+
+    def __len__(self) -> int:
+        return len(self.details)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(len(self))[index]]
+        return self._get(index)
+
+    def __iter__(self) -> Iterator[Interaction]:
+        for index in range(len(self)):
+            yield self._get(index)
+
+    def pop_oldest(self, count: int) -> List[Interaction]:
+        """Remove the oldest count interactions and return them"""
+        evicted = self[:count]
+        for column in (self.timestamps, self.kinds, self.topics, self.details):
+            del column[:count]
+        if self.spilled is not None:
+            del self.spilled[:count]
+        return evicted
+
+    def copy(self) -> 'InteractionLog':
+        log = InteractionLog()
+        log.timestamps = array('q', self.timestamps)
+        log.kinds = array('B', self.kinds)
+        log.topics = array('I', self.topics)
+        log.details = list(self.details)
+        log.spilled = None if self.spilled is None else list(self.spilled)
+        return log
+
+    def to_columns(self, topic_ids: Dict[Optional[str], int]) -> Dict[str, List]:
+        """Columns for the memory file.
+
+        Timestamps are stored as the difference from the previous one and
+        topics as ids into a file-wide table, which topic_ids maps to and
+        is extended with topics it hasn't seen.
+        """
+        deltas = []
+        previous = 0
+        for timestamp in self.timestamps:
+            deltas.append(timestamp - previous)
+            previous = timestamp
+        topics = []
+        for index in range(len(self)):
+            topic = self._topic(index)
+            if topic not in topic_ids:
+                topic_ids[topic] = len(topic_ids)
+            topics.append(topic_ids[topic])
+        return {'timestamp': deltas, 'kind': list(self.kinds), 'topic': topics, 'detail': self.details}
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, List], topic_names: List[Optional[str]]) -> 'InteractionLog':
+        log = cls()
+        timestamp = 0
+        for delta in columns['timestamp']:
+            timestamp += delta
+            log.timestamps.append(timestamp)
+        log.kinds = array('B', columns['kind'])
+        for topic in columns['topic']:
+            log._append_topic(topic_names[topic])
+        log.details = [
+            tuple(detail) if kind in _PAIR_DETAILS else
+            sys.intern(detail) if kind == InteractionKind.EXPLAINED and isinstance(detail, str) else detail
+            for kind, detail in zip(log.kinds, columns['detail'])
+        ]
+        return log
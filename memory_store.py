@@ -0,0 +1,1161 @@
+"""
+Storage backends for student memory.
+
+Student memory is keyed by student id. Each student holds an
+``interactions`` log of compact records (see interactions.py),
+``topics_studied`` counters, ``quiz_performance`` tallies,
+``preferences`` and ``history`` rollups. With a ``history_limit``
+only the most recent interactions are kept; the rollups (total, per type
+and per day) still count every interaction, and evicted interactions can
+be appended to an ``InteractionArchive``. ``MemoryStore`` is the interface the
+StudyAssistant talks to; the backends here keep that state in a JSON
+file, an append-only journal, or a SQLite database.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from cache import LRUCache
+from interactions import MAX_TOPICS, Interaction, InteractionLog
+
+logger = logging.getLogger(__name__)
+
+# 'always' commits and fsyncs every update before the request returns,
+# 'batched' hands updates to a background flusher that commits them in
+# groups, 'shutdown' only writes when the store is closed
+DURABILITY_MODES = ('always', 'batched', 'shutdown')
+
+# Memory files without a format field hold one dict per interaction
+MEMORY_FORMAT_VERSION = 2
+
+
+def new_student_record() -> Dict:
+    """Return an empty memory record for a new student"""
+    return {
+        'interactions': InteractionLog(),
+        'topics_studied': {},
+        'quiz_performance': {},
+        'preferences': {},
+        'history': new_history_stats()
+    }
+
+
+def new_history_stats() -> Dict:
+    """Return empty interaction rollups"""
+    return {'total_interactions': 0, 'by_type': {}, 'daily': {}}
+
+
+def count_interaction(stats: Dict, interaction: Interaction, history_days: Optional[int] = None) -> None:
+    """Add an interaction to a student's rollups, keeping at most history_days days"""
+    stats['total_interactions'] += 1
+    interaction_type = interaction.type
+    stats['by_type'][interaction_type] = stats['by_type'].get(interaction_type, 0) + 1
+    daily = stats['daily']
+    day = interaction.day
+    daily[day] = daily.get(day, 0) + 1
+    while history_days and len(daily) > history_days:
+        del daily[min(daily)]
+
+
+def history_stats(student: Dict, history_days: Optional[int] = None) -> Dict:
+    """A student's rollups, rebuilt from its interactions for records that predate them"""
+    stats = student.get('history')
+    if stats is None:
+        stats = new_history_stats()
+        for interaction in student.get('interactions', []):
+            count_interaction(stats, interaction, history_days)
+        student['history'] = stats
+    return stats
+
+
+def trim_history(student: Dict, history_limit: Optional[int]) -> List[Interaction]:
+    """Drop all but the newest history_limit interactions and return the dropped ones"""
+    interactions = student.get('interactions', [])
+    if not history_limit or len(interactions) <= history_limit:
+        return []
+    return interactions.pop_oldest(len(interactions) - history_limit)
+
+
+def copy_student(student: Dict) -> Dict:
+    """Copy a student record deep enough that later updates don't show through"""
+    copied = {}
+    for key, value in student.items():
+        if isinstance(value, InteractionLog):
+            copied[key] = value.copy()
+        elif isinstance(value, list):
+            copied[key] = list(value)
+        elif isinstance(value, dict):
+            copied[key] = {k: dict(v) if isinstance(v, dict) else v for k, v in value.items()}
+        else:
+            copied[key] = value
+    return copied
+
+
+def apply_interaction(memory: Dict, student_id: str, interaction: Interaction,
+                      history_limit: Optional[int] = None, history_days: Optional[int] = None) -> List[Interaction]:
+    """Append an interaction to a student's record and bump its counters.
+
+    Returns the interactions that fell out of the recent history.
+    """
+    student = memory.setdefault(student_id, new_student_record())
+    count_interaction(history_stats(student, history_days), interaction, history_days)
+    student['interactions'].append(interaction)
+
+    topic = interaction.topic
+    if topic:
+        student['topics_studied'][topic] = student['topics_studied'].get(topic, 0) + 1
+    return trim_history(student, history_limit)
+
+
+def apply_quiz_result(memory: Dict, student_id: str, topic: str, is_correct: bool) -> None:
+    """Update a student's quiz performance for a topic"""
+    student = memory.setdefault(student_id, new_student_record())
+    performance = student['quiz_performance'].setdefault(topic, {'correct': 0, 'total': 0})
+    performance['total'] += 1
+    if is_correct:
+        performance['correct'] += 1
+
+
+def apply_record(memory: Dict, record: Dict, history_limit: Optional[int] = None,
+                 history_days: Optional[int] = None) -> List[Interaction]:
+    """Apply a single journal record to memory and return evicted interactions"""
+    op = record.get('op')
+    if op == 'interaction':
+        return apply_interaction(memory, record['student_id'], record['interaction'], history_limit, history_days)
+    elif op == 'quiz':
+        apply_quiz_result(memory, record['student_id'], record['topic'], record['correct'])
+        return []
+    else:
+        raise ValueError(f"Unknown journal record op: {op!r}")
+
+
+def encode_record(record: Dict) -> Dict:
+    """A journal record with its interaction in compact JSON form"""
+    if record.get('op') == 'interaction':
+        return dict(record, interaction=record['interaction'].to_json())
+    return record
+
+
+def decode_record(record: Dict) -> Dict:
+    if record.get('op') == 'interaction':
+        record['interaction'] = Interaction.from_json(record['interaction'])
+    return record
+
+
+def encode_memory(memory: Dict) -> Dict:
+    """Memory in the memory file format.
+
+    Each student's interactions are stored as columns, with topics as ids
+    into one table of topics for the whole file.
+    """
+    topic_ids = {None: 0}
+    students = {}
+    for student_id, student in memory.items():
+        encoded = dict(student)
+        encoded['interactions'] = student.get('interactions', InteractionLog()).to_columns(topic_ids)
+        students[student_id] = encoded
+    return {'format': MEMORY_FORMAT_VERSION, 'topics': list(topic_ids), 'students': students}
+
+
+def decode_memory(data: Dict) -> Dict:
+    """Memory from a memory file, in the current format or the one with an interaction dict per interaction"""
+    if data.get('format') != MEMORY_FORMAT_VERSION:
+        for student in data.values():
+            student['interactions'] = InteractionLog(
+                Interaction.from_dict(interaction) for interaction in student.get('interactions', [])
+            )
+        return data
+    memory = data['students']
+    for student in memory.values():
+        student['interactions'] = InteractionLog.from_columns(student['interactions'], data['topics'])
+    return memory
+
+
+def load_memory_file(path: str) -> Dict:
+    """Read a memory file written by any version of the JSON store"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return decode_memory(json.load(f))
+
+
+def atomic_write_text(path: str, text: str, fsync: bool = True) -> int:
+    """Write text to a temp file in the same directory, rename it over path and return its size"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        # mkstemp creates the file as 0600; keep the permissions of the file being replaced
+        mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+            size = os.fstat(f.fileno()).st_size
+        os.replace(tmp_path, path)
+        return size
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, data, indent: Optional[int] = None, fsync: bool = True) -> int:
+    """Serialize data as JSON, without whitespace unless indent is given, and write it atomically to path"""
+    separators = (',', ':') if indent is None else None
+    return atomic_write_text(path, json.dumps(data, indent=indent, separators=separators, ensure_ascii=False),
+                             fsync=fsync)
+
+
+class StripedLock:
+    """A fixed pool of locks where each key always maps to the same lock.
+
+    Updates for different students usually land on different stripes and
+    run in parallel, while updates for the same student are serialized.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def for_key(self, key: str) -> threading.RLock:
+        return self._locks[hash(key) % len(self._locks)]
+
+    @contextmanager
+    def all(self):
+        """Hold every stripe, always acquired in the same order"""
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+
+class InteractionArchive:
+    """Cold storage for interactions evicted from the recent history.
+
+    Interactions are appended as JSON lines of ``[student_id, timestamp,
+    kind, topic, detail]`` to numbered segment files in ``directory``. A new segment is started once
+    the current one reaches ``segment_bytes``. Archiving happens when an
+    interaction is evicted, before the update that evicted it is committed,
+    so a crash in between can archive an interaction twice but never lose it.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        existing = [name for name in os.listdir(directory)
+                    if name.startswith('interactions-') and name.endswith('.jsonl')]
+        self.segment = max((int(name[13:-6]) for name in existing), default=1)
+        self._file = None
+        self._lock = threading.Lock()
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"interactions-{segment:06d}.jsonl")
+
+    def append(self, student_id: str, interactions: List[Interaction]) -> None:
+        """Append a student's evicted interactions to the current segment"""
+        data = ''.join(
+            json.dumps([student_id] + interaction.to_json(), ensure_ascii=False, separators=(',', ':')) + '\n'
+            for interaction in interactions
+        ).encode('utf-8')
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.segment_path(self.segment), 'ab')
+            if self._file.tell() >= self.segment_bytes:
+                self._file.close()
+                self.segment += 1
+                self._file = open(self.segment_path(self.segment), 'ab')
+            self._file.write(data)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class MemoryJournal:
+    """Append-only interaction log with periodic compaction into a snapshot.
+
+    Every update is appended to the journal as one JSON line tagged with a
+    sequence number. Compaction writes the full memory dict, together with
+    the last sequence number it contains, to the snapshot file atomically
+    and then truncates the journal. On startup the snapshot is loaded and
+    any journal records newer than it are replayed, so a crash between the
+    snapshot write and the truncate never applies a record twice. A torn
+    final line left by a crash mid-append is cut off the journal on load,
+    so later appends start on a clean line.
+    """
+
+    def __init__(self, snapshot_file: str, journal_file: str,
+                 compact_every: int = 1000, seed_file: Optional[str] = None):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.compact_every = compact_every
+        self.seed_file = seed_file
+        self.seq = 0
+        self.pending_records = 0
+        self._journal = None
+
+    def load(self, history_limit: Optional[int] = None, history_days: Optional[int] = None) -> Dict:
+        """Load the snapshot and replay the journal on top of it"""
+        memory = {}
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            memory = decode_memory(snapshot.get('memory', {}))
+            snapshot_seq = snapshot.get('seq', 0)
+        elif self.seed_file and os.path.exists(self.seed_file):
+            # First start in journal mode: seed from the plain JSON memory file
+            memory = load_memory_file(self.seed_file)
+
+        self.seq = snapshot_seq
+        self.pending_records = 0
+        if os.path.exists(self.journal_file):
+            # Bytes up to the end of the last complete record
+            good = 0
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError("record without a line ending")
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write at the tail of the log
+                        break
+                    good += len(line)
+                    if record.get('seq', 0) <= snapshot_seq:
+                        continue
+                    # Interactions evicted during replay were archived when
+                    # they were first evicted
+                    apply_record(memory, decode_record(record), history_limit, history_days)
+                    self.seq = record['seq']
+                    self.pending_records += 1
+            size = os.path.getsize(self.journal_file)
+            if good < size:
+                logger.warning("Dropping %d bytes of torn journal records from %s", size - good, self.journal_file)
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(good)
+                    os.fsync(f.fileno())
+        return memory
+
+    def append(self, records: List[Dict], sync: bool = False) -> int:
+        """Append records to the journal in a single write and return the bytes written.
+
+        If the write fails, whatever part of it reached the file is cut off
+        again, so the same records can be appended again later without
+        being replayed twice.
+        """
+        start_seq = self.seq
+        lines = []
+        for record in records:
+            self.seq += 1
+            lines.append(json.dumps(dict(encode_record(record), seq=self.seq), ensure_ascii=False,
+                                    separators=(',', ':')))
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'ab')
+        data = ('\n'.join(lines) + '\n').encode('utf-8')
+        offset = self._journal.tell()
+        try:
+            self._journal.write(data)
+            self._journal.flush()
+            if sync:
+                os.fsync(self._journal.fileno())
+        except BaseException:
+            self.seq = start_seq
+            self._rollback(offset)
+            raise
+        self.pending_records += len(records)
+        return len(data)
+
+    def _rollback(self, offset: int) -> None:
+        """Truncate the journal back to offset after a failed append"""
+        journal, self._journal = self._journal, None
+        try:
+            # Closing flushes anything still buffered, which is cut off too
+            journal.close()
+        except OSError:
+            pass
+        try:
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(offset)
+                os.fsync(f.fileno())
+        except OSError:
+            # Load cuts off a torn tail, but whole records left behind
+            # would be replayed twice
+            logger.exception("Could not truncate %s after a failed append", self.journal_file)
+
+    def needs_compaction(self) -> bool:
+        return self.pending_records >= self.compact_every
+
+    def compact(self, memory: Dict, sync: bool = True) -> int:
+        """Write memory to the snapshot file, start a fresh journal and return the snapshot size"""
+        written = atomic_write_json(self.snapshot_file, {'seq': self.seq, 'memory': encode_memory(memory)}, fsync=sync)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_file, 'wb')
+        self.pending_records = 0
+        return written
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+class MemoryStore:
+    """Interface for student memory storage backends.
+
+    Updates are queued as journal-style records and written out by
+    ``commit``. The durability mode decides when that happens: right away
+    for every update, in groups from a background flusher thread every
+    ``flush_interval`` seconds or ``flush_max_pending`` records, or only
+    when the store is closed.
+
+    ``history_limit`` caps the interactions kept per student and
+    ``history_days`` the daily activity buckets; interactions beyond the
+    limit go to an archive in ``archive_dir`` if one is given.
+    """
+
+    def __init__(self, durability: str = 'always', flush_interval: float = 1.0,
+                 flush_max_pending: int = 100, history_limit: Optional[int] = None,
+                 history_days: Optional[int] = None, archive_dir: Optional[str] = None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.flush_max_pending = flush_max_pending
+        self.history_limit = history_limit
+        self.history_days = history_days
+        self.archive = InteractionArchive(archive_dir) if archive_dir else None
+        # Called as on_commit(seconds, bytes_written, records) after every
+        # write to storage; bytes_written is None when the backend can't tell
+        self.on_commit = None
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._closed = False
+
+    def load(self) -> None:
+        """Load or open the underlying storage"""
+
+    def save(self) -> None:
+        """Write all state out to durable storage"""
+        self.flush()
+
+    def close(self) -> None:
+        """Stop the flusher and write out any pending updates"""
+        self._closed = True
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        if self.archive is not None:
+            self.archive.close()
+
+    def _archive(self, evicted: Dict[str, List[Interaction]]) -> None:
+        """Send evicted interactions, keyed by student id, to the archive"""
+        if self.archive is None:
+            return
+        for student_id, interactions in evicted.items():
+            if interactions:
+                self.archive.append(student_id, interactions)
+
+    def commit(self, records: List[Dict], sync: bool) -> Optional[int]:
+        """Write a batch of update records to storage and return the bytes written"""
+        raise NotImplementedError
+
+    def size(self) -> Dict[str, int]:
+        """Number of students and bytes used on disk"""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Commit every queued update as one batch.
+
+        A batch whose commit fails stays queued, ahead of later updates,
+        and is committed by the next flush.
+        """
+        with self._commit_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if batch:
+                try:
+                    self._timed(lambda: self.commit(batch, sync=True), len(batch))
+                except BaseException:
+                    self._requeue(batch)
+                    raise
+
+    def _timed(self, write: Callable[[], Optional[int]], records: int) -> None:
+        """Run a storage write and report it to on_commit"""
+        start = time.perf_counter()
+        written = write()
+        if self.on_commit is not None:
+            self.on_commit(time.perf_counter() - start, written, records)
+
+    def _requeue(self, batch: List[Dict]) -> None:
+        """Put back a batch that failed to commit, ahead of updates queued since"""
+        with self._pending_lock:
+            self._pending[:0] = batch
+
+    def _queue(self, record: Dict) -> int:
+        with self._pending_lock:
+            self._pending.append(record)
+            return len(self._pending)
+
+    def _queue_many(self, records: List[Dict]) -> int:
+        with self._pending_lock:
+            self._pending.extend(records)
+            return len(self._pending)
+
+    def _schedule_flush(self, pending_count: int) -> None:
+        if self.durability == 'always':
+            self.flush()
+        elif self.durability == 'batched':
+            if self._flusher is None:
+                self._start_flusher()
+            if pending_count >= self.flush_max_pending:
+                self._wakeup.set()
+
+    def _start_flusher(self) -> None:
+        with self._pending_lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run_flusher, name='memory-flusher', daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Background memory flush failed")
+
+    def record_interaction(self, student_id: str, interaction: Interaction) -> None:
+        raise NotImplementedError
+
+    def record_quiz_result(self, student_id: str, topic: str, is_correct: bool) -> None:
+        raise NotImplementedError
+
+    def record_batch(self, records: List[Dict]) -> None:
+        """Apply several update records and persist them in one commit"""
+        raise NotImplementedError
+
+    def get_student(self, student_id: str) -> Dict:
+        """Return the full record for a student, with interactions as dicts, or an empty dict"""
+        raise NotImplementedError
+
+    def get_progress(self, student_id: str) -> Dict:
+        """Return a student's topics_studied and quiz_performance"""
+        raise NotImplementedError
+
+    def get_summary(self, student_id: str, recent: int = 10) -> Dict:
+        """Return interaction totals, progress and the most recent interactions, rendered as dicts"""
+        raise NotImplementedError
+
+
+class DictMemoryStore(MemoryStore):
+    """Keeps all student memory in an in-process dict without persisting it.
+
+    Each student's record is only touched while holding that student's
+    stripe of ``self._locks``, and readers get copies taken under the same
+    lock, so concurrent requests never see a record mid-update.
+    """
+
+    def __init__(self, memory: Optional[Dict] = None, stripes: int = 64, **options):
+        super().__init__(**options)
+        self.memory = memory if memory is not None else {}
+        self._locks = StripedLock(stripes)
+
+    def commit(self, records: List[Dict], sync: bool) -> Optional[int]:
+        return None
+
+    def size(self) -> Dict[str, int]:
+        return {'students': len(self.memory)}
+
+    def _update(self, record: Dict) -> None:
+        with self._locks.for_key(record['student_id']):
+            evicted = apply_record(self.memory, record, self.history_limit, self.history_days)
+            pending_count = self._queue(record)
+        if evicted:
+            self._archive({record['student_id']: evicted})
+        self._schedule_flush(pending_count)
+
+    def _apply_retention(self) -> bool:
+        """Add missing rollups and trim every student's history after loading.
+
+        Returns True if anything was trimmed, so the caller can persist the
+        trimmed memory before the evicted interactions are archived again.
+        """
+        evicted = {}
+        for student_id, student in self.memory.items():
+            history_stats(student, self.history_days)
+            evicted[student_id] = trim_history(student, self.history_limit)
+        self._archive(evicted)
+        return any(evicted.values())
+
+    def snapshot(self) -> Dict:
+        """Copy all of memory one student at a time"""
+        # list() of a dict's keys runs without releasing the GIL, so students
+        # added concurrently can't break the iteration
+        snapshot = {}
+        for student_id in list(self.memory):
+            with self._locks.for_key(student_id):
+                snapshot[student_id] = copy_student(self.memory[student_id])
+        return snapshot
+
+    def record_interaction(self, student_id: str, interaction: Interaction) -> None:
+        self._update({'op': 'interaction', 'student_id': student_id, 'interaction': interaction})
+
+    def record_quiz_result(self, student_id: str, topic: str, is_correct: bool) -> None:
+        self._update({'op': 'quiz', 'student_id': student_id, 'topic': topic, 'correct': is_correct})
+
+    def record_batch(self, records: List[Dict]) -> None:
+        if not records:
+            return
+        by_student = {}
+        for record in records:
+            by_student.setdefault(record['student_id'], []).append(record)
+        # Each student's records are applied and queued under its stripe
+        # lock, as in _update, and the whole batch is flushed once
+        pending_count = 0
+        evicted = {}
+        for student_id, student_records in by_student.items():
+            with self._locks.for_key(student_id):
+                evicted[student_id] = []
+                for record in student_records:
+                    evicted[student_id].extend(apply_record(self.memory, record, self.history_limit, self.history_days))
+                pending_count = self._queue_many(student_records)
+        self._archive(evicted)
+        self._schedule_flush(pending_count)
+
+    def get_student(self, student_id: str) -> Dict:
+        with self._locks.for_key(student_id):
+            student = self.memory.get(student_id)
+            if not student:
+                return {}
+            student = copy_student(student)
+        student['interactions'] = [interaction.to_dict() for interaction in student['interactions']]
+        return student
+
+    def get_progress(self, student_id: str) -> Dict:
+        with self._locks.for_key(student_id):
+            student = copy_student(self.memory.get(student_id, {}))
+        return {
+            'topics_studied': student.get('topics_studied', {}),
+            'quiz_performance': student.get('quiz_performance', {})
+        }
+
+    def get_summary(self, student_id: str, recent: int = 10) -> Dict:
+        with self._locks.for_key(student_id):
+            student = self.memory.get(student_id)
+            stats = history_stats(student, self.history_days) if student else new_history_stats()
+            student = student or {}
+            return {
+                'total_interactions': stats['total_interactions'],
+                'topics_studied': dict(student.get('topics_studied', {})),
+                'quiz_performance': {t: dict(p) for t, p in student.get('quiz_performance', {}).items()},
+                'activity_by_type': dict(stats['by_type']),
+                'daily_activity': dict(sorted(stats['daily'].items())),
+                'recent_interactions': [interaction.to_dict()
+                                        for interaction in student.get('interactions', [])[-recent:]]
+            }
+
+
+class JsonMemoryStore(DictMemoryStore):
+    """Rewrites the whole memory file when updates are committed"""
+
+    def __init__(self, memory_file: str, **options):
+        super().__init__(**options)
+        self.memory_file = memory_file
+
+    def load(self) -> None:
+        try:
+            self.memory = load_memory_file(self.memory_file)
+        except FileNotFoundError:
+            self.memory = {}
+        if self._apply_retention():
+            self.commit([], sync=True)
+
+    def save(self) -> None:
+        with self._commit_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            self._timed(lambda: self.commit([], sync=True), len(batch))
+
+    def commit(self, records: List[Dict], sync: bool) -> int:
+        # However many updates are in the batch, the file is written once
+        return atomic_write_json(self.memory_file, encode_memory(self.snapshot()), fsync=sync)
+
+    def size(self) -> Dict[str, int]:
+        size = super().size()
+        size['bytes'] = os.path.getsize(self.memory_file) if os.path.exists(self.memory_file) else 0
+        return size
+
+
+class JournalMemoryStore(DictMemoryStore):
+    """Appends each batch of updates to a MemoryJournal and compacts it periodically"""
+
+    def __init__(self, memory_file: str, compact_every: int = 1000, **options):
+        super().__init__(**options)
+        base, _ = os.path.splitext(memory_file)
+        self.journal = MemoryJournal(
+            snapshot_file=f"{base}.snapshot.json",
+            journal_file=f"{base}.journal",
+            compact_every=compact_every,
+            seed_file=memory_file
+        )
+
+    def load(self) -> None:
+        self.memory = self.journal.load(self.history_limit, self.history_days)
+        if self._apply_retention():
+            self.journal.compact(self.memory)
+
+    def save(self) -> None:
+        with self._commit_lock:
+            self._timed(lambda: self._compact(sync=True), 0)
+
+    def close(self) -> None:
+        super().close()
+        self.journal.close()
+
+    def commit(self, records: List[Dict], sync: bool) -> int:
+        written = self.journal.append(records, sync=sync)
+        if self.journal.needs_compaction():
+            try:
+                written += self._compact(sync=sync)
+            except Exception:
+                # The batch is in the journal already, so the commit stands;
+                # compaction is tried again after the next one
+                logger.exception("Journal compaction failed")
+        return written
+
+    def size(self) -> Dict[str, int]:
+        size = super().size()
+        size['bytes'] = sum(os.path.getsize(path) for path in (self.journal.snapshot_file, self.journal.journal_file)
+                            if os.path.exists(path))
+        return size
+
+    def _compact(self, sync: bool) -> int:
+        # Holding every stripe stops new updates, so every update already
+        # applied to memory is in the journal before the snapshot records
+        # its sequence number
+        with self._locks.all():
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            written = 0
+            if batch:
+                try:
+                    written = self.journal.append(batch, sync=False)
+                except BaseException:
+                    self._requeue(batch)
+                    raise
+            return written + self.journal.compact(self.memory, sync=sync)
+
+
+class SqliteMemoryStore(MemoryStore):
+    """Keeps student memory in indexed SQLite tables.
+
+    The database runs in WAL mode so several worker processes can share it:
+    readers never block the writer, and every query touches only the rows
+    of the student being asked about. Each thread gets its own connection.
+
+    Interactions are stored as compact records: an integer timestamp, the
+    kind, a topic id from ``topic_names`` and the detail as JSON.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS interactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            kind INTEGER NOT NULL,
+            topic INTEGER,
+            detail TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_interactions_student ON interactions (student_id, id);
+        CREATE TABLE IF NOT EXISTS topic_names (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS topics_studied (
+            student_id TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, topic)
+        );
+        CREATE TABLE IF NOT EXISTS quiz_performance (
+            student_id TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            correct INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, topic)
+        );
+        CREATE TABLE IF NOT EXISTS interaction_stats (
+            student_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (student_id, kind, key)
+        );
+    """
+
+    # Rollups rebuilt from the interactions of databases created before
+    # interaction_stats existed, which still have text timestamps, types and
+    # contents
+    BACKFILL_STATS = """
+        INSERT INTO interaction_stats (student_id, kind, key, count)
+            SELECT student_id, 'total', '', COUNT(*) FROM interactions GROUP BY student_id;
+        INSERT INTO interaction_stats (student_id, kind, key, count)
+            SELECT student_id, 'type', type, COUNT(*) FROM interactions GROUP BY student_id, type;
+        INSERT INTO interaction_stats (student_id, kind, key, count)
+            SELECT student_id, 'day', substr(timestamp, 1, 10), COUNT(*) FROM interactions
+            GROUP BY student_id, substr(timestamp, 1, 10);
+    """
+
+    def __init__(self, db_file: str, seed_file: Optional[str] = None, **options):
+        super().__init__(**options)
+        self.db_file = db_file
+        self.seed_file = seed_file
+        self._local = threading.local()
+        # Topic ids never change once assigned, so they are cached for the
+        # life of the store, up to as many topics as are interned in memory
+        self._topic_ids = LRUCache(max_entries=MAX_TOPICS)
+        self._topic_names = LRUCache(max_entries=MAX_TOPICS)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # FULL syncs the WAL on every commit; NORMAL leaves that to checkpoints
+            conn.execute(f"PRAGMA synchronous={'NORMAL' if self.durability == 'shutdown' else 'FULL'}")
+            self._local.conn = conn
+        return conn
+
+    def load(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.executescript(self.SCHEMA)
+        empty = conn.execute('SELECT NOT EXISTS (SELECT 1 FROM interactions)').fetchone()[0]
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(interactions)')}
+        if 'content' in columns:
+            no_stats = conn.execute('SELECT NOT EXISTS (SELECT 1 FROM interaction_stats)').fetchone()[0]
+            if not empty and no_stats:
+                conn.executescript(f"BEGIN; {self.BACKFILL_STATS} COMMIT;")
+            self._migrate_interactions(conn)
+            if not empty and no_stats:
+                student_ids = [row[0] for row in conn.execute('SELECT DISTINCT student_id FROM interactions')]
+                with conn:
+                    evicted = self._apply_retention(conn, student_ids)
+                self._archive(evicted)
+        if empty and self.seed_file and os.path.exists(self.seed_file):
+            self.import_memory(load_memory_file(self.seed_file))
+
+    def _migrate_interactions(self, conn: sqlite3.Connection) -> None:
+        """Convert an interactions table with a row of text columns per interaction to compact records"""
+        with conn:
+            conn.execute('DROP INDEX IF EXISTS idx_interactions_student')
+            conn.execute('ALTER TABLE interactions RENAME TO legacy_interactions')
+        conn.executescript(self.SCHEMA)
+        with conn:
+            rows = conn.execute('SELECT id, student_id, timestamp, type, content, topic FROM legacy_interactions')
+            converted = [
+                (id_, student_id, Interaction.from_dict({'timestamp': ts, 'type': type_, 'content': content,
+                                                         'topic': topic}))
+                for id_, student_id, ts, type_, content, topic in rows
+            ]
+            topic_ids = self._topic_ids_for(conn, {interaction.topic for _, _, interaction in converted})
+            conn.executemany(
+                'INSERT INTO interactions (id, student_id, timestamp, kind, topic, detail) VALUES (?, ?, ?, ?, ?, ?)',
+                [(id_, student_id) + self._row(interaction, topic_ids) for id_, student_id, interaction in converted]
+            )
+            conn.execute('DROP TABLE legacy_interactions')
+        self._cache_topic_ids(topic_ids)
+
+    def _topic_ids_for(self, conn: sqlite3.Connection, topics) -> Dict[str, int]:
+        """Ids of topics, assigning new ones in the current transaction.
+
+        Only the caller caches the ids it gets, once the transaction has
+        committed, so a rolled back id is never reused for another topic.
+        """
+        ids = {}
+        missing = []
+        for topic in topics:
+            topic_id = self._topic_ids.get(topic)
+            if topic_id is not None:
+                ids[topic] = topic_id
+            elif topic is not None:
+                missing.append(topic)
+        if missing:
+            conn.executemany('INSERT OR IGNORE INTO topic_names (name) VALUES (?)', [(topic,) for topic in missing])
+            for topic in missing:
+                ids[topic] = conn.execute('SELECT id FROM topic_names WHERE name = ?', (topic,)).fetchone()[0]
+        return ids
+
+    def _cache_topic_ids(self, topic_ids: Dict[str, int]) -> None:
+        for topic, topic_id in topic_ids.items():
+            self._topic_ids.put(topic, topic_id)
+
+    def _topic_name(self, conn: sqlite3.Connection, topic_id: Optional[int]) -> Optional[str]:
+        if topic_id is None:
+            return None
+        name = self._topic_names.get(topic_id)
+        if name is None:
+            name = conn.execute('SELECT name FROM topic_names WHERE id = ?', (topic_id,)).fetchone()[0]
+            self._topic_names.put(topic_id, name)
+        return name
+
+    @staticmethod
+    def _row(interaction: Interaction, topic_ids: Dict[str, int]):
+        """The timestamp, kind, topic and detail columns of an interaction"""
+        return (interaction.timestamp, int(interaction.kind), topic_ids.get(interaction.topic),
+                None if interaction.detail is None else json.dumps(interaction.detail, ensure_ascii=False))
+
+    def _interaction(self, conn: sqlite3.Connection, timestamp: int, kind: int, topic_id: Optional[int],
+                     detail: Optional[str]) -> Interaction:
+        return Interaction.from_json([timestamp, kind, self._topic_name(conn, topic_id),
+                                      None if detail is None else json.loads(detail)])
+
+    def import_memory(self, memory: Dict) -> None:
+        """Bulk-load memory decoded from a JSON memory file"""
+        conn = self._connect()
+        with conn:
+            topic_ids = self._topic_ids_for(conn, {
+                interaction.topic for student in memory.values() for interaction in student.get('interactions', [])
+            })
+            for student_id, student in memory.items():
+                stats = history_stats(student, self.history_days)
+                conn.executemany(
+                    'INSERT OR REPLACE INTO interaction_stats (student_id, kind, key, count) VALUES (?, ?, ?, ?)',
+                    [(student_id, 'total', '', stats['total_interactions'])] +
+                    [(student_id, 'type', type_, count) for type_, count in stats['by_type'].items()] +
+                    [(student_id, 'day', day, count) for day, count in stats['daily'].items()]
+                )
+                conn.executemany(
+                    'INSERT INTO interactions (student_id, timestamp, kind, topic, detail) VALUES (?, ?, ?, ?, ?)',
+                    [(student_id,) + self._row(interaction, topic_ids) for interaction in student.get('interactions', [])]
+                )
+                conn.executemany(
+                    'INSERT OR REPLACE INTO topics_studied (student_id, topic, count) VALUES (?, ?, ?)',
+                    [(student_id, topic, count) for topic, count in student.get('topics_studied', {}).items()]
+                )
+                conn.executemany(
+                    'INSERT OR REPLACE INTO quiz_performance (student_id, topic, correct, total) VALUES (?, ?, ?, ?)',
+                    [(student_id, topic, p['correct'], p['total'])
+                     for topic, p in student.get('quiz_performance', {}).items()]
+                )
+            evicted = self._apply_retention(conn, list(memory))
+        self._cache_topic_ids(topic_ids)
+        self._archive(evicted)
+
+    def close(self) -> None:
+        super().close()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def record_interaction(self, student_id: str, interaction: Interaction) -> None:
+        self._schedule_flush(self._queue({'op': 'interaction', 'student_id': student_id, 'interaction': interaction}))
+
+    def record_quiz_result(self, student_id: str, topic: str, is_correct: bool) -> None:
+        self._schedule_flush(self._queue({'op': 'quiz', 'student_id': student_id, 'topic': topic, 'correct': is_correct}))
+
+    def record_batch(self, records: List[Dict]) -> None:
+        for record in records:
+            if record.get('op') not in ('interaction', 'quiz'):
+                raise ValueError(f"Unknown journal record op: {record.get('op')!r}")
+        if records:
+            self._schedule_flush(self._queue_many(records))
+
+    def size(self) -> Dict[str, int]:
+        self._read_barrier()
+        students = self._connect().execute("SELECT COUNT(*) FROM interaction_stats WHERE kind = 'total'").fetchone()[0]
+        return {
+            'students': students,
+            'bytes': sum(os.path.getsize(path) for path in (self.db_file, f"{self.db_file}-wal")
+                         if os.path.exists(path))
+        }
+
+    def commit(self, records: List[Dict], sync: bool) -> None:
+        # Counter updates for the same (student, topic) are merged, so a
+        # batch costs one upsert per touched row
+        interactions = []
+        topic_counts = Counter()
+        stat_counts = Counter()
+        quiz_counts = {}
+        for record in records:
+            student_id = record['student_id']
+            if record['op'] == 'interaction':
+                interaction = record['interaction']
+                topic = interaction.topic
+                interactions.append((student_id, interaction))
+                if topic:
+                    topic_counts[(student_id, topic)] += 1
+                stat_counts[(student_id, 'total', '')] += 1
+                stat_counts[(student_id, 'type', interaction.type)] += 1
+                stat_counts[(student_id, 'day', interaction.day)] += 1
+            else:
+                counts = quiz_counts.setdefault((student_id, record['topic']), [0, 0])
+                counts[0] += int(bool(record['correct']))
+                counts[1] += 1
+
+        conn = self._connect()
+        with conn:
+            topic_ids = self._topic_ids_for(conn, {interaction.topic for _, interaction in interactions})
+            conn.executemany(
+                'INSERT INTO interactions (student_id, timestamp, kind, topic, detail) VALUES (?, ?, ?, ?, ?)',
+                [(student_id,) + self._row(interaction, topic_ids) for student_id, interaction in interactions]
+            )
+            conn.executemany(
+                'INSERT INTO topics_studied (student_id, topic, count) VALUES (?, ?, ?) '
+                'ON CONFLICT (student_id, topic) DO UPDATE SET count = count + excluded.count',
+                [(student_id, topic, count) for (student_id, topic), count in topic_counts.items()]
+            )
+            conn.executemany(
+                'INSERT INTO quiz_performance (student_id, topic, correct, total) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (student_id, topic) DO UPDATE SET '
+                'correct = correct + excluded.correct, total = total + excluded.total',
+                [(student_id, topic, correct, total) for (student_id, topic), (correct, total) in quiz_counts.items()]
+            )
+            conn.executemany(
+                'INSERT INTO interaction_stats (student_id, kind, key, count) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (student_id, kind, key) DO UPDATE SET count = count + excluded.count',
+                [key + (count,) for key, count in stat_counts.items()]
+            )
+            evicted = self._apply_retention(conn, {student_id for student_id, _ in interactions})
+        self._cache_topic_ids(topic_ids)
+        self._archive(evicted)
+
+    def _apply_retention(self, conn: sqlite3.Connection, student_ids) -> Dict[str, List[Interaction]]:
+        """Trim students' interactions and daily buckets; returns evicted interactions"""
+        evicted = {}
+        for student_id in student_ids:
+            if self.history_limit:
+                # The newest interaction that no longer fits in the history
+                row = conn.execute(
+                    'SELECT id FROM interactions WHERE student_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?',
+                    (student_id, self.history_limit)
+                ).fetchone()
+                if row is not None:
+                    if self.archive is not None:
+                        evicted[student_id] = [
+                            self._interaction(conn, *columns) for columns in conn.execute(
+                                'SELECT timestamp, kind, topic, detail FROM interactions '
+                                'WHERE student_id = ? AND id <= ? ORDER BY id', (student_id, row[0])
+                            ).fetchall()
+                        ]
+                    conn.execute('DELETE FROM interactions WHERE student_id = ? AND id <= ?', (student_id, row[0]))
+            if self.history_days:
+                conn.execute(
+                    "DELETE FROM interaction_stats WHERE student_id = ? AND kind = 'day' AND key NOT IN "
+                    "(SELECT key FROM interaction_stats WHERE student_id = ? AND kind = 'day' ORDER BY key DESC LIMIT ?)",
+                    (student_id, student_id, self.history_days)
+                )
+        return evicted
+
+    def _history_stats(self, student_id: str) -> Dict:
+        stats = new_history_stats()
+        rows = self._connect().execute(
+            'SELECT kind, key, count FROM interaction_stats WHERE student_id = ? ORDER BY kind, key', (student_id,)
+        )
+        for kind, key, count in rows:
+            if kind == 'total':
+                stats['total_interactions'] = count
+            elif kind == 'type':
+                stats['by_type'][key] = count
+            elif kind == 'day':
+                stats['daily'][key] = count
+        return stats
+
+    def _read_barrier(self) -> None:
+        # Reads go to the database, so queued updates must land there first
+        if self._pending:
+            self.flush()
+
+    def _recent_interactions(self, student_id: str, limit: Optional[int]) -> List[Dict]:
+        self._read_barrier()
+        query = 'SELECT timestamp, kind, topic, detail FROM interactions WHERE student_id = ? ORDER BY id DESC'
+        params = (student_id,)
+        if limit is not None:
+            query += ' LIMIT ?'
+            params = (student_id, limit)
+        conn = self._connect()
+        rows = conn.execute(query, params).fetchall()
+        return [self._interaction(conn, *columns).to_dict() for columns in reversed(rows)]
+
+    def get_progress(self, student_id: str) -> Dict:
+        self._read_barrier()
+        conn = self._connect()
+        topics = conn.execute(
+            'SELECT topic, count FROM topics_studied WHERE student_id = ? ORDER BY rowid', (student_id,)
+        ).fetchall()
+        quiz = conn.execute(
+            'SELECT topic, correct, total FROM quiz_performance WHERE student_id = ? ORDER BY rowid', (student_id,)
+        ).fetchall()
+        return {
+            'topics_studied': dict(topics),
+            'quiz_performance': {topic: {'correct': correct, 'total': total} for topic, correct, total in quiz}
+        }
+
+    def get_student(self, student_id: str) -> Dict:
+        interactions = self._recent_interactions(student_id, None)
+        progress = self.get_progress(student_id)
+        if not interactions and not progress['topics_studied'] and not progress['quiz_performance']:
+            return {}
+        return {
+            'interactions': interactions,
+            'topics_studied': progress['topics_studied'],
+            'quiz_performance': progress['quiz_performance'],
+            'preferences': {},
+            'history': self._history_stats(student_id)
+        }
+
+    def get_summary(self, student_id: str, recent: int = 10) -> Dict:
+        self._read_barrier()
+        stats = self._history_stats(student_id)
+        summary = {'total_interactions': stats['total_interactions']}
+        summary.update(self.get_progress(student_id))
+        summary['activity_by_type'] = stats['by_type']
+        summary['daily_activity'] = stats['daily']
+        summary['recent_interactions'] = self._recent_interactions(student_id, recent)
+        return summary
+
+
+def create_memory_store(backend: str, memory_file: str, **options) -> MemoryStore:
+    """Build the storage backend named by MEMORY_BACKEND"""
+    common = {
+        'durability': options.get('durability', 'always'),
+        'flush_interval': options.get('flush_interval', 1.0),
+        'flush_max_pending': options.get('flush_max_pending', 100),
+        'history_limit': options.get('history_limit'),
+        'history_days': options.get('history_days'),
+        'archive_dir': options.get('archive_dir')
+    }
+    if backend == 'json':
+        return JsonMemoryStore(memory_file, **common)
+    if backend == 'journal':
+        return JournalMemoryStore(memory_file, compact_every=options.get('compact_every', 1000), **common)
+    if backend == 'sqlite':
+        base, _ = os.path.splitext(memory_file)
+        return SqliteMemoryStore(options.get('db_file') or f"{base}.db", seed_file=memory_file, **common)
+    raise ValueError(f"Unknown MEMORY_BACKEND: {backend}")
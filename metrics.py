@@ -0,0 +1,203 @@
+"""
+Prometheus metrics without extra dependencies.
+
+Counters and histograms are updated in the request path with one lock
+acquisition and a bisect, so they can stay on in production. Values that
+are already tracked elsewhere (cache statistics, store size) are read
+only when /metrics is scraped, through callback metrics. ``REGISTRY``
+renders everything in the Prometheus text exposition format.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, Tuple, float]]:
+        """(suffix, label values, value) for every series"""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield '', key, value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for suffix, key, value in self.samples():
+            names = self.labelnames if len(key) == len(self.labelnames) else self.labelnames + ('le',)
+            lines.append(f'{self.name}{suffix}{_format_labels(names, key)} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum, count
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(series[0]), series[1], series[2])) for key, series in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                yield '_bucket', key + (le,), cumulative
+            yield '_sum', key, total
+            yield '_count', key, count
+
+
+class CallbackMetric(Metric):
+    """A metric whose series are computed by a function at scrape time"""
+
+    def __init__(self, name: str, documentation: str, type_name: str,
+                 collect: Callable[[], Dict[Tuple, float]], labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.type_name = type_name
+        self.collect = collect
+
+    def samples(self):
+        for key, value in self.collect().items():
+            yield '', key, value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric; a metric with the same name is replaced"""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # One broken collector must not take down the whole scrape
+                lines.append(f'# {metric.name} unavailable: {_escape(e)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    'study_assistant_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status')))
+REQUEST_ERRORS = REGISTRY.register(Counter(
+    'study_assistant_request_errors_total', 'HTTP requests that ended in a 4xx or 5xx status', ('route', 'method')))
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    'study_assistant_request_duration_seconds', 'Time to produce a response, by route', ('route', 'method')))
+SUMMARIZE_STAGE = REGISTRY.register(Histogram(
+    'study_assistant_summarize_stage_seconds', 'Time spent in each stage of summarize_text', ('stage',)))
+STORE_COMMIT_LATENCY = REGISTRY.register(Histogram(
+    'study_assistant_memory_save_duration_seconds', 'Time to write a batch of memory updates to storage', ('backend',)))
+STORE_COMMIT_BYTES = REGISTRY.register(Histogram(
+    'study_assistant_memory_save_bytes', 'Bytes written per memory save', ('backend',), buckets=BYTES_BUCKETS))
+STORE_COMMIT_RECORDS = REGISTRY.register(Counter(
+    'study_assistant_memory_records_saved_total', 'Memory update records written to storage', ('backend',)))
+
+
+def register_caches(caches: Callable[[], Dict[str, object]]) -> None:
+    """Export the stats() of named caches: hits, misses, evictions and size"""
+    def collect(field):
+        return lambda: {(name,): cache.stats()[field] for name, cache in caches().items()}
+
+    for field, type_name, documentation in (
+            ('hits', 'counter', 'Cache lookups that found an entry'),
+            ('misses', 'counter', 'Cache lookups that found nothing'),
+            ('evictions', 'counter', 'Entries evicted to stay within bounds'),
+            ('entries', 'gauge', 'Entries currently cached'),
+            ('bytes', 'gauge', 'Approximate size of cached values'),
+            ('hit_rate', 'gauge', 'Hits divided by lookups since start')):
+        suffix = '_total' if type_name == 'counter' else ''
+        REGISTRY.register(CallbackMetric(
+            f'study_assistant_cache_{field}{suffix}', documentation, type_name, collect(field), ('cache',)))
+
+
+def register_store(size: Callable[[], Dict[str, float]], backend: str) -> None:
+    """Export the memory store's size as reported by size()"""
+    REGISTRY.register(CallbackMetric(
+        'study_assistant_memory_store_size', 'Memory store size by measure (students, bytes on disk)', 'gauge',
+        lambda: {(backend, measure): value for measure, value in size().items()}, ('backend', 'measure')))
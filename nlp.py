@@ -0,0 +1,111 @@
+"""
+Lazy access to the NLTK data the assistant needs.
+
+Nothing is imported, loaded or downloaded until the first call that needs
+it, so importing the app stays fast and works without network access.
+NLTK data is looked up in the repository's ``nltk_data`` directory first,
+then in NLTK's usual locations (including ``NLTK_DATA``). A missing
+resource is downloaded on first use unless ``NLTK_OFFLINE`` is set, in
+which case a LookupError explains how to provision it.
+
+Provision the bundled data directory with:
+    python nlp.py download
+"""
+
+import os
+import sys
+import threading
+
+BUNDLED_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data')
+
+RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords'
+}
+
+_ready = set()
+_lock = threading.Lock()
+_sent_tokenize = None
+_word_tokenize = None
+_stop_words = None
+
+
+def offline() -> bool:
+    """True when NLTK_OFFLINE forbids downloading missing resources"""
+    return os.environ.get('NLTK_OFFLINE', '').lower() in ('1', 'true', 'yes')
+
+
+def ensure_resource(name: str) -> None:
+    """Make sure an NLTK resource is installed, downloading it if allowed"""
+    if name in _ready:
+        return
+    with _lock:
+        if name in _ready:
+            return
+        import nltk
+        if os.path.isdir(BUNDLED_DATA_DIR) and BUNDLED_DATA_DIR not in nltk.data.path:
+            nltk.data.path.insert(0, BUNDLED_DATA_DIR)
+        try:
+            nltk.data.find(RESOURCES[name])
+        except LookupError:
+            if offline():
+                raise LookupError(
+                    f"NLTK resource '{name}' is not installed and NLTK_OFFLINE is set. "
+                    f"Run 'python nlp.py download' or point NLTK_DATA at a provisioned directory."
+                ) from None
+            if not nltk.download(name, quiet=True):
+                raise LookupError(f"NLTK resource '{name}' could not be downloaded") from None
+        _ready.add(name)
+
+
+def sent_tokenize(text: str):
+    global _sent_tokenize
+    if _sent_tokenize is None:
+        ensure_resource('punkt')
+        from nltk.tokenize import sent_tokenize as nltk_sent_tokenize
+        _sent_tokenize = nltk_sent_tokenize
+    return _sent_tokenize(text)
+
+
+def word_tokenize(text: str):
+    global _word_tokenize
+    if _word_tokenize is None:
+        ensure_resource('punkt')
+        from nltk.tokenize import word_tokenize as nltk_word_tokenize
+        _word_tokenize = nltk_word_tokenize
+    return _word_tokenize(text)
+
+
+def stop_words() -> frozenset:
+    """English stopwords, loaded once per process"""
+    global _stop_words
+    if _stop_words is None:
+        ensure_resource('stopwords')
+        with _lock:
+            # NLTK's lazy corpus loader breaks when two threads load it at once
+            if _stop_words is None:
+                from nltk.corpus import stopwords
+                _stop_words = frozenset(stopwords.words('english'))
+    return _stop_words
+
+
+def preload() -> None:
+    """Load every resource now instead of on the first request"""
+    sent_tokenize("Warm up the tokenizer.")
+    word_tokenize("Warm up the tokenizer.")
+    stop_words()
+
+
+def download(target: str = BUNDLED_DATA_DIR) -> None:
+    """Download every resource into target"""
+    import nltk
+    for name in RESOURCES:
+        if not nltk.download(name, download_dir=target):
+            raise SystemExit(f"Failed to download NLTK resource '{name}'")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['download']:
+        raise SystemExit("usage: python nlp.py download")
+    download()
+    print(f"NLTK data installed in {BUNDLED_DATA_DIR}")
@@ -0,0 +1,146 @@
+"""
+On-demand cProfile profiling of individual requests.
+
+Profiling is off unless configured. A request is profiled when it sends
+the configured token in the ``X-Profile-Token`` header, or when it is
+picked by 1-in-N sampling. Each profile is written in pstats format
+(open it with ``python -m pstats`` or snakeviz) next to a small JSON file
+describing the request. Only the newest ``keep`` profiles are retained.
+
+At most one request is profiled at a time: requests that would be
+profiled while another profile is running are simply served unprofiled.
+A streamed response is profiled until its body has been sent, which
+assumes the body is generated on the thread that handled the request, as
+the WSGI servers do. cProfile only sees the thread it is started on, so
+the ASGI routes select a request on the event loop and then serve it
+entirely on a worker thread that is profiled.
+"""
+
+import cProfile
+import glob
+import hmac
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+HEADER = 'X-Profile-Token'
+
+
+class RequestProfiler:
+    """Decides which requests to profile and keeps the resulting files"""
+
+    def __init__(self, directory: str, token: Optional[str] = None, sample_every: int = 0, keep: int = 50):
+        self.directory = directory
+        self.token = token
+        self.sample_every = sample_every
+        self.keep = keep
+        self._counter = itertools.count(1)
+        self._running = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._index = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_every > 0
+
+    def authorized(self, headers) -> bool:
+        """True if the request carries the profiling token"""
+        supplied = headers.get(HEADER)
+        if not (self.token and supplied):
+            return False
+        # compare_digest only takes ASCII str, and headers can be any latin-1 text
+        return hmac.compare_digest(supplied.encode('utf-8', 'surrogateescape'),
+                                   self.token.encode('utf-8', 'surrogateescape'))
+
+    def select(self, headers) -> Optional[str]:
+        """Why a request should be profiled, or None if it shouldn't"""
+        if not self.enabled:
+            return None
+        if self.authorized(headers):
+            return 'header'
+        if self.sample_every > 0 and next(self._counter) % self.sample_every == 0:
+            return 'sample'
+        return None
+
+    def start(self, headers) -> Optional[Dict]:
+        """Start profiling the current request if it is selected"""
+        return self.begin(self.select(headers))
+
+    def begin(self, reason: Optional[str]) -> Optional[Dict]:
+        """Start profiling on the current thread a request selected for reason"""
+        if reason is None or not self._running.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        return {'profile': profile, 'reason': reason, 'start': time.perf_counter(), 'timestamp': time.time()}
+
+    def stop(self, run: Dict) -> None:
+        """Stop a profile without saving it"""
+        run['profile'].disable()
+        self._running.release()
+
+    def profile_id(self, run: Dict, route: str) -> str:
+        """Id the profile will be saved under, known before it is finished"""
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(run['timestamp']))}-{int(run['timestamp'] * 1000) % 1000:03d}-{slug}"
+
+    def finish(self, run: Dict, route: str, method: str, status: int) -> Dict:
+        """Stop a profile, write it out and return its index entry"""
+        duration = time.perf_counter() - run['start']
+        self.stop(run)
+        os.makedirs(self.directory, exist_ok=True)
+        name = self.profile_id(run, route)
+        entry = {
+            'id': name,
+            'route': route,
+            'method': method,
+            'status': status,
+            'duration_ms': round(duration * 1000, 2),
+            'reason': run['reason'],
+            'timestamp': run['timestamp']
+        }
+        with self._index_lock:
+            index = self._load_index()
+            run['profile'].dump_stats(os.path.join(self.directory, f"{name}.prof"))
+            with open(os.path.join(self.directory, f"{name}.json"), 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            index.append(entry)
+            while len(index) > self.keep:
+                self._remove(index.pop(0)['id'])
+        return entry
+
+    def profiles(self) -> List[Dict]:
+        """Index entries of retained profiles, newest first"""
+        with self._index_lock:
+            return list(reversed(self._load_index()))
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """pstats file of a retained profile"""
+        with self._index_lock:
+            if any(entry['id'] == profile_id for entry in self._load_index()):
+                return os.path.join(self.directory, f"{profile_id}.prof")
+        return None
+
+    def _load_index(self) -> List[Dict]:
+        # Read lazily so importing the app never touches the profile directory
+        if self._index is None:
+            index = []
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        index.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+            self._index = sorted(index, key=lambda entry: entry['timestamp'])
+        return self._index
+
+    def _remove(self, profile_id: str) -> None:
+        for suffix in ('.prof', '.json'):
+            try:
+                os.unlink(os.path.join(self.directory, f"{profile_id}{suffix}"))
+            except FileNotFoundError:
+                pass
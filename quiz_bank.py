@@ -0,0 +1,54 @@
+"""
+Quiz question banks with difficulty buckets built once at load time.
+
+Selecting a quiz draws question indices from the prebuilt buckets, so its
+cost depends on the number of questions asked, not on the size of the
+bank. Pass a ``random.Random`` to ``select`` for reproducible quizzes.
+"""
+
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+
+class QuizBank:
+    """An immutable question bank indexed by difficulty"""
+
+    def __init__(self, questions: Sequence[Dict]):
+        self.questions = tuple(questions)
+        buckets = {difficulty: [] for difficulty in DIFFICULTIES}
+        for index, question in enumerate(self.questions):
+            bucket = buckets.get(question.get('difficulty'))
+            if bucket is not None:
+                bucket.append(index)
+        self.buckets: Dict[str, Tuple[int, ...]] = {d: tuple(b) for d, b in buckets.items()}
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def select(self, num_questions: int, rng: Optional[random.Random] = None) -> List[Dict]:
+        """Pick questions balanced across difficulties, in random order"""
+        if len(self.questions) <= num_questions:
+            return list(self.questions)
+        rng = rng or random
+
+        # A third easy, a third medium and the rest hard, as far as the
+        # buckets allow
+        easy_count = max(1, num_questions // 3)
+        medium_count = max(1, num_questions // 3)
+        hard_count = max(0, num_questions - easy_count - medium_count)
+        chosen = []
+        for difficulty, count in zip(DIFFICULTIES, (easy_count, medium_count, hard_count)):
+            bucket = self.buckets[difficulty]
+            chosen.extend(rng.sample(bucket, min(count, len(bucket))))
+
+        # Fill remaining spots from the whole bank, without replacement
+        missing = num_questions - len(chosen)
+        if missing > 0:
+            taken = set(chosen)
+            candidates = rng.sample(range(len(self.questions)), min(len(self.questions), missing + len(taken)))
+            chosen.extend([i for i in candidates if i not in taken][:missing])
+
+        rng.shuffle(chosen)
+        return [self.questions[i] for i in chosen[:num_questions]]
@@ -0,0 +1,158 @@
+"""
+Flesch reading ease and Flesch-Kincaid grade from already tokenized text.
+
+textstat splits the text into sentences and words again for every score
+and counts syllables from scratch. The summarizer has already split
+sentences and tokenized them, so the scores are computed from those
+counts instead. Syllables are counted with pyphen, as textstat does,
+through a process-wide cache keyed by word. It is bounded by
+SYLLABLE_CACHE_SIZE (default 65536 words).
+
+Counting follows textstat 0.7.3 so the scores stay comparable:
+- punctuation, apostrophes included, is dropped from words, and
+  contractions count as one word
+- sentences of two words or fewer don't count as sentences
+- the average sentence length and syllables per word are rounded to one
+  decimal before the formulas are applied
+Text that hasn't been tokenized is counted the way textstat counts it
+and gets the same scores. Scores computed from the summarizer's tokens
+differ slightly where NLTK splits sentences differently;
+benchmarks/bench_readability.py checks both.
+"""
+
+import math
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, NamedTuple
+
+SYLLABLE_CACHE_SIZE = int(os.environ.get('SYLLABLE_CACHE_SIZE', 65536))
+
+_NON_WORD = re.compile(r"\W")
+# Second halves of contractions as word_tokenize splits them off
+_CONTRACTIONS = frozenset(["n't", "'s", "'re", "'ll", "'ve", "'d", "'m"])
+_SENTENCE = re.compile(r'\b[^.!?]+[.!?]*')
+
+_pyphen = None
+_pyphen_lock = threading.Lock()
+
+
+class TextCounts(NamedTuple):
+    sentences: int
+    words: int
+    syllables: int
+
+
+def _hyphenator():
+    global _pyphen
+    if _pyphen is None:
+        with _pyphen_lock:
+            if _pyphen is None:
+                # Imported on first use, like textstat in get_readability_score
+                from pyphen import Pyphen
+                _pyphen = Pyphen(lang='en_US')
+    return _pyphen
+
+
+@lru_cache(maxsize=SYLLABLE_CACHE_SIZE)
+def syllables(word: str) -> int:
+    """Syllables in a lowercase word, or 0 if it has no letters or digits"""
+    word = _NON_WORD.sub('', word)
+    if not word:
+        return 0
+    return len(_hyphenator().positions(word)) + 1
+
+
+def sentence_counts(tokens: Iterable[str]) -> TextCounts:
+    """Counts for one sentence given its lowercase tokens.
+
+    Tokens may come from word_tokenize or from splitting on whitespace;
+    punctuation around a word is ignored.
+    """
+    words = 0
+    total = 0
+    for token in tokens:
+        # word_tokenize splits "don't" into "do" and "n't"; textstat
+        # counts it as one word
+        if token in _CONTRACTIONS and words:
+            continue
+        count = syllables(token)
+        if count:
+            words += 1
+            total += count
+    return TextCounts(1 if words > 2 else 0, words, total)
+
+
+def combine(counts: Iterable[TextCounts]) -> TextCounts:
+    sentences = words = total = 0
+    for count in counts:
+        sentences += count.sentences
+        words += count.words
+        total += count.syllables
+    return TextCounts(sentences, words, total)
+
+
+def _word_count(text: str) -> int:
+    return sum(1 for word in text.split() if _NON_WORD.sub('', word))
+
+
+def text_counts(text: str) -> TextCounts:
+    """Counts for text that hasn't been tokenized, split the way textstat splits it.
+
+    Like textstat, words and syllables are counted over the whole text, so a
+    word the sentence pattern cuts in two ("9.8") still counts once.
+    """
+    sentences = sum(1 for sentence in _SENTENCE.findall(text) if _word_count(sentence) > 2)
+    words = total = 0
+    for word in text.lower().split():
+        count = syllables(word)
+        if count:
+            words += 1
+            total += count
+    return TextCounts(sentences, words, total)
+
+
+def _round(number: float, points: int) -> float:
+    # textstat's rounding: half away from zero
+    scale = 10 ** points
+    return math.floor(number * scale + math.copysign(0.5, number)) / scale
+
+
+def averages(counts: TextCounts):
+    """Rounded words per sentence and syllables per word"""
+    if not counts.words:
+        return 0.0, 0.0
+    return (_round(counts.words / max(1, counts.sentences), 1),
+            _round(counts.syllables / counts.words, 1))
+
+
+def flesch_reading_ease(counts: TextCounts) -> float:
+    sentence_length, syllables_per_word = averages(counts)
+    return _round(206.835 - 1.015 * sentence_length - 84.6 * syllables_per_word, 2)
+
+
+def flesch_kincaid_grade(counts: TextCounts) -> float:
+    sentence_length, syllables_per_word = averages(counts)
+    return _round(0.39 * sentence_length + 11.8 * syllables_per_word - 15.59, 1)
+
+
+class SyllableCache:
+    """Monitoring view of the syllables() cache, shaped like LRUCache"""
+
+    def stats(self) -> Dict:
+        info = syllables.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            'entries': info.currsize,
+            'bytes': 0,
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': round(info.hits / lookups, 4) if lookups else 0.0,
+            # Entries are only ever dropped to stay within the bound
+            'evictions': info.misses - info.currsize,
+            'expirations': 0
+        }
+
+
+SYLLABLE_CACHE = SyllableCache()
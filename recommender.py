@@ -0,0 +1,169 @@
+"""
+Incremental study recommendations over the topic graph.
+
+The topic graph links every curated topic to the topics in its ``related``
+list, earlier entries weighing more. For each active student the
+recommender keeps the topics studied, the quiz accuracy per topic, the
+weak topics and a score for every not-yet-studied neighbour of a studied
+topic. Interactions and quiz results update that state in place as they
+are recorded, so a recommendation only picks the top entries and never
+rescans the student's history.
+
+Student state is rebuilt from the memory store's progress counters the
+first time a student is seen, when it expires, and when the content packs
+(and with them the graph) change. Callers write an event to the store and
+record it here while holding updating(student_id), so a rebuild can't
+read the event from the store and then count it a second time.
+
+The state only follows events recorded in this process. Where several
+processes share a store, as SQLite workers do, events recorded by the
+others only show up once the state expires, up to ``ttl`` seconds later.
+"""
+
+import heapq
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cache import LRUCache
+from content_registry import ContentRegistry, ContentSnapshot, normalize_topic
+
+
+class TopicGraph:
+    """Topics linked to their related topics, built once per content snapshot"""
+
+    def __init__(self, snapshot: ContentSnapshot):
+        self.snapshot = snapshot
+        self.edges: Dict[str, Tuple[Tuple[str, str, float], ...]] = {}
+        for key in snapshot.canonical_topics():
+            related = snapshot.topics[key].get('related', [])
+            neighbours = []
+            for rank, title in enumerate(related):
+                # Related topics that are curated themselves join the graph
+                # under their canonical key
+                content, _ = snapshot.resolve(title)
+                neighbour = content['key'] if content else normalize_topic(title)
+                if neighbour != key:
+                    neighbours.append((neighbour, title, 1.0 / (rank + 1)))
+            self.edges[key] = tuple(neighbours)
+
+    @classmethod
+    def for_snapshot(cls, snapshot: ContentSnapshot) -> 'TopicGraph':
+        """The graph of a snapshot, shared by everyone using that snapshot"""
+        graph = snapshot.derived.get('topic_graph')
+        if graph is None:
+            graph = snapshot.derived['topic_graph'] = cls(snapshot)
+        return graph
+
+    def canonical(self, topic: str) -> str:
+        """Graph key of a free-form topic name"""
+        content, _ = self.snapshot.resolve(topic)
+        return content['key'] if content else normalize_topic(topic)
+
+
+class StudentState:
+    """One student's studied topics, quiz accuracy and candidate next topics"""
+
+    def __init__(self, graph: TopicGraph):
+        self.graph = graph
+        self.studied = set()
+        self.quiz = {}        # topic -> [correct, total]
+        self.weak = {}        # topic -> accuracy below the threshold
+        self.candidates = {}  # graph key -> [score, title, source]
+
+    def study(self, topic: str, count: int = 1) -> None:
+        key = self.graph.canonical(topic)
+        self.studied.add(key)
+        self.candidates.pop(key, None)
+        for neighbour, title, weight in self.graph.edges.get(key, ()):
+            if neighbour in self.studied:
+                continue
+            candidate = self.candidates.setdefault(neighbour, [0.0, title, key])
+            candidate[0] += weight * count
+            candidate[2] = key
+
+    def answer(self, topic: str, correct: int, total: int, weak_threshold: float) -> None:
+        counts = self.quiz.setdefault(topic, [0, 0])
+        counts[0] += correct
+        counts[1] += total
+        accuracy = counts[0] / counts[1] if counts[1] else 0
+        if accuracy < weak_threshold:
+            self.weak[topic] = accuracy
+        else:
+            self.weak.pop(topic, None)
+
+
+class Recommender:
+    """Keeps recommendation state for recently active students"""
+
+    # Students share a fixed set of locks, so updates for different students
+    # rarely wait on each other
+    LOCK_STRIPES = 64
+
+    def __init__(self, registry: ContentRegistry, max_students: int = 10000,
+                 ttl: Optional[float] = 300.0, weak_threshold: float = 0.7):
+        self.registry = registry
+        self.weak_threshold = weak_threshold
+        self._states = LRUCache(max_entries=max_students, ttl=ttl)
+        self._locks = [threading.RLock() for _ in range(self.LOCK_STRIPES)]
+
+    def _lock(self, student_id: str) -> threading.RLock:
+        return self._locks[zlib.crc32(student_id.encode('utf-8')) % self.LOCK_STRIPES]
+
+    @contextmanager
+    def updating(self, student_id: str):
+        """Hold while writing a student's events to the store and recording them here"""
+        with self._lock(student_id):
+            yield
+
+    def _state(self, student_id: str, load_progress: Callable[[str], Dict]) -> StudentState:
+        graph = TopicGraph.for_snapshot(self.registry.snapshot)
+        state = self._states.get(student_id)
+        if state is None or state.graph is not graph:
+            progress = load_progress(student_id)
+            state = StudentState(graph)
+            for topic, count in progress['topics_studied'].items():
+                state.studied.add(graph.canonical(topic))
+            for topic, count in progress['topics_studied'].items():
+                state.study(topic, count)
+            for topic, performance in progress['quiz_performance'].items():
+                state.answer(topic, performance['correct'], performance['total'], self.weak_threshold)
+            self._states.put(student_id, state)
+        return state
+
+    def record_interaction(self, student_id: str, topic: Optional[str]) -> None:
+        """Count a study event for a student whose state is loaded"""
+        if not topic:
+            return
+        with self._lock(student_id):
+            state = self._states.get(student_id, count=False)
+            if state is not None:
+                state.study(topic)
+
+    def record_quiz_result(self, student_id: str, topic: str, is_correct: bool) -> None:
+        """Count a quiz answer for a student whose state is loaded"""
+        with self._lock(student_id):
+            state = self._states.get(student_id, count=False)
+            if state is not None:
+                state.answer(topic, int(bool(is_correct)), 1, self.weak_threshold)
+
+    def stats(self) -> Dict:
+        return self._states.stats()
+
+    def recommend(self, student_id: str, load_progress: Callable[[str], Dict],
+                  max_weak: int = 5, max_next: int = 3) -> List[str]:
+        """Review suggestions for the weakest topics, then the best next topics"""
+        with self._lock(student_id):
+            state = self._state(student_id, load_progress)
+            weak = heapq.nsmallest(max_weak, state.weak.items(), key=lambda item: item[1])
+            next_topics = heapq.nlargest(max_next, state.candidates.values(), key=lambda c: c[0])
+
+        recommendations = [
+            f"Consider reviewing {topic} - current accuracy: {accuracy:.1%}" for topic, accuracy in weak
+        ]
+        recommendations.extend(
+            f"Since you studied {source}, you might enjoy learning about {title}!"
+            for _, title, source in next_topics
+        )
+        return recommendations
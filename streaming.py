@@ -0,0 +1,149 @@
+"""
+Bounded-memory summarization of large uploaded documents.
+
+The upload is copied to a temporary file in fixed-size chunks, then read
+back incrementally and cut into sections of roughly ``section_chars``
+characters at paragraph or sentence boundaries. Each section is summarized
+on its own and reported as soon as it is done. The section summaries are
+folded into a running document summary that is re-summarized whenever it
+grows past one section, so memory use depends on the section size and
+never on the size of the file.
+"""
+
+import codecs
+import os
+import re
+import tempfile
+from typing import Dict, Iterator, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+_SENTENCE_END = re.compile(r'[.!?]\s')
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def spool_to_tempfile(stream, max_bytes: int, chunk_size: int = CHUNK_SIZE) -> str:
+    """Copy a binary stream to a temporary file and return its path"""
+    fd, path = tempfile.mkstemp(prefix='upload-', suffix='.txt')
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"Upload is larger than {max_bytes} bytes")
+                f.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def find_split_point(text: str, limit: int) -> int:
+    """Best place to cut text at or before limit: paragraph, sentence, then word"""
+    cut = text.rfind('\n\n', 0, limit)
+    if cut > limit // 2:
+        return cut + 2
+    last_end = None
+    for match in _SENTENCE_END.finditer(text, limit // 2, limit):
+        last_end = match.end()
+    if last_end:
+        return last_end
+    cut = text.rfind(' ', 0, limit)
+    if cut > 0:
+        return cut + 1
+    return limit
+
+
+def iter_sections(path: str, section_chars: int, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[str, int, int]]:
+    """Yield (section_text, bytes_read, total_bytes) from a UTF-8 text file"""
+    total_bytes = os.path.getsize(path)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buffer = ''
+    bytes_read = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            bytes_read += len(chunk)
+            buffer += decoder.decode(chunk, final=not chunk)
+            while len(buffer) >= section_chars:
+                cut = find_split_point(buffer, section_chars)
+                section, buffer = buffer[:cut], buffer[cut:]
+                if section.strip():
+                    yield section, bytes_read, total_bytes
+            if not chunk:
+                break
+    if buffer.strip():
+        yield buffer, bytes_read, total_bytes
+
+
+def summarize_sections(assistant, path: str, section_chars: int = 20000) -> Iterator[Dict]:
+    """Summarize a text file section by section, yielding progress events"""
+    summaries = []
+    summaries_chars = 0
+    word_count = 0
+    sentence_count = 0
+    ease_total = 0.0
+    grade_total = 0.0
+    index = 0
+
+    for section, bytes_read, total_bytes in iter_sections(path, section_chars):
+        result = assistant.summarize_text(section)
+        if "error" in result:
+            continue
+        words = result.get("word_count", len(section.split()))
+        word_count += words
+        sentence_count += result.get("sentence_count", len(result["key_points"]))
+        ease_total += result["readability"]["flesch_reading_ease"] * words
+        grade_total += result["readability"]["flesch_kincaid_grade"] * words
+
+        yield {
+            "type": "section",
+            "index": index,
+            "summary": result["summary"],
+            "key_points": result["key_points"],
+            "word_count": words,
+            "confidence": result["confidence"]
+        }
+        yield {
+            "type": "progress",
+            "sections": index + 1,
+            "bytes_read": bytes_read,
+            "total_bytes": total_bytes,
+            "percent": round(bytes_read / total_bytes * 100, 1) if total_bytes else 100.0
+        }
+        index += 1
+
+        # Keep the running document summary no longer than one section
+        summaries.append(result["summary"])
+        summaries_chars += len(result["summary"])
+        if summaries_chars > section_chars:
+            condensed = assistant.summarize_text(' '.join(summaries))["summary"]
+            summaries = [condensed]
+            summaries_chars = len(condensed)
+
+    if not summaries:
+        yield {"type": "error", "error": "Please provide text to summarize"}
+        return
+
+    final = assistant.summarize_text(' '.join(summaries))
+    ease = ease_total / word_count if word_count else 0
+    yield {
+        "type": "summary",
+        "summary": final["summary"],
+        "key_points": final["key_points"],
+        "sections": index,
+        "word_count": word_count,
+        "sentence_count": sentence_count,
+        "readability": {
+            "flesch_reading_ease": round(ease, 1),
+            "flesch_kincaid_grade": round(grade_total / word_count, 1) if word_count else 0,
+            "reading_level": assistant.reading_level(ease)
+        }
+    }
@@ -0,0 +1,154 @@
+"""
+Resolution of free-form topic queries to curated topics.
+
+Students type things like "what is gravity" or "photosynthsis" rather than
+the exact topic name. ``TopicResolver`` indexes every topic name and alias
+by word, and every word by its character trigrams, so a query is matched
+by looking up its words (or, for misspelled words, their closest indexed
+words) instead of comparing it with every topic. Each match carries a
+confidence between 0 and 1; queries below ``min_confidence`` resolve to
+nothing. Resolutions are memoized per normalized query.
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from cache import LRUCache
+
+# Words that frame a question rather than name its topic
+FILLER_WORDS = frozenset({
+    'a', 'about', 'an', 'and', 'are', 'basics', 'can', 'define', 'definition',
+    'describe', 'do', 'does', 'explain', 'explanation', 'for', 'how', 'i', 'in',
+    'introduction', 'is', 'learn', 'me', 'meaning', 'of', 'on', 'please', 'tell',
+    'the', 'to', 'topic', 'understand', 'want', 'was', 'what', 'whats', 'when',
+    'where', 'which', 'who', 'why', 'with', 'work', 'works', 'you'
+})
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+_NO_MATCH = object()
+_MISSING = object()
+
+
+class TopicMatch(NamedTuple):
+    key: str
+    name: str
+    confidence: float
+
+
+def query_words(text: str) -> List[str]:
+    """Lowercase words of a query, without punctuation"""
+    return _WORD.findall(text.lower())
+
+
+def trigrams(word: str) -> set:
+    padded = f' {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TopicResolver:
+    """Maps free-form queries to canonical topic keys"""
+
+    def __init__(self, names: Dict[str, str], min_confidence: float = 0.6,
+                 min_word_similarity: float = 0.6, cache_size: int = 4096):
+        # names maps every normalized topic name and alias to its topic key
+        self.min_confidence = min_confidence
+        self.min_word_similarity = min_word_similarity
+        self._cache = LRUCache(max_entries=cache_size)
+        self._names = {}
+        self._name_words = {}
+        self._word_index = defaultdict(set)
+        self._trigram_index = defaultdict(set)
+        self._trigram_counts = {}
+        for name, key in names.items():
+            words = tuple(query_words(name))
+            if not words:
+                continue
+            self._names[' '.join(words)] = key
+            self._name_words[name] = (key, words)
+            for word in words:
+                self._word_index[word].add(name)
+        for word in self._word_index:
+            grams = trigrams(word)
+            self._trigram_counts[word] = len(grams)
+            for gram in grams:
+                self._trigram_index[gram].add(word)
+
+    def resolve(self, query: str) -> Optional[TopicMatch]:
+        """Best matching topic for a query, or None"""
+        words = query_words(query)
+        normalized = ' '.join(words)
+        cached = self._cache.get(normalized, _MISSING)
+        if cached is _MISSING:
+            cached = self._resolve(words, normalized) or _NO_MATCH
+            self._cache.put(normalized, cached)
+        return None if cached is _NO_MATCH else cached
+
+    def _resolve(self, words: List[str], normalized: str) -> Optional[TopicMatch]:
+        if normalized in self._names:
+            return TopicMatch(self._names[normalized], normalized, 1.0)
+        content_words = [w for w in words if w not in FILLER_WORDS] or words
+        if not content_words:
+            return None
+
+        # For every query word, the indexed words it may stand for
+        similar = [self._similar_words(word) for word in content_words]
+        candidates = set()
+        for matches in similar:
+            for indexed_word, _ in matches:
+                candidates.update(self._word_index[indexed_word])
+
+        best = None
+        for name in candidates:
+            key, name_words = self._name_words[name]
+            confidence = self._score(name_words, similar)
+            if best is None or confidence > best.confidence or (
+                    confidence == best.confidence and len(name) < len(best.name)):
+                best = TopicMatch(key, name, round(confidence, 3))
+        if best is None or best.confidence < self.min_confidence:
+            return None
+        return best
+
+    def _similar_words(self, word: str) -> List[Tuple[str, float]]:
+        """Indexed words equal or close to word, with their similarity"""
+        if word in self._word_index:
+            return [(word, 1.0)]
+        if len(word) < 4:
+            return []
+        grams = trigrams(word)
+        shared = defaultdict(int)
+        for gram in grams:
+            for indexed_word in self._trigram_index.get(gram, ()):
+                shared[indexed_word] += 1
+        matches = []
+        for indexed_word, count in shared.items():
+            # Dice coefficient of the two trigram sets
+            similarity = 2 * count / (len(grams) + self._trigram_counts[indexed_word])
+            if similarity >= self.min_word_similarity:
+                matches.append((indexed_word, similarity))
+        return matches
+
+    @staticmethod
+    def _score(name_words: Tuple[str, ...], similar: List[List[Tuple[str, float]]]) -> float:
+        """How completely the query covers the name, times the share of query
+        words that match a word of the name.
+
+        Every content word the name doesn't account for counts fully against
+        it, so "gravity waves" is not a confident match for "gravity".
+        """
+        name_cover = {}
+        matched = 0
+        for matches in similar:
+            found = False
+            for indexed_word, similarity in matches:
+                if indexed_word in name_words:
+                    found = True
+                    name_cover[indexed_word] = max(name_cover.get(indexed_word, 0.0), similarity)
+            matched += found
+        name_coverage = sum(name_cover.values()) / len(name_words)
+        return name_coverage * matched / len(similar)
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+